@@ -1,4 +1,3 @@
-import ollama
 import threading # Added
 import queue # Added
 from typing import Optional, Tuple, List, Dict, Any # Added Any for Dict values
@@ -17,6 +16,7 @@ class OllamaClient:
         self.conversation_response_timeout = config_manager.get_entry('ollama.conversation_response_timeout', 30.0) # Default 30s
         self.max_concurrent_requests = config_manager.get_entry('ollama.max_concurrent_requests', 1) # Read max concurrent requests
 
+        import ollama # Deferred: importing ollama (and httpx) is the slowest part of startup
         self.client = ollama.Client(host=host)
         self.results_queue = queue.Queue() # Queue to store results from threads
         self.active_requests = set() # Keep track of active requests per Sim ID
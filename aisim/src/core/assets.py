@@ -0,0 +1,189 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import pygame
+from typing import Dict, List, Optional
+from aisim.src.core.configuration import config_manager
+
+BUNDLE_MAGIC = b'AISIMBND'
+BUNDLE_VERSION = 1
+BUNDLE_ALIGN = 64 # Pixel blocks start on aligned offsets
+PIXEL_FORMAT = 'RGBA'
+GRASS_SPRITE_DEF_PATH = 'aisim/config/sprite_grass.json'
+
+
+def _source_stamp(path: str) -> List[int]:
+    """Returns (mtime_ns, size) of a source file, used to detect a stale bundle."""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _load_definitions(main_path: str, grass_path: str):
+    """Reads the sprite definition files the same way City._load_assets does."""
+    with open(main_path, 'r') as f:
+        main_defs = [s for s in json.load(f) if not s.get('name', '').startswith('grass_')]
+    with open(grass_path, 'r') as f:
+        grass_defs = json.load(f)
+    return main_defs, grass_defs
+
+
+def build_asset_bundle(bundle_path: str, sprite_def_path: str, grass_def_path: str, character_dir: str) -> int:
+    """Packs the sprite definitions, tileset images and character sheets into one bundle of raw pixels.
+
+    Layout: magic, header length (uint64), JSON header, then one aligned RGBA block per image.
+    Returns the number of packed images.
+    """
+    main_defs, grass_defs = _load_definitions(sprite_def_path, grass_def_path)
+    image_paths = {}
+    for sprite_def in main_defs + grass_defs:
+        source_file = sprite_def.get('source_file')
+        if source_file:
+            image_paths[source_file] = source_file
+    characters = sorted(f for f in os.listdir(character_dir) if f.endswith('.png'))
+    for filename in characters:
+        image_paths[f"character:{filename[:-4]}"] = os.path.join(character_dir, filename)
+
+    images = {}
+    blobs = []
+    for key, path in image_paths.items():
+        surface = pygame.image.load(path) # Decoded once here, never at launch
+        pixels = pygame.image.tobytes(surface, PIXEL_FORMAT)
+        images[key] = {'width': surface.get_width(), 'height': surface.get_height(), 'size': len(pixels),
+                       'alpha': not path.lower().endswith(('.jpg', '.jpeg')), 'stamp': _source_stamp(path)}
+        blobs.append((key, pixels))
+
+    def header_bytes(offsets_from):
+        offset = offsets_from
+        for key, pixels in blobs:
+            offset = -(-offset // BUNDLE_ALIGN) * BUNDLE_ALIGN
+            images[key]['offset'] = offset
+            offset += len(pixels)
+        header = {
+            'version': BUNDLE_VERSION,
+            'sprite_definitions': main_defs,
+            'grass_sprite_definitions': grass_defs,
+            'definition_stamps': {sprite_def_path: _source_stamp(sprite_def_path), grass_def_path: _source_stamp(grass_def_path)},
+            'character_dir': character_dir,
+            'characters': [filename[:-4] for filename in characters],
+            'images': images,
+        }
+        return json.dumps(header).encode('utf-8')
+
+    # Offsets depend on the header length, so lay out twice with a padded header size
+    prefix = len(BUNDLE_MAGIC) + 8
+    header = header_bytes(prefix)
+    reserved = len(header) + 1024
+    header = header_bytes(prefix + reserved).ljust(reserved, b' ')
+
+    os.makedirs(os.path.dirname(bundle_path) or '.', exist_ok=True)
+    tmp_path = f"{bundle_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(BUNDLE_MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for key, pixels in blobs:
+            f.write(b'\0' * (images[key]['offset'] - f.tell()))
+            f.write(pixels)
+    os.replace(tmp_path, bundle_path)
+    return len(blobs)
+
+
+class AssetBundle:
+    """Read-only view of a bundle built by `build_asset_bundle`.
+
+    The file is memory-mapped; images are wrapped as Surfaces straight from the mapped
+    pixels (no PNG decoding) and converted to the display format on first use.
+    """
+
+    def __init__(self, path: str):
+        """Maps the bundle file and parses its header (raises ValueError if it is not a bundle)."""
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+            raise ValueError(f"{path} is not an asset bundle")
+        header_start = len(BUNDLE_MAGIC) + 8
+        (header_length,) = struct.unpack('<Q', self._map[len(BUNDLE_MAGIC):header_start])
+        self.header = json.loads(self._map[header_start:header_start + header_length])
+        if self.header.get('version') != BUNDLE_VERSION:
+            raise ValueError(f"{path} has bundle version {self.header.get('version')}, expected {BUNDLE_VERSION}")
+        self.sprite_definitions: List[Dict] = self.header['sprite_definitions']
+        self.grass_sprite_definitions: List[Dict] = self.header['grass_sprite_definitions']
+        self.characters: List[str] = self.header['characters']
+        self._surfaces: Dict[str, pygame.Surface] = {}
+
+    def is_current(self) -> bool:
+        """Checks that no definition file, tileset or character sheet changed since the bundle was built."""
+        try:
+            for path, stamp in self.header['definition_stamps'].items():
+                if _source_stamp(path) != stamp:
+                    return False
+            character_dir = self.header['character_dir']
+            if sorted(f[:-4] for f in os.listdir(character_dir) if f.endswith('.png')) != sorted(self.characters):
+                return False
+            for key, info in self.header['images'].items():
+                path = os.path.join(character_dir, f"{key[len('character:'):]}.png") if key.startswith('character:') else key
+                if _source_stamp(path) != info['stamp']:
+                    return False
+        except OSError:
+            return False
+        return True
+
+    def has_image(self, key: str) -> bool:
+        """Checks whether the bundle holds an image (a tileset path or 'character:<name>')."""
+        return key in self.header['images']
+
+    def get_image(self, key: str) -> pygame.Surface:
+        """Returns the display-format Surface for an image, creating it from the mapped pixels once."""
+        surface = self._surfaces.get(key)
+        if surface is None:
+            info = self.header['images'][key]
+            pixels = memoryview(self._map)[info['offset']:info['offset'] + info['size']]
+            raw = pygame.image.frombuffer(pixels, (info['width'], info['height']), PIXEL_FORMAT)
+            surface = raw.convert_alpha() if info['alpha'] else raw.convert() # Copies, so the mapping can be closed later
+            del raw, pixels
+            self._surfaces[key] = surface
+        return surface
+
+
+_bundle: Optional[AssetBundle] = None
+_bundle_checked = False
+
+
+def get_asset_bundle() -> Optional[AssetBundle]:
+    """Returns the configured asset bundle if it exists and is up to date, otherwise None (assets load from source files)."""
+    global _bundle, _bundle_checked
+    if _bundle_checked:
+        return _bundle
+    _bundle_checked = True
+    path = config_manager.get_entry('assets.bundle_path', 'aisim/cache/assets.bundle')
+    if not config_manager.get_entry('assets.use_bundle', True) or not os.path.isfile(path):
+        return None
+    try:
+        bundle = AssetBundle(path)
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Could not open asset bundle {path}: {e}. Loading assets from source files.")
+        return None
+    if not bundle.is_current():
+        logging.warning(f"Asset bundle {path} is out of date; rebuild it with 'python -m aisim.src.core.assets'. Loading assets from source files.")
+        return None
+    _bundle = bundle
+    return _bundle
+
+
+def main():
+    """Builds the asset bundle configured in config.json."""
+    logging.basicConfig(level=logging.INFO)
+    bundle_path = config_manager.get_entry('assets.bundle_path', 'aisim/cache/assets.bundle')
+    count = build_asset_bundle(bundle_path,
+                               config_manager.get_entry('city.sprite_definitions_path', 'aisim/config/sprite_definitions.json'),
+                               GRASS_SPRITE_DEF_PATH,
+                               config_manager.get_entry('sim.character_sprite_dir'))
+    print(f"Packed {count} images into {bundle_path} ({os.path.getsize(bundle_path)} bytes).")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
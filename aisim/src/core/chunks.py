@@ -0,0 +1,131 @@
+import logging
+import numpy as np
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from aisim.src.core.mapgen import MapGenerator
+from aisim.src.core.tiles import SpriteTable, TILE_MAP_DTYPE
+
+ChunkKey = Tuple[int, int] # (chunk_col, chunk_row)
+
+
+class ChunkManager:
+    """Generates the tile map in fixed-size chunks on first access and evicts cold ones.
+
+    Each chunk is generated by a `MapGenerator` seeded from the world seed and the chunk
+    coordinates, so an evicted chunk comes back identical when it is touched again.
+    Chunks edited at runtime (see `set_block`) are never evicted, since their edits
+    cannot be regenerated. Memory use is bounded by `max_loaded_chunks` plus edited chunks.
+    """
+
+    def __init__(self, sprite_table: SpriteTable, grass_ids: List[int], grid_width: int, grid_height: int, seed: int,
+                 chunk_size: int = 32, max_loaded_chunks: int = 64, generation: Optional[Dict] = None):
+        """Initializes an empty chunk store for a grid of the given size."""
+        self.sprite_table = sprite_table
+        self.grass_ids = grass_ids
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.max_loaded_chunks = max_loaded_chunks
+        self.generation = generation or {}
+        self.chunks_x = -(-grid_width // chunk_size)
+        self.chunks_y = -(-grid_height // chunk_size)
+        # The pond goes into the chunk at the world center only
+        self.pond_chunk: ChunkKey = ((grid_width // 2) // chunk_size, (grid_height // 2) // chunk_size)
+        self._chunks: 'OrderedDict[ChunkKey, np.ndarray]' = OrderedDict() # Least recently used first
+        self._edited: Set[ChunkKey] = set()
+        self.on_load: Optional[Callable[[int, int], None]] = None # Called after a chunk is generated
+        self.on_evict: Optional[Callable[[int, int], None]] = None # Called before a chunk is dropped
+
+    def chunk_seed(self, chunk_col: int, chunk_row: int) -> int:
+        """Derives the generator seed of a chunk from the world seed."""
+        return int(np.random.SeedSequence([self.seed, chunk_col, chunk_row]).generate_state(1)[0])
+
+    def chunk_bounds(self, chunk_col: int, chunk_row: int) -> Tuple[int, int, int, int]:
+        """Returns (first_col, first_row, end_col, end_row) of a chunk, clipped to the grid."""
+        first_col, first_row = chunk_col * self.chunk_size, chunk_row * self.chunk_size
+        return first_col, first_row, min(self.grid_width, first_col + self.chunk_size), min(self.grid_height, first_row + self.chunk_size)
+
+    def loaded_chunks(self) -> List[ChunkKey]:
+        """Returns the keys of all chunks currently in memory."""
+        return list(self._chunks)
+
+    def is_loaded(self, chunk_col: int, chunk_row: int) -> bool:
+        """Checks whether a chunk is in memory."""
+        return (chunk_col, chunk_row) in self._chunks
+
+    def get_chunk(self, chunk_col: int, chunk_row: int) -> np.ndarray:
+        """Returns a chunk's tiles, generating it on first access and marking it as recently used."""
+        key = (chunk_col, chunk_row)
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            return chunk
+        first_col, first_row, end_col, end_row = self.chunk_bounds(chunk_col, chunk_row)
+        generator = MapGenerator(self.sprite_table, self.grass_ids, end_col - first_col, end_row - first_row, self.chunk_seed(chunk_col, chunk_row))
+        chunk = generator.generate(with_pond=key == self.pond_chunk, **self.generation)
+        self._chunks[key] = chunk
+        logging.debug(f"Chunk {key} generated ({len(self._chunks)} loaded).")
+        if self.on_load:
+            self.on_load(chunk_col, chunk_row)
+        self._evict()
+        return chunk
+
+    def _evict(self):
+        """Drops least recently used, unedited chunks while over the memory budget."""
+        excess = len(self._chunks) - self.max_loaded_chunks
+        if excess <= 0:
+            return
+        # The most recently used chunk is never evicted, even with a tiny budget
+        for key in [key for key in list(self._chunks)[:-1] if key not in self._edited][:excess]:
+            if self.on_evict:
+                self.on_evict(*key)
+            del self._chunks[key]
+            logging.debug(f"Chunk {key} evicted.")
+
+    def touch_region(self, first_col: int, first_row: int, end_col: int, end_row: int):
+        """Loads the chunks overlapping a tile region and marks them as recently used."""
+        for chunk_row, chunk_col in self._chunks_in(first_col, first_row, end_col, end_row):
+            self.get_chunk(chunk_col, chunk_row)
+
+    def _chunks_in(self, first_col: int, first_row: int, end_col: int, end_row: int):
+        """Yields (chunk_row, chunk_col) of every chunk overlapping a tile region clamped to the grid."""
+        first_col, first_row = max(0, first_col), max(0, first_row)
+        end_col, end_row = min(self.grid_width, end_col), min(self.grid_height, end_row)
+        if first_col >= end_col or first_row >= end_row:
+            return
+        for chunk_row in range(first_row // self.chunk_size, (end_row - 1) // self.chunk_size + 1):
+            for chunk_col in range(first_col // self.chunk_size, (end_col - 1) // self.chunk_size + 1):
+                yield chunk_row, chunk_col
+
+    def get_tile(self, col: int, row: int) -> int:
+        """Returns the sprite ID at a tile."""
+        chunk = self.get_chunk(col // self.chunk_size, row // self.chunk_size)
+        return int(chunk[row % self.chunk_size, col % self.chunk_size])
+
+    def get_block(self, first_row: int, first_col: int, end_row: int, end_col: int) -> np.ndarray:
+        """Assembles a copy of a tile region (clamped to the grid) from its chunks."""
+        first_col, first_row = max(0, first_col), max(0, first_row)
+        end_col, end_row = min(self.grid_width, end_col), min(self.grid_height, end_row)
+        block = np.empty((max(0, end_row - first_row), max(0, end_col - first_col)), dtype=TILE_MAP_DTYPE)
+        for chunk_row, chunk_col in self._chunks_in(first_col, first_row, end_col, end_row):
+            chunk = self.get_chunk(chunk_col, chunk_row)
+            block[self._overlap(block, chunk_col, chunk_row, first_col, first_row, True)] = chunk[self._overlap(block, chunk_col, chunk_row, first_col, first_row, False)]
+        return block
+
+    def set_block(self, first_row: int, first_col: int, block: np.ndarray):
+        """Writes a tile region back into its chunks and pins those chunks in memory."""
+        end_row, end_col = first_row + block.shape[0], first_col + block.shape[1]
+        for chunk_row, chunk_col in self._chunks_in(first_col, first_row, end_col, end_row):
+            chunk = self.get_chunk(chunk_col, chunk_row)
+            chunk[self._overlap(block, chunk_col, chunk_row, first_col, first_row, False)] = block[self._overlap(block, chunk_col, chunk_row, first_col, first_row, True)]
+            self._edited.add((chunk_col, chunk_row))
+
+    def _overlap(self, block: np.ndarray, chunk_col: int, chunk_row: int, first_col: int, first_row: int, in_block: bool) -> Tuple[slice, slice]:
+        """Returns the slices of the overlap between a block at (first_row, first_col) and a chunk, relative to either."""
+        chunk_first_col, chunk_first_row, chunk_end_col, chunk_end_row = self.chunk_bounds(chunk_col, chunk_row)
+        r0, r1 = max(first_row, chunk_first_row), min(first_row + block.shape[0], chunk_end_row)
+        c0, c1 = max(first_col, chunk_first_col), min(first_col + block.shape[1], chunk_end_col)
+        if in_block:
+            return slice(r0 - first_row, r1 - first_row), slice(c0 - first_col, c1 - first_col)
+        return slice(r0 - chunk_first_row, r1 - chunk_first_row), slice(c0 - chunk_first_col, c1 - chunk_first_col)
@@ -1,18 +1,32 @@
 import pygame
-import networkx as nx
 import random
 import os
 import json # Needed for sprite definitions
+import numpy as np
 
 from aisim.src.core.movement import get_tile_coords, get_node_from_coords, get_coords_from_node, get_path
 from aisim.src.core.configuration import config_manager # Import the centralized config manager
+from aisim.src.core.tiles import SpriteTable, COVERED_ID, TILE_GRASS, TILE_PATH, TILE_WATER, TILE_PROP, TILE_COVERED, TILE_MAP_DTYPE
+from aisim.src.core.mapgen import MapGenerator, build_path_lut, autotile_paths
+from aisim.src.core.chunks import ChunkManager
+from aisim.src.core.assets import get_asset_bundle, GRASS_SPRITE_DEF_PATH
+from aisim.src.core.map_cache import map_cache_key, map_cache_path, load_map_cache, save_map_cache, pinned_seed
+from aisim.src.core.navigation import Navigation, footprint_flags, terrain_costs
+from aisim.src.core.congestion import CongestionGrid
+from aisim.src.core.registry import SimRegistry
 TILE_SIZE = config_manager.get_entry('city.tile_size')
+# Walk-graph edges added from each tile (right, down and both downward diagonals) as (d_col, d_row, step length)
+GRAPH_EDGES = ((1, 0, 1), (0, 1, 1), (1, 1, 1.4), (-1, 1, 1.4))
 PANEL_FONT_PATH = config_manager.get_entry('sim.panel_font_dir')
 
 class City:
     """Represents the city environment."""
-    def __init__(self, width, height):
-        """Initializes the city grid."""
+    def __init__(self, width, height, load_images=True, seed=None):
+        """Initializes the city grid for a world of width x height pixels (independent of the screen size).
+
+        With load_images False only the sprite definitions are loaded, so a City can be built without a display.
+        `seed` overrides city.generation.seed.
+        """
         print("City constructor called")
         self.width = width
         self.height = height
@@ -22,21 +36,67 @@ class City:
         # Get config values directly from config_manager
         self.grid_color = tuple(config_manager.get_entry('city.grid_color', [40, 40, 40]))
         self.tileset_path = config_manager.get_entry('city.tileset_path', 'aisim/src/graphics/v3')
+        # Map generation is deterministic per seed; without a configured seed a random one is drawn (and printed) so a map can be reproduced
+        self.seed = seed if seed is not None else config_manager.get_entry('city.generation.seed', None)
+        self.seed_is_fixed = self.seed is not None # Only maps from a known seed are worth caching (see _create_tile_map)
+        if self.seed is None:
+            self.seed = random.randrange(2**32)
         
-        self.graph = self._create_grid_graph()
+        # Streaming generates the map in chunks on demand instead of materializing the whole world
+        self.streaming = config_manager.get_entry('city.streaming.enabled', False)
+        self.chunks = None # ChunkManager, only when streaming
+        import networkx as nx # Deferred to the first City, so module imports stay cheap
+        self.graph = nx.Graph() # Built from the tile map's walkable tiles below; streaming adds chunk nodes as chunks load
+        self.path_cost = config_manager.get_entry('navigation.path_cost', 1.0) # Entry cost of path tiles (grass is 1)
         self.sprite_definitions = [] # Combined list
         self.grass_sprite_definitions = [] # Specific grass defs
         self.sprite_lookup = {}
+        self.sprite_table = SpriteTable([], TILE_SIZE) # Replaced once definitions are loaded
+        self.tile_map = None # NumPy array of sprite IDs, created by _create_tile_map
+        self.map_cache_path = None # Map cache file of this map (configured or pinned seeds only)
+        self._cached_layers = {} # Layers loaded from the map cache: tile_map, and terrain_costs and components when still valid
+        self.path_lut = None # Connectivity mask -> path sprite ID, used to autotile path edits
+        self.default_grass_id = None # Laid where a path is removed
         self.source_images = {}
+        self.load_images = load_images
+        self._scaled_sources = {} # {(source_file, zoom): scaled image}, filled lazily by draw
+        self._draw_tables = {} # {zoom: per-sprite-ID blit data}, filled lazily by draw
+        self.max_sprite_span = 1 # Largest sprite width/height in tiles, used to cull multi-tile sprites
         self._load_assets() # Loads both definition files and images
         self._create_tile_map() # Create a map of which tile to draw where
-        self.sims = [] # Initialize sims list
+        # Routing, reachability and flow fields over the full map (streamed worlds route with A* over loaded chunks)
+        self.navigation = None
+        if self.tile_map is not None:
+            planner = config_manager.get_entry('navigation.planner', 'auto')
+            if planner == 'auto': # Hierarchical search pays off once the grid is well beyond one screen
+                planner = 'hpa' if self.grid_width * self.grid_height >= config_manager.get_entry('navigation.hpa_min_tiles', 20000) else 'astar'
+            self.navigation = Navigation(self.tile_map, self.sprite_table, TILE_SIZE, planner,
+                                         config_manager.get_entry('navigation.hpa_cluster_size', 16),
+                                         config_manager.get_entry('navigation.path_workers', 2),
+                                         config_manager.get_entry('navigation.smooth_paths', True), self.path_cost,
+                                         self._cached_layers.get('terrain_costs'), self._cached_layers.get('components'),
+                                         flow_fields=config_manager.get_entry('navigation.flow_fields', True))
+        self._save_map_cache()
+        if not self.streaming:
+            self.graph = self._create_grid_graph(self._terrain_costs())
+        # Lowest entry cost of any tile; congestion only adds to it, so it keeps the A* heuristic admissible (see get_path)
+        self.graph.graph['min_cost'] = min(1.0, self.path_cost)
+        # Crowded tiles cost more to plan through (full maps with navigation only)
+        self.congestion = None
+        self.congestion_refresh = config_manager.get_entry('navigation.congestion.refresh_interval', 1.0) # Seconds between cost updates
+        self._congestion_timer = 0.0
+        if self.navigation is not None and config_manager.get_entry('navigation.congestion.enabled', True):
+            self.congestion = CongestionGrid((self.grid_height, self.grid_width),
+                                             config_manager.get_entry('navigation.congestion.half_life', 10.0),
+                                             config_manager.get_entry('navigation.congestion.weight', 0.5),
+                                             config_manager.get_entry('navigation.congestion.max_penalty', 2.0))
+        self.registry = SimRegistry() # Sims by ID, with indexes of interacting Sims and Sims per tile
         self.pending_romance_analysis = set() # Track (sim_id1, sim_id2) pairs awaiting analysis
         self.ollama_client_locked = False # Global lock for Ollama client access during conversations
     def _load_assets(self):
         """Loads sprite definitions from primary and grass JSON files, and the required tileset images."""
         main_sprite_def_path = config_manager.get_entry('city.sprite_definitions_path', 'aisim/config/sprite_definitions.json')
-        grass_sprite_def_path = 'aisim/config/sprite_grass.json' # Hardcoded for now, could be config
+        grass_sprite_def_path = GRASS_SPRITE_DEF_PATH # Hardcoded for now, could be config
 
         self.sprite_definitions = []
         self.grass_sprite_definitions = []
@@ -44,6 +104,18 @@ class City:
         self.source_images = {}
         all_definitions = []
 
+        # 0. Prefer the prebuilt asset bundle: definitions and raw pixels without JSON files or PNG decoding
+        bundle = get_asset_bundle()
+        if bundle is not None:
+            self.grass_sprite_definitions = bundle.grass_sprite_definitions
+            self._finalize_definitions(bundle.sprite_definitions + bundle.grass_sprite_definitions)
+            for sprite_def in self.sprite_definitions if self.load_images else ():
+                source_file = sprite_def.get('source_file')
+                if source_file and source_file not in self.source_images and bundle.has_image(source_file):
+                    self.source_images[source_file] = bundle.get_image(source_file)
+            print(f"Loaded {len(self.sprite_definitions)} sprite definitions and {len(self.source_images)} source images from asset bundle {bundle.path}.")
+            return
+
         # 1. Load Main Sprite Definitions
         try:
             with open(main_sprite_def_path, 'r') as f:
@@ -80,9 +152,10 @@ class City:
             return
 
         # 3. Finalize Combined Definitions and Lookup
-        self.sprite_definitions = all_definitions
-        self.sprite_lookup = {s['name']: s for s in self.sprite_definitions}
+        self._finalize_definitions(all_definitions)
         print(f"Total unique sprite definitions loaded: {len(self.sprite_definitions)}")
+        if not self.load_images:
+            return
 
         # 4. Load Source Images (based on combined definitions)
         loaded_sources = set()
@@ -122,312 +195,343 @@ class City:
 
         print(f"Loaded {len(self.source_images)} unique source images.")
 
+    def _finalize_definitions(self, all_definitions):
+        """Sets the combined sprite definitions and builds the lookup and sprite table from them."""
+        self.sprite_definitions = all_definitions
+        self.sprite_lookup = {s['name']: s for s in self.sprite_definitions}
+        self.sprite_table = SpriteTable(self.sprite_definitions, TILE_SIZE)
+        self.max_sprite_span = max([1] + [(max(s.get('width', 0), s.get('height', 0)) + TILE_SIZE - 1) // TILE_SIZE for s in self.sprite_definitions])
+
     def _create_tile_map(self):
-        """Creates a 2D array representing the visual tile map using loaded sprite definitions,
+        """Creates a 2D array of sprite IDs representing the visual tile map,
            prioritizing grass sprites from the dedicated grass definition file."""
-        self.tile_map = [[None for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-
-        # Get lists of sprite names by type using the combined definitions
-        def get_sprites_starting_with(prefixes):
-            if isinstance(prefixes, str): prefixes = (prefixes,)
-            return [s['name'] for s in self.sprite_definitions if s.get('name', '').startswith(prefixes)]
+        self.tile_map = np.full((self.grid_height, self.grid_width), COVERED_ID, dtype=TILE_MAP_DTYPE)
+        grass_ids = [self.sprite_table.get_id(s['name']) for s in self.grass_sprite_definitions if s.get('name')] # Keep separate grass list for base filling
 
-        grass_sprites = [s['name'] for s in self.grass_sprite_definitions if s.get('name')] # Keep separate grass list for base filling
-        path_sprites = get_sprites_starting_with('path_')
-        water_sprites = get_sprites_starting_with('water_')
-        prop_sprites = get_sprites_starting_with(('tree_', 'bush_', 'barrel', 'fence_', 'signpost_'))
-
-        if not grass_sprites:
+        if not grass_ids:
              print("Error: No grass sprites found in the dedicated grass definitions. Cannot generate map.")
              # Need at least one grass sprite to function
              return
-        else:
-             default_grass = random.choice(grass_sprites)
 
-        # 1. Fill base with random grass
-        for r in range(self.grid_height):
-            for c in range(self.grid_width):
-                # Always use grass sprites from the dedicated list
-                self.tile_map[r][c] = random.choice(grass_sprites)
-
-        # 2. Add some water (example: a large pond)
-        if 'water_pond_large' in self.sprite_lookup:
-            pond_def = self.sprite_lookup['water_pond_large']
-            pond_w_tiles = pond_def['width'] // TILE_SIZE
-            pond_h_tiles = pond_def['height'] // TILE_SIZE
-            # Place pond somewhere near center, avoiding edges
-            if self.grid_width > pond_w_tiles + 4 and self.grid_height > pond_h_tiles + 4:
-                r_start = (self.grid_height - pond_h_tiles) // 2
-                c_start = (self.grid_width - pond_w_tiles) // 2
-                # Place the main sprite name at top-left
-                self.tile_map[r_start][c_start] = 'water_pond_large'
-                # Mark other covered cells (optional, draw logic might handle overlap)
-                # For simplicity, let draw handle overlap for now.
-                # We might need to clear grass underneath if draw doesn't layer properly.
-                for r_offset in range(pond_h_tiles):
-                    for c_offset in range(pond_w_tiles):
-                        if r_offset == 0 and c_offset == 0: continue # Skip top-left
-                        # Mark as occupied or clear grass? Let's clear.
-                        if r_start + r_offset < self.grid_height and c_start + c_offset < self.grid_width:
-                             self.tile_map[r_start + r_offset][c_start + c_offset] = None # Indicate covered by large sprite
-
-        # 3. Generate twisting paths
-        self._generate_twisting_paths(num_paths=3, max_steps=100) # Example parameters
-
-        # 4. Add random props
-        num_props = 50
-        for _ in range(num_props):
-            if not prop_sprites: break
-            prop_name = random.choice(prop_sprites)
-            prop_def = self.sprite_lookup[prop_name]
-            prop_w_tiles = (prop_def['width'] + TILE_SIZE - 1) // TILE_SIZE # Ceiling division
-            prop_h_tiles = (prop_def['height'] + TILE_SIZE - 1) // TILE_SIZE
-
-            # Try placing randomly, ensuring it fits and doesn't overwrite important things
-            attempts = 0
-            placed = False
-            while attempts < 10 and not placed:
-                r = random.randint(0, self.grid_height - prop_h_tiles)
-                c = random.randint(0, self.grid_width - prop_w_tiles)
-
-                can_place = self._is_placement_valid(r, c, prop_h_tiles, prop_w_tiles)
-
-                if can_place:
-                    # Place prop name at top-left
-                    self.tile_map[r][c] = prop_name
-                    # Clear other covered cells (similar to pond)
-                    for ro in range(prop_h_tiles):
-                        for co in range(prop_w_tiles):
-                            if ro == 0 and co == 0: continue
-                            self.tile_map[r + ro][c + co] = None # Mark as covered
-                    placed = True
-                attempts += 1
-
-        print("Tile map created with new sprite logic.")
+        self.default_grass_id = grass_ids[0]
+        self.path_lut = build_path_lut(self.sprite_table, self.default_grass_id)
+        if self.streaming:
+            self.tile_map = None
+            self.chunks = ChunkManager(self.sprite_table, grass_ids, self.grid_width, self.grid_height, self.seed,
+                                       chunk_size=config_manager.get_entry('city.streaming.chunk_size', 32),
+                                       max_loaded_chunks=config_manager.get_entry('city.streaming.max_loaded_chunks', 64),
+                                       generation=config_manager.get_entry('city.streaming.chunk_generation', {}))
+            self.chunks.on_load = self._add_chunk_to_graph
+            self.chunks.on_evict = self._remove_chunk_from_graph
+            print(f"Streaming tile map in {self.chunks.chunks_x}x{self.chunks.chunks_y} chunks (seed {self.seed}).")
+            return
+        generation = {
+            'num_paths': config_manager.get_entry('city.generation.num_paths', 3),
+            'path_max_steps': config_manager.get_entry('city.generation.path_max_steps', 100),
+            'num_props': config_manager.get_entry('city.generation.num_props', 50),
+        }
+
+        # Reuse the map generated by an earlier launch with the same seed, grid size and sprites
+        cache_enabled = config_manager.get_entry('city.cache.enabled', True)
+        if not self.seed_is_fixed and cache_enabled and config_manager.get_entry('city.cache.pin_seed', False):
+            # Opt-in: the first launch without a seed pins one, so later launches load the cached map
+            self.seed = pinned_seed(config_manager.get_entry('city.cache.dir', 'aisim/cache'))
+            self.seed_is_fixed = True
+        if self.seed_is_fixed and cache_enabled:
+            key = map_cache_key(self.seed, self.grid_width, self.grid_height, self.sprite_definitions, generation)
+            self.map_cache_path = map_cache_path(config_manager.get_entry('city.cache.dir', 'aisim/cache'), key)
+            layers = load_map_cache(self.map_cache_path)
+            if layers is not None and layers.get('tile_map') is not None and layers['tile_map'].shape == self.tile_map.shape:
+                self.tile_map = layers['tile_map'].astype(TILE_MAP_DTYPE, copy=False)
+                self._cached_layers = {'tile_map': self.tile_map}
+                # Terrain costs depend on navigation.path_cost as well, so they are only reused for the same value
+                if layers.get('path_cost') is not None and float(layers['path_cost']) == np.float32(self.path_cost) and \
+                   all(name in layers and layers[name].shape == self.tile_map.shape for name in ('terrain_costs', 'components')):
+                    self._cached_layers['terrain_costs'] = layers['terrain_costs'].astype(np.float32, copy=False)
+                    self._cached_layers['components'] = layers['components'].astype(np.int32, copy=False)
+                print(f"Tile map loaded from cache {self.map_cache_path} (seed {self.seed}).")
+                return
+
+        generator = MapGenerator(self.sprite_table, grass_ids, self.grid_width, self.grid_height, self.seed)
+        self.tile_map = generator.generate(**generation)
+        print(f"Tile map created (seed {self.seed}).")
+
+    def _save_map_cache(self):
+        """Writes the tile map, with the terrain costs and component labels derived from it, to the map cache unless it holds them already."""
+        if self.map_cache_path is None or self.tile_map is None:
+            return
+        layers = {'tile_map': self.tile_map}
+        if self.navigation is not None:
+            layers.update(terrain_costs=self.navigation.terrain, components=self.navigation.components,
+                          path_cost=np.float32(self.path_cost))
+        if all(name in self._cached_layers for name in layers if name != 'path_cost'):
+            return
+        save_map_cache(self.map_cache_path, layers)
+
+    def _place_sprite(self, r_start, c_start, sprite_id):
+        """Places a sprite ID at its top-left cell and marks the rest of its footprint as covered."""
+        height_tiles = int(self.sprite_table.span_h[sprite_id])
+        width_tiles = int(self.sprite_table.span_w[sprite_id])
+        self.tile_map[r_start:r_start + height_tiles, c_start:c_start + width_tiles] = COVERED_ID # Slicing clips at the map edge
+        self.tile_map[r_start, c_start] = sprite_id
 
     def _is_placement_valid(self, r_start, c_start, height_tiles, width_tiles):
         """Checks if a multi-tile object can be placed at the given location."""
-        for r_offset in range(height_tiles):
-            for c_offset in range(width_tiles):
-                r, c = r_start + r_offset, c_start + c_offset
-                # Check bounds
-                if not (0 <= r < self.grid_height and 0 <= c < self.grid_width):
-                    return False
-                # Check tile content
-                tile = self.tile_map[r][c]
-                # Cannot place if tile is None (covered by large sprite), path, water,
-                # or another prop's non-origin tile.
-                if tile is None or tile.startswith(('path_', 'water_')) or \
-                   (tile.startswith('prop_') and (r_offset > 0 or c_offset > 0)):
-                    return False
-        return True
-
-
-    def _generate_twisting_paths(self, num_paths=1, max_steps=50):
-        """Generates twisting paths using a random walk algorithm."""
-        print(f"Generating {num_paths} twisting paths (max steps: {max_steps})...")
-        path_tiles = set() # Keep track of coordinates that are part of any path
-
-        for path_idx in range(num_paths):
-            # --- Choose Starting Point ---
-            # Start near an edge, avoiding corners initially
-            start_r, start_c = -1, -1
-            attempts = 0
-            while attempts < 20: # Try finding a non-path start point
-                edge = random.choice(['top', 'bottom', 'left', 'right'])
-                if edge == 'top':
-                    start_r, start_c = 0, random.randint(1, self.grid_width - 2)
-                elif edge == 'bottom':
-                    start_r, start_c = self.grid_height - 1, random.randint(1, self.grid_width - 2)
-                elif edge == 'left':
-                    start_r, start_c = random.randint(1, self.grid_height - 2), 0
-                else: # right
-                    start_r, start_c = random.randint(1, self.grid_height - 2), self.grid_width - 1
-
-                # Ensure start is not water/prop and not already a path
-                if self._is_placement_valid(start_r, start_c, 1, 1) and (start_r, start_c) not in path_tiles:
-                     break
-                attempts += 1
-            
-            if attempts == 20:
-                print(f"Path {path_idx+1}: Could not find valid starting point after {attempts} attempts. Skipping.")
-                continue # Skip this path if no valid start found
-
-            print(f"Path {path_idx+1}: Starting at ({start_c}, {start_r})")
-            
-            curr_r, curr_c = start_r, start_c
-            prev_r, prev_c = -1, -1 # No previous tile initially
-            path_tiles.add((curr_r, curr_c))
-            # Initial tile is an end piece (determined later by first step)
-
-            # --- Random Walk ---
-            for step in range(max_steps):
-                possible_next_steps = []
-                # N, S, E, W directions (dr, dc)
-                for dr, dc in [(-1, 0), (1, 0), (0, 1), (0, -1)]:
-                    next_r, next_c = curr_r + dr, curr_c + dc
-
-                    # Check bounds
-                    if not (0 <= next_r < self.grid_height and 0 <= next_c < self.grid_width):
-                        continue
-
-                    # Check if it's the previous tile (avoid immediate U-turn)
-                    if next_r == prev_r and next_c == prev_c:
-                        continue
-
-                    # Check if tile is valid for path (grass or existing path)
-                    tile_content = self.tile_map[next_r][next_c]
-                    is_grass = tile_content and tile_content.startswith('grass_')
-                    is_existing_path = (next_r, next_c) in path_tiles
-                    if not (is_grass or is_existing_path):
-                         # Allow placing paths only on grass or existing paths
-                         # Avoid water, props, None (covered tiles)
-                         continue
-
-                    # Add valid step (with bias: prefer straight/turn over existing path)
-                    weight = 1.0 if is_grass else 0.3 # Lower weight for joining existing paths
-                    # Add slight bias for continuing straight if possible
-                    if prev_r != -1: # Check if not the first step
-                        if curr_r + (curr_r - prev_r) == next_r and curr_c + (curr_c - prev_c) == next_c:
-                            weight *= 1.5 # Favor going straight
-                    
-                    possible_next_steps.append(((next_r, next_c), weight))
-
-                if not possible_next_steps:
-                    print(f"Path {path_idx+1}: Walker stuck at ({curr_c}, {curr_r}) after {step} steps.")
-                    break # Walker is stuck
-
-                # --- Choose Next Step (Weighted Random) ---
-                steps, weights = zip(*possible_next_steps)
-                chosen_next_r, chosen_next_c = random.choices(steps, weights=weights, k=1)[0]
-                print(f"  Step {step+1}: Moving from ({curr_c},{curr_r}) to ({chosen_next_c},{chosen_next_r})")
-
-                # --- Update Tile Sprites ---
-                # Update the *current* tile based on new connection
-                self.tile_map[curr_r][curr_c] = self._get_path_sprite_name(curr_r, curr_c, path_tiles, (chosen_next_r, chosen_next_c))
-                path_tiles.add((curr_r, curr_c)) # Ensure it's marked as path
-
-                # Update the *previous* tile if it exists (its connections might have changed)
-                if prev_r != -1:
-                     self.tile_map[prev_r][prev_c] = self._get_path_sprite_name(prev_r, prev_c, path_tiles)
-                
-                # Set the new current tile (initially as an end pointing back)
-                # This will be corrected in the next iteration or at the end
-                self.tile_map[chosen_next_r][chosen_next_c] = self._get_path_sprite_name(chosen_next_r, chosen_next_c, path_tiles, (curr_r, curr_c))
-                path_tiles.add((chosen_next_r, chosen_next_c))
-
-                # Move walker
-                prev_r, prev_c = curr_r, curr_c
-                curr_r, curr_c = chosen_next_r, chosen_next_c
-
-            # --- Finalize Last Tile ---
-            # After loop ends (stuck or max_steps), update the last tile placed
-            self.tile_map[curr_r][curr_c] = self._get_path_sprite_name(curr_r, curr_c, path_tiles)
-            # Also update the second-to-last tile
-            if prev_r != -1:
-                 self.tile_map[prev_r][prev_c] = self._get_path_sprite_name(prev_r, prev_c, path_tiles)
-            print(f"Path {path_idx+1}: Finished.")
-
-        print("Finished generating all paths.")
-
-
-    def _get_path_sprite_name(self, r, c, path_tiles, next_connection=None):
-        """Determines the correct path sprite name based on neighboring path tiles."""
-        
-        # Check neighbors (N, S, E, W)
-        neighbors = {
-            'N': (r - 1, c),
-            'S': (r + 1, c),
-            'E': (r, c + 1),
-            'W': (r, c - 1)
-        }
-        
-        connected = {'N': False, 'S': False, 'E': False, 'W': False}
-        
-        # Check existing path tiles
-        for direction, (nr, nc) in neighbors.items():
-            if (nr, nc) in path_tiles:
-                connected[direction] = True
-                
-        # Include the immediate next step if provided (ensures connection during walk)
-        if next_connection:
-             for direction, (nr, nc) in neighbors.items():
-                 if (nr, nc) == next_connection:
-                     connected[direction] = True
-                     break # Found the explicit connection
-
-        # Determine sprite based on connections (using dirt path placeholders)
-        n, s, e, w = connected['N'], connected['S'], connected['E'], connected['W']
-        num_connections = sum(connected.values())
-
-        # Default to grass if somehow isolated (shouldn't happen in walk)
-        sprite_name = random.choice(self.grass_sprite_definitions)['name'] if self.grass_sprite_definitions else 'grass_plain_1'
-
-        if num_connections == 1:
-            if n: sprite_name = 'path_dirt_v_end' # End pointing South
-            elif s: sprite_name = 'path_dirt_v_end' # End pointing North (use same sprite, visual rotation needed later)
-            elif e: sprite_name = 'path_dirt_h_end' # End pointing West
-            elif w: sprite_name = 'path_dirt_h_end' # End pointing East
-        elif num_connections == 2:
-            if n and s: sprite_name = 'path_dirt_v_straight'
-            elif e and w: sprite_name = 'path_dirt_h_straight'
-            elif n and e: sprite_name = 'path_dirt_corner_ne'
-            elif n and w: sprite_name = 'path_dirt_corner_nw'
-            elif s and e: sprite_name = 'path_dirt_corner_se'
-            elif s and w: sprite_name = 'path_dirt_corner_sw'
-        elif num_connections == 3:
-            if n and s and e: sprite_name = 'path_dirt_t_nse'
-            elif n and s and w: sprite_name = 'path_dirt_t_nsw'
-            elif n and e and w: sprite_name = 'path_dirt_t_new'
-            elif s and e and w: sprite_name = 'path_dirt_t_sew'
-        elif num_connections == 4:
-            sprite_name = 'path_dirt_cross_nsew'
-        # else num_connections == 0: use default grass
-
-        # Ensure the chosen sprite exists in our lookup
-        if sprite_name not in self.sprite_lookup:
-             print(f"Warning: Calculated path sprite '{sprite_name}' not found in lookup. Falling back to default grass.")
-             sprite_name = random.choice(self.grass_sprite_definitions)['name'] if self.grass_sprite_definitions else 'grass_plain_1'
-
-        # print(f"  Sprite for ({c},{r}): N={n}, S={s}, E={e}, W={w} -> {sprite_name}") # Debugging sprite choice
-        return sprite_name
-
+        # Check bounds
+        if r_start < 0 or c_start < 0 or r_start + height_tiles > self.grid_height or c_start + width_tiles > self.grid_width:
+            return False
+        footprint = self.sprite_table.flags[self.tile_map[r_start:r_start + height_tiles, c_start:c_start + width_tiles]]
+        # Cannot place if a cell is covered by a large sprite, path, or water,
+        # or if another prop sits on a non-origin cell.
+        if np.any(footprint & (TILE_COVERED | TILE_PATH | TILE_WATER)):
+            return False
+        footprint_props = (footprint & TILE_PROP) != 0
+        footprint_props[0, 0] = False
+        return not footprint_props.any()
+
+    @property
+    def sims(self):
+        """The registered Sims, in the order they were added."""
+        return self.registry.sims
+
+    def close(self):
+        """Releases background resources (the path-planning worker pool) and takes the Sims out of their population.
+
+        The population may outlive the City (Sims join the shared `sim_population` by default),
+        so a discarded City's Sims would otherwise keep being updated with the next one's.
+        """
+        if self.navigation is not None:
+            self.navigation.close()
+        for sim in self.registry.sims:
+            sim.leave_population()
+
+    def has_tiles(self):
+        """Checks whether a tile map (or chunk manager) is available."""
+        return self.tile_map is not None or self.chunks is not None
+
+    def get_tile_block(self, first_row, first_col, end_row, end_col):
+        """Returns the sprite IDs of a tile region clamped to the grid (a view of the map, or a copy assembled from chunks)."""
+        if self.chunks is not None:
+            return self.chunks.get_block(first_row, first_col, end_row, end_col)
+        return self.tile_map[max(0, first_row):end_row, max(0, first_col):end_col]
+
+    def set_path(self, col, row, is_path=True):
+        """Adds or removes a path at (col, row) and re-autotiles the affected neighbourhood."""
+        if not self.has_tiles() or self.path_lut is None or not (0 <= row < self.grid_height and 0 <= col < self.grid_width):
+            return
+        # Work on a small block so the same code edits the full map and streamed chunks
+        first_row, first_col = max(0, row - 2), max(0, col - 2)
+        block = self.get_tile_block(first_row, first_col, row + 3, col + 3)
+        local_row, local_col = row - first_row, col - first_col
+        if not self.sprite_table.has(block[local_row, local_col], TILE_GRASS if is_path else TILE_PATH):
+            return # Paths are only laid on grass, and only existing paths are removed
+        # Any path sprite marks the cell; removed paths turn back into the default grass
+        block[local_row, local_col] = self.path_lut[15] if is_path else self.default_grass_id
+        autotile_paths(block, self.sprite_table, self.path_lut, local_row, local_col, local_row + 1, local_col + 1)
+        if self.chunks is not None:
+            self.chunks.set_block(first_row, first_col, block)
+        elif self.navigation is not None:
+            self.navigation.update_terrain(self.tile_map, (col, row, col + 1, row + 1))
+        if self.navigation is not None:
+            self._set_graph_cost(col, row, float(self.navigation.costs[row, col])) # Includes congestion
+        else:
+            self._set_graph_cost(col, row, self.path_cost if is_path else 1.0)
+
+    def get_tile_type(self, col, row):
+        """Returns the readable type of the tile at (col, row), e.g. "grass" or "path"."""
+        if not self.has_tiles() or not (0 <= row < self.grid_height and 0 <= col < self.grid_width):
+            return "unknown"
+        if self.chunks is not None:
+            return self.sprite_table.classify(self.chunks.get_tile(col, row))
+        return self.sprite_table.classify(self.tile_map[row, col])
+
+    def get_tile_mask(self, flags):
+        """Returns a boolean (grid_height, grid_width) array of tiles having any of the given category flags.
+
+        When streaming, this loads every chunk, so prefer region queries through get_tile_block.
+        """
+        return self.sprite_table.mask(self.get_tile_block(0, 0, self.grid_height, self.grid_width), flags)
+
+    def _streaming_area(self, x, y):
+        """Returns the tile region kept loaded around a world position when streaming (one chunk across, centered on it)."""
+        col, row = get_tile_coords(x, y, self.grid_width, self.grid_height)
+        half = self.chunks.chunk_size // 2
+        return col - half, row - half, col + half + 1, row + half + 1
+
+    def _terrain_costs(self):
+        """Returns the per-tile entry costs of the full map (inf = not walkable), or None without a tile map."""
+        if self.navigation is not None:
+            return self.navigation.costs
+        if self.tile_map is None:
+            return None
+        return terrain_costs(footprint_flags(self.tile_map, self.sprite_table), self.path_cost)
+
+    def random_destination(self, near=None):
+        """Returns a random world pixel position for a Sim to walk to.
+
+        On a full map, the destination is the center of a walkable tile reachable from
+        `near` (from anywhere when not given), so searches toward it cannot fail. When
+        streaming, the destination stays inside the loaded area around `near`, so
+        pathfinding never has to search (or load) far-away chunks.
+        """
+        if self.chunks is None:
+            tile = self.navigation.random_tile(near) if self.navigation is not None else self._random_graph_tile()
+            if tile is None:
+                return (random.randint(0, self.width), random.randint(0, self.height))
+            return ((tile[0] + 0.5) * TILE_SIZE, (tile[1] + 0.5) * TILE_SIZE)
+        if near is None:
+            return (random.randint(0, self.width), random.randint(0, self.height))
+        first_col, first_row, end_col, end_row = self._streaming_area(*near)
+        self.chunks.touch_region(first_col, first_row, end_col, end_row)
+        first_col, first_row = max(0, first_col), max(0, first_row)
+        end_col, end_row = min(self.grid_width, end_col), min(self.grid_height, end_row)
+        return (random.randint(first_col * TILE_SIZE, end_col * TILE_SIZE - 1), random.randint(first_row * TILE_SIZE, end_row * TILE_SIZE - 1))
+
+    def _random_graph_tile(self, attempts=100):
+        """Returns a random tile of the walk graph (without reachability labels), or None."""
+        for _ in range(attempts):
+            tile = (random.randrange(self.grid_width), random.randrange(self.grid_height))
+            if tile in self.graph:
+                return tile
+        return None
 
     def city_update(self, dt):
-        """Updates the city state (placeholder)."""
-        pass # No updates needed for a static grid/graph yet
-
-    def _create_grid_graph(self):
-        """Creates a NetworkX graph representing the walkable grid."""
+        """Updates the city state: keeps the chunks around Sims loaded when streaming and feeds congestion into path costs."""
+        if self.congestion is not None:
+            self.congestion.decay(dt)
+            self._congestion_timer += dt
+            if self._congestion_timer >= self.congestion_refresh:
+                self._congestion_timer = 0.0
+                self.update_congestion_costs()
+        if self.chunks is None:
+            return
+        for sim in self.sims:
+            self.chunks.touch_region(*self._streaming_area(sim.x, sim.y))
+
+    def update_congestion_costs(self):
+        """Hands the current congestion penalty to the planners and re-weighs the walk graph where costs changed."""
+        costs = self.navigation.costs
+        for col, row in self.navigation.set_penalty(self.congestion.penalty()):
+            self._set_graph_cost(col, row, float(costs[row, col]))
+
+    def _add_chunk_to_graph(self, chunk_col, chunk_row):
+        """Adds a newly loaded chunk's tiles to the walk graph and links them to loaded neighbours."""
+        first_col, first_row, end_col, end_row = self.chunks.chunk_bounds(chunk_col, chunk_row)
+        half_tile = TILE_SIZE / 2
+        graph = self.graph
+        # Footprints crossing into a neighbouring chunk only block the chunk holding their anchor tile
+        costs = terrain_costs(footprint_flags(self.chunks.get_chunk(chunk_col, chunk_row), self.sprite_table), self.path_cost).tolist()
+        graph.add_nodes_from(((c, r), {'pos': (c * TILE_SIZE + half_tile, r * TILE_SIZE + half_tile), 'cost': costs[r - first_row][c - first_col]})
+                             for r in range(first_row, end_row) for c in range(first_col, end_col)
+                             if costs[r - first_row][c - first_col] != float('inf'))
+        # Same edge pattern as _create_grid_graph, in both directions so chunk borders connect
+        nodes = graph.nodes
+        edges = []
+        for r in range(first_row, end_row):
+            for c in range(first_col, end_col):
+                if (c, r) not in graph:
+                    continue
+                cost = nodes[(c, r)]['cost']
+                for dc, dr, step in GRAPH_EDGES:
+                    if (c + dc, r + dr) in graph:
+                        edges.append(((c, r), (c + dc, r + dr), step * (cost + nodes[(c + dc, r + dr)]['cost']) / 2))
+                    if (c - dc, r - dr) in graph:
+                        edges.append(((c - dc, r - dr), (c, r), step * (cost + nodes[(c - dc, r - dr)]['cost']) / 2))
+        graph.add_weighted_edges_from(edges)
+
+    def _remove_chunk_from_graph(self, chunk_col, chunk_row):
+        """Removes an evicted chunk's tiles from the walk graph."""
+        first_col, first_row, end_col, end_row = self.chunks.chunk_bounds(chunk_col, chunk_row)
+        self.graph.remove_nodes_from((c, r) for r in range(first_row, end_row) for c in range(first_col, end_col))
+
+    def _create_grid_graph(self, costs=None):
+        """Creates a NetworkX graph of the walkable tiles from per-tile entry costs (every tile at cost 1 without them).
+
+        An edge weighs its step length times the mean cost of its two tiles.
+        """
+        import networkx as nx
         G = nx.Graph()
         half_tile = TILE_SIZE / 2
         print(f"City grid_width: {self.grid_width}, grid_height: {self.grid_height}")
+        costs = costs.tolist() if costs is not None else [[1.0] * self.grid_width for _ in range(self.grid_height)]
         for r in range(self.grid_height):
             for c in range(self.grid_width):
+                if costs[r][c] == float('inf'): # Water and props
+                    continue
                 node_id = (c, r) # Use grid coords as node ID
                 center_x = c * TILE_SIZE + half_tile
                 center_y = r * TILE_SIZE + half_tile
-                G.add_node(node_id, pos=(center_x, center_y))
-
-                # Add edges to neighbors (right and down to avoid duplicates)
-                # Check right neighbor
-                if c + 1 < self.grid_width:
-                    neighbor_id = (c + 1, r)
-                    G.add_edge(node_id, neighbor_id, weight=1) # Assuming uniform cost for now
-                # Check down neighbor
-                if r + 1 < self.grid_height:
-                    neighbor_id = (c, r + 1)
-                    G.add_edge(node_id, neighbor_id, weight=1)
-                # Check diagonal neighbor (bottom-right)
-                if c + 1 < self.grid_width and r + 1 < self.grid_height:
-                    neighbor_id = (c + 1, r + 1)
-                    G.add_edge(node_id, neighbor_id, weight=1.4)  # Slightly higher cost for diagonal movement
+                G.add_node(node_id, pos=(center_x, center_y), cost=costs[r][c])
+        for c, r in list(G.nodes):
+            # Edges to the right and downward neighbours only, so each is added once
+            for dc, dr, step in GRAPH_EDGES:
+                neighbor_id = (c + dc, r + dr)
+                if neighbor_id in G:
+                    G.add_edge((c, r), neighbor_id, weight=step * (costs[r][c] + costs[r + dr][c + dc]) / 2)
         print(f"Graph has {len(G.nodes)} nodes.")
         return G
 
+    def _set_graph_cost(self, col, row, cost):
+        """Re-weighs the walk-graph edges of a tile whose entry cost changed (path edits never change walkability)."""
+        node_id = (col, row)
+        if node_id not in self.graph:
+            return
+        nodes = self.graph.nodes
+        nodes[node_id]['cost'] = cost
+        for neighbor_id in self.graph.neighbors(node_id):
+            step = 1.4 if neighbor_id[0] != col and neighbor_id[1] != row else 1
+            self.graph.edges[node_id, neighbor_id]['weight'] = step * (cost + nodes[neighbor_id]['cost']) / 2
+
+    def _get_scaled_source(self, source_file, zoom):
+        """Returns the source image scaled for the given zoom, caching each scaled copy."""
+        image = self.source_images[source_file]
+        if zoom == 1.0:
+            return image
+        key = (source_file, zoom)
+        scaled = self._scaled_sources.get(key)
+        if scaled is None:
+            scaled = pygame.transform.scale(image, (round(image.get_width() * zoom), round(image.get_height() * zoom)))
+            self._scaled_sources[key] = scaled
+        return scaled
+
+    def _get_draw_table(self, zoom):
+        """Returns (per-ID (image, area) list, base grass (image, area)) for a zoom level, building it once per zoom."""
+        table = self._draw_tables.get(zoom)
+        if table is not None:
+            return table
+        tile_px = round(TILE_SIZE * zoom)
+
+        def solid_tile(color):
+            surface = pygame.Surface((tile_px, tile_px))
+            surface.fill(color)
+            return (surface, None)
+
+        def scale_rect(rect):
+            return pygame.Rect(round(rect.x * zoom), round(rect.y * zoom), round(rect.width * zoom), round(rect.height * zoom))
+
+        missing_source = solid_tile((255, 0, 255)) # Magenta fallback
+        sprites = [solid_tile((255, 255, 0))] # ID 0 (covered) is never drawn; yellow marks invalid use
+        for sprite_id in range(1, len(self.sprite_table)):
+            source_file = self.sprite_table.definitions[sprite_id].get('source_file')
+            if source_file and source_file in self.source_images:
+                sprites.append((self._get_scaled_source(source_file, zoom), scale_rect(self.sprite_table.source_rects[sprite_id])))
+            else:
+                sprites.append(missing_source) # Source image missing
+
+        # Get a default grass sprite (from the dedicated list) for layering
+        base_blit = solid_tile(self.grid_color) # Fallback if default grass isn't available/valid
+        default_grass_name = next((s['name'] for s in self.grass_sprite_definitions if s.get('name')), None)
+        default_grass_id = self.sprite_table.get_id(default_grass_name) if default_grass_name else None
+        if default_grass_id is not None and sprites[default_grass_id] is not missing_source and \
+           self.sprite_table.source_rects[default_grass_id].size == (TILE_SIZE, TILE_SIZE):
+            base_blit = sprites[default_grass_id]
+
+        table = (sprites, base_blit)
+        self._draw_tables[zoom] = table
+        return table
 
-    def draw(self, screen):
-        """Draws the city using the generated tile map, optionally adding debug borders."""
+    def draw(self, screen, camera=None):
+        """Draws the tiles visible through the camera (the whole map without one), optionally adding debug borders."""
         # Initialize font for debug text if needed
         debug_font = None
         show_debug_borders = config_manager.get_entry('city.debug_border', False)
@@ -440,72 +544,56 @@ class City:
                 show_debug_borders = False # Disable if font fails
 
         # --- Check Assets ---
-        if not hasattr(self, 'tile_map') or not self.tile_map or \
-           not hasattr(self, 'sprite_lookup') or not self.sprite_lookup or \
-           not hasattr(self, 'source_images') or not self.source_images:
+        if not self.has_tiles() or not self.sprite_lookup or not self.source_images:
             # Fallback if assets weren't loaded correctly
             screen.fill((50, 50, 50)) # Dark grey background
             if not pygame.font.get_init(): pygame.font.init() # Ensure font is initialized
             fallback_font = pygame.font.SysFont(None, 30)
             text_surface = fallback_font.render("Error loading city assets!", True, (255, 0, 0))
-            text_rect = text_surface.get_rect(center=(self.width / 2, self.height / 2))
+            text_rect = text_surface.get_rect(center=screen.get_rect().center)
             screen.blit(text_surface, text_rect)
             return
 
-        # --- Draw Tiles using Sprite Definitions ---
-        # Get a default grass sprite (from the dedicated list) for layering
-        default_grass_name = next((s['name'] for s in self.grass_sprite_definitions if s.get('name')), None)
-        default_grass_def = self.sprite_lookup.get(default_grass_name) if default_grass_name else None
-        default_grass_img = self.source_images.get(default_grass_def['source_file']) if default_grass_def else None
-        default_grass_rect = pygame.Rect(default_grass_def['x'], default_grass_def['y'], default_grass_def['width'], default_grass_def['height']) if default_grass_def else None
-
-        for r in range(self.grid_height):
-            for c in range(self.grid_width):
-                tile_name = self.tile_map[r][c]
-                dest_pos = (c * TILE_SIZE, r * TILE_SIZE)
-
-                # --- Draw Base Layer (usually default grass) ---
-                # Draw default grass if the tile is None (covered) or if it's a prop
-                is_prop = tile_name and tile_name.startswith(('tree_', 'bush_', 'barrel', 'fence_', 'signpost_'))
-                should_draw_base = (tile_name is None or is_prop)
-
-                if should_draw_base:
-                    if default_grass_img and default_grass_rect and default_grass_rect.size == (TILE_SIZE, TILE_SIZE):
-                        screen.blit(default_grass_img, dest_pos, area=default_grass_rect)
-                    else:
-                        # Fallback if default grass isn't available/valid
-                        pygame.draw.rect(screen, self.grid_color, (*dest_pos, TILE_SIZE, TILE_SIZE))
-
-                # If the tile was covered (None), we've drawn the base, so continue
-                if tile_name is None:
-                    continue
-
-                # --- Draw Top Layer (Specific Tile/Prop) ---
-                # If tile has a name, draw its specific sprite
-                if tile_name in self.sprite_lookup:
-                    sprite_def = self.sprite_lookup[tile_name]
-                    source_file = sprite_def.get('source_file')
-
-                    if source_file and source_file in self.source_images:
-                        source_img = self.source_images[source_file]
-                        source_rect = pygame.Rect(sprite_def['x'], sprite_def['y'], sprite_def['width'], sprite_def['height'])
-                        # Draw the actual sprite (prop, path, water, grass variant, etc.)
-                        screen.blit(source_img, dest_pos, area=source_rect)
-                    else:
-                        # Source image missing
-                        pygame.draw.rect(screen, (255, 0, 255), (*dest_pos, TILE_SIZE, TILE_SIZE)) # Magenta fallback
-                else:
-                    # Invalid tile name in map
-                    pygame.draw.rect(screen, (255, 255, 0), (*dest_pos, TILE_SIZE, TILE_SIZE)) # Yellow fallback
+        # --- Determine Visible Tiles ---
+        if camera:
+            zoom = camera.zoom
+            first_col, first_row, end_col, end_row = camera.get_visible_tile_range(TILE_SIZE, self.grid_width, self.grid_height)
+            # Multi-tile sprites are anchored at their top-left tile, so look further up/left for ones reaching into view
+            first_col = max(0, first_col - self.max_sprite_span + 1)
+            first_row = max(0, first_row - self.max_sprite_span + 1)
+            origin_x, origin_y = round(-camera.x * zoom), round(-camera.y * zoom)
+        else:
+            zoom = 1.0
+            first_col, first_row, end_col, end_row = 0, 0, self.grid_width, self.grid_height
+            origin_x, origin_y = 0, 0
+        tile_px = round(TILE_SIZE * zoom) # Integer for all camera zoom levels, so tiles stay gap-free
+
+        # --- Draw Tiles using the Sprite Table ---
+        sprites, base_blit = self._get_draw_table(zoom)
+        flags = self.sprite_table.flags.tolist()
+        base_flags = TILE_COVERED | TILE_PROP # Covered cells and props get grass drawn underneath
+        blits = []
+        # Converting the visible block to lists once avoids per-cell NumPy scalar access
+        for row_offset, row in enumerate(self.get_tile_block(first_row, first_col, end_row, end_col).tolist()):
+            y = origin_y + (first_row + row_offset) * tile_px
+            x = origin_x + first_col * tile_px
+            for tile_id in row:
+                if flags[tile_id] & base_flags:
+                    blits.append((base_blit[0], (x, y), base_blit[1]))
+                if tile_id != COVERED_ID:
+                    image, area = sprites[tile_id]
+                    blits.append((image, (x, y), area))
+                x += tile_px
+        screen.blits(blits, doreturn=False)
 
         # --- Draw Debug Borders and Coordinates (if enabled) ---
         if show_debug_borders and debug_font:
             border_color = (0, 0, 0) # Black
             text_color = (255, 255, 255) # White
-            for r in range(self.grid_height):
-                for c in range(self.grid_width):
+            for r in range(first_row, end_row):
+                for c in range(first_col, end_col):
                     # Draw border
-                    rect = pygame.Rect(c * TILE_SIZE, r * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+                    rect = pygame.Rect(origin_x + c * tile_px, origin_y + r * tile_px, tile_px, tile_px)
                     pygame.draw.rect(screen, border_color, rect, 1) # width=1 for border
 
                     # Draw coordinates
@@ -514,4 +602,4 @@ class City:
                     # Position text slightly inside the top-left corner
                     screen.blit(text_surf, (rect.x + 2, rect.y + 2))
 
-        # Note: Building sprites would need to be loaded and drawn, potentially using a separate layer or modifying the tile_map logic.
\ No newline at end of file
+        # Note: Building sprites would need to be loaded and drawn, potentially using a separate layer or modifying the tile_map logic.
@@ -0,0 +1,52 @@
+import math
+from typing import Tuple
+import numpy as np
+
+# Below this, the stored counts are folded back into true densities before float32 loses precision
+_RESCALE_BELOW = 1e-3
+
+
+class CongestionGrid:
+    """Decaying density of Sims per tile, counted from the tiles they step onto.
+
+    Each tile entry adds 1 to the tile's density, and all densities halve every
+    `half_life` seconds. Decay is applied lazily through one shared scale factor, so a
+    frame costs O(1) however large the grid is. `penalty` turns the densities into the
+    extra entry cost the pathfinders see.
+    """
+
+    def __init__(self, shape: Tuple[int, int], half_life: float = 10.0, weight: float = 0.5, max_penalty: float = 2.0):
+        """Creates an empty grid of (grid_height, grid_width) tiles."""
+        self._counts = np.zeros(shape, dtype=np.float32) # True density is _counts * _scale
+        self._scale = 1.0
+        self.decay_rate = math.log(2) / half_life
+        self.weight = weight
+        self.max_penalty = max_penalty
+
+    def enter(self, tile: Tuple[int, int]):
+        """Counts a Sim stepping onto a (col, row) tile."""
+        self._counts[tile[1], tile[0]] += 1.0 / self._scale
+
+    def enter_many(self, cols: np.ndarray, rows: np.ndarray):
+        """Counts Sims stepping onto the tiles (cols[i], rows[i])."""
+        np.add.at(self._counts, (rows, cols), np.float32(1.0 / self._scale))
+
+    def decay(self, dt: float):
+        """Lets dt seconds of decay pass."""
+        self._scale *= math.exp(-self.decay_rate * dt)
+        if self._scale < _RESCALE_BELOW:
+            self._counts *= self._scale
+            self._scale = 1.0
+
+    def density(self) -> np.ndarray:
+        """Returns the current density per tile."""
+        return self._counts * np.float32(self._scale)
+
+    def penalty(self) -> np.ndarray:
+        """Returns the extra cost per tile as a multiple of its terrain cost, capped and rounded to quarters.
+
+        Rounding keeps small density changes from touching the cost grid, so planners
+        only see (and rebuild for) tiles whose crowding changed noticeably.
+        """
+        penalty = np.minimum(self.density() * self.weight, self.max_penalty)
+        return np.round(penalty * 4) / 4
@@ -0,0 +1,147 @@
+import heapq
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from aisim.src.core.gridsearch import NEIGHBOURS, INF, octile
+
+KEY_EPSILON = 1e-6
+
+
+class DStarLite:
+    """Incremental planner (D* Lite) from a moving start to a fixed goal tile.
+
+    Searches backward from the goal over a grid of per-cell entry costs and keeps its
+    search state, so after a cost change (a tile occupied by another Sim, a terrain
+    edit) only the affected part of the search is repaired instead of starting over.
+    One instance belongs to one Sim's trip.
+    """
+
+    def __init__(self, costs: np.ndarray, start: Tuple[int, int], goal: Tuple[int, int],
+                 flat_costs: Optional[List[float]] = None, min_cost: Optional[float] = None):
+        """Plans from start to goal (col, row) over the cost grid (read again on `update_cells`).
+
+        `flat_costs` is costs as a flat list kept up to date by its owner (see
+        `Navigation.flat_costs`), shared instead of copied per search; `min_cost` is a lower
+        bound of the costs. Either is derived from costs when not given.
+        """
+        self.grid_height, self.grid_width = costs.shape
+        self._source = costs
+        self._costs = flat_costs if flat_costs is not None else costs.ravel().tolist()
+        if min_cost is None:
+            finite = costs[np.isfinite(costs)]
+            min_cost = float(finite.min()) if finite.size else 1.0
+        self._min_cost = min_cost
+        self._overlay: Dict[int, float] = {} # Temporary costs, e.g. tiles occupied by other Sims
+        self.start = self._cell(start)
+        self.goal = self._cell(goal)
+        self._last_start = self.start
+        self._km = 0.0
+        self._g: Dict[int, float] = {}
+        self._rhs: Dict[int, float] = {self.goal: 0.0}
+        self._open: Dict[int, Tuple[float, float]] = {} # Cell -> key; heap entries not matching are stale
+        self._heap: List[Tuple[Tuple[float, float], int]] = []
+        self._push(self.goal)
+        self._compute()
+
+    def _cell(self, tile: Tuple[int, int]) -> int:
+        return tile[1] * self.grid_width + tile[0]
+
+    def _cost(self, cell: int) -> float:
+        return self._overlay.get(cell, self._costs[cell])
+
+    def _neighbours(self, cell: int):
+        """Yields (neighbour cell, step length)."""
+        row, col = divmod(cell, self.grid_width)
+        for dc, dr, step in NEIGHBOURS:
+            c, r = col + dc, row + dr
+            if 0 <= c < self.grid_width and 0 <= r < self.grid_height:
+                yield r * self.grid_width + c, step
+
+    def _key(self, cell: int) -> Tuple[float, float]:
+        best = min(self._g.get(cell, INF), self._rhs.get(cell, INF))
+        return (best + octile(self.start, cell, self.grid_width) * self._min_cost + self._km, best)
+
+    def _push(self, cell: int):
+        key = self._key(cell)
+        self._open[cell] = key
+        heapq.heappush(self._heap, (key, cell))
+
+    def _update_vertex(self, cell: int):
+        if cell != self.goal:
+            if self._cost(cell) == INF:
+                self._rhs[cell] = INF # Blocked tiles are never routed through
+            else:
+                self._rhs[cell] = min((step * self._cost(other) + self._g.get(other, INF) for other, step in self._neighbours(cell)), default=INF)
+        self._open.pop(cell, None)
+        if self._g.get(cell, INF) != self._rhs.get(cell, INF):
+            self._push(cell)
+
+    def _compute(self):
+        """Expands cells until the start's distance is consistent (ComputeShortestPath)."""
+        g, rhs, heap, open_cells = self._g, self._rhs, self._heap, self._open
+        while heap:
+            key, cell = heap[0]
+            if open_cells.get(cell) != key:
+                heapq.heappop(heap) # Stale entry
+                continue
+            # Ties are expanded too: summed float steps can put a cell on the optimal path a hair above the start's key
+            if key[0] > self._key(self.start)[0] + KEY_EPSILON and rhs.get(self.start, INF) == g.get(self.start, INF):
+                break
+            heapq.heappop(heap)
+            new_key = self._key(cell)
+            if key < new_key:
+                self._push(cell)
+            elif g.get(cell, INF) > rhs.get(cell, INF):
+                g[cell] = rhs[cell]
+                del open_cells[cell]
+                for other, _ in self._neighbours(cell):
+                    self._update_vertex(other)
+            else:
+                g[cell] = INF
+                del open_cells[cell]
+                self._update_vertex(cell)
+                for other, _ in self._neighbours(cell):
+                    self._update_vertex(other)
+
+    def move_start(self, start: Tuple[int, int]):
+        """Moves the start to the Sim's current tile (keys stay valid through the km offset)."""
+        cell = self._cell(start)
+        self._km += octile(self._last_start, cell, self.grid_width) * self._min_cost
+        self._last_start = self.start = cell
+
+    def _changed(self, cells: Iterable[int]):
+        """Repairs the search after the costs of cells changed."""
+        for cell in cells:
+            self._update_vertex(cell)
+            for other, _ in self._neighbours(cell):
+                self._update_vertex(other)
+        self._compute()
+
+    def update_cells(self, tiles: Iterable[Tuple[int, int]]):
+        """Re-reads the costs of tiles from the live cost grid (after a terrain edit) and repairs the path."""
+        tiles = list(tiles)
+        cells = [self._cell(tile) for tile in tiles]
+        source = self._source
+        for (col, row), cell in zip(tiles, cells):
+            self._costs[cell] = float(source[row, col])
+        self._changed(cells)
+
+    def set_blocked(self, tiles: Iterable[Tuple[int, int]]):
+        """Treats tiles as blocked (e.g. occupied by other Sims) instead of the ones given last time, and repairs the path."""
+        cells = {self._cell(tile) for tile in tiles} - {self.start, self.goal}
+        changed = set(self._overlay) ^ cells
+        self._overlay = {cell: INF for cell in cells}
+        if changed:
+            self._changed(changed)
+
+    def path(self) -> Optional[List[Tuple[int, int]]]:
+        """Returns the tiles from the start to the goal (both included), or None if the goal is unreachable."""
+        if self._g.get(self.start, INF) == INF and self.start != self.goal:
+            return None
+        cell = self.start
+        cells = [cell]
+        for _ in range(self.grid_width * self.grid_height):
+            if cell == self.goal:
+                return [(cell % self.grid_width, cell // self.grid_width) for cell in cells]
+            cell = min(((step * self._cost(other) + self._g.get(other, INF), other) for other, step in self._neighbours(cell)))[1]
+            cells.append(cell)
+        return None # Inconsistent state; callers plan from scratch
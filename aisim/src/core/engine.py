@@ -0,0 +1,220 @@
+import random
+import time
+import uuid
+from typing import Optional, TYPE_CHECKING
+from aisim.src.core import interaction
+from aisim.src.core.configuration import config_manager
+from aisim.src.core.movement import apply_planned_path
+from aisim.src.core.population import SimPopulation, sim_population
+from aisim.src.core.sim import Sim, update_population
+
+if TYPE_CHECKING:
+    from aisim.src.ai.ollama_client import OllamaClient
+    from aisim.src.core.city import City
+    from aisim.src.core.weather import Weather
+
+
+class SimulationEngine:
+    """Advances the simulation: Sims, City, Weather and the results of background work.
+
+    The engine draws nothing and never touches the display, so the same steps run in the
+    window (`main.py`) and without one (`headless.py`). Each `step` moves the world forward
+    by `dt` simulated seconds, however long that takes in wall time.
+
+    `advance` runs the world in fixed steps of `step_seconds` instead: elapsed time is
+    accumulated, whole steps are taken, and the remainder carries over to the next call, so
+    a faster time scale takes more steps rather than longer ones. At most `max_steps` run
+    per call; time beyond that is dropped (see `dropped_time`), so a slow frame cannot make
+    the following ones slower still.
+    """
+
+    def __init__(self, city: 'City', weather: 'Weather', ollama_client: 'OllamaClient',
+                 population: SimPopulation = sim_population, direction_change_frequency: Optional[float] = None,
+                 step_seconds: Optional[float] = None, max_steps: Optional[int] = None):
+        self.city = city
+        self.weather = weather
+        self.ollama_client = ollama_client
+        self.population = population
+        if direction_change_frequency is None:
+            direction_change_frequency = config_manager.get_entry('movement.direction_change_frequency', 5.0)
+        self.direction_change_frequency = direction_change_frequency
+        if step_seconds is None: # substeps fixed steps per frame at normal speed
+            step_seconds = 1.0 / (config_manager.get_entry('simulation.fps', 60) * config_manager.get_entry('simulation.timestep.substeps', 1))
+        self.step_seconds = step_seconds
+        self.max_steps = max_steps if max_steps is not None else config_manager.get_entry('simulation.timestep.max_steps_per_frame', 30)
+        self.current_time = 0.0 # Simulated seconds since the start
+        self.ticks = 0 # Steps taken
+        self.accumulator = 0.0 # Simulated seconds not yet stepped
+        self.dropped_time = 0.0 # Simulated seconds skipped because max_steps was reached
+
+    def advance(self, elapsed: float) -> int:
+        """Runs the fixed steps that elapsed more simulated seconds add up to, and returns how many ran."""
+        self.accumulator += elapsed
+        steps = 0
+        while self.accumulator >= self.step_seconds and steps < self.max_steps:
+            self.step(self.step_seconds)
+            self.accumulator -= self.step_seconds
+            steps += 1
+        if self.accumulator >= self.step_seconds: # Out of budget: keep only the partial step
+            behind = self.accumulator % self.step_seconds
+            self.dropped_time += self.accumulator - behind
+            self.accumulator = behind
+        # Draw the Sims part of the way into the step that is not taken yet
+        self.population.interpolation = self.accumulator / self.step_seconds if self.ticks else 1.0
+        return steps
+
+    def run_for(self, wall_seconds: float) -> int:
+        """Takes fixed steps back to back for about wall_seconds of wall-clock time, and returns how many ran.
+
+        At least one step runs. Any accumulated time is discarded, and Sims are drawn where the last step left them.
+        """
+        deadline = time.perf_counter() + wall_seconds
+        steps = 0
+        while True:
+            self.step(self.step_seconds)
+            steps += 1
+            if time.perf_counter() >= deadline:
+                break
+        self.accumulator = 0.0
+        self.population.interpolation = 1.0
+        return steps
+
+    def step(self, dt: float):
+        """Advances the simulation by dt simulated seconds."""
+        self.current_time += dt
+        self.ticks += 1
+        self.population.save_positions()
+        # Movement and animation run batched over the population arrays
+        update_population(self.population, dt, self.city, self.weather.current_state, self.current_time, self.direction_change_frequency)
+        self.weather.weather_update(dt)
+        self.city.city_update(dt) # Chunk streaming and congestion costs
+        self.apply_planned_paths()
+        self.process_ollama_results()
+
+    def apply_planned_paths(self):
+        """Hands the paths planned in the background to their Sims."""
+        city = self.city
+        path_planner = city.navigation.planner if city.navigation is not None else None
+        while path_planner is not None:
+            result_data = path_planner.check_for_results()
+            if result_data is None:
+                break
+            target_sim = city.registry.get(result_data.get('sim_id'))
+            if target_sim:
+                apply_planned_path(target_sim, result_data.get('data'), city)
+
+    def process_ollama_results(self):
+        """Polls for Ollama results (conversation responses, romance analysis) and applies them."""
+        city = self.city
+        registry = city.registry
+        while True:
+            result_data = self.ollama_client.check_for_results()
+            if result_data is None:
+                break # No more results in the queue for now
+
+            result_type = result_data.get('type')
+
+            if result_type == 'conversation':
+                sim_id = result_data.get('sim_id')
+                response_text = result_data.get('data')
+                target_sim = registry.get(sim_id)
+                if target_sim and response_text:
+                    # Pass conversation response to the interaction handler
+                    interaction.handle_ollama_response(target_sim, response_text, registry.sims, city)
+                elif not target_sim:
+                    print(f"Warning: Received 'conversation' result for unknown Sim ID: {sim_id}")
+
+            elif result_type == 'romance_analysis':
+                sim1_id = result_data.get('sim1_id')
+                sim2_id = result_data.get('sim2_id')
+                analysis_result = result_data.get('data') # INCREASE, DECREASE, NEUTRAL
+
+                sim1 = registry.get(sim1_id)
+                sim2 = registry.get(sim2_id)
+                romance_change_step = config_manager.get_entry('simulation.romance_change_step', 0.05) # Get from config
+
+                if sim1 and sim2 and analysis_result:
+                    change = 0.0
+                    if analysis_result == "INCREASE":
+                        change = romance_change_step
+                    elif analysis_result == "DECREASE":
+                        change = -romance_change_step
+
+                    if change != 0.0:
+                        # Update Sim 1's relationship towards Sim 2
+                        if sim2_id in sim1.relationships:
+                            current_romance_1 = sim1.relationships[sim2_id].get("romance", 0.0)
+                            new_romance_1 = max(0.0, min(1.0, current_romance_1 + change))
+                            sim1.relationships[sim2_id]["romance"] = new_romance_1
+                            print(f"Romance {sim1.first_name} -> {sim2.first_name}: {current_romance_1:.2f} -> {new_romance_1:.2f} ({analysis_result})")
+                        else: # Initialize if somehow missing
+                            sim1.relationships[sim2_id] = {"friendship": 0.0, "romance": max(0.0, min(1.0, change))}
+                            print(f"Romance {sim1.first_name} -> {sim2.first_name}: Initialized to {sim1.relationships[sim2_id]['romance']:.2f} ({analysis_result})")
+
+                        # Update Sim 2's relationship towards Sim 1
+                        if sim1_id in sim2.relationships:
+                            current_romance_2 = sim2.relationships[sim1_id].get("romance", 0.0)
+                            new_romance_2 = max(0.0, min(1.0, current_romance_2 + change))
+                            sim2.relationships[sim1_id]["romance"] = new_romance_2
+                            print(f"Romance {sim2.first_name} -> {sim1.first_name}: {current_romance_2:.2f} -> {new_romance_2:.2f} ({analysis_result})")
+                        else: # Initialize if somehow missing
+                            sim2.relationships[sim1_id] = {"friendship": 0.0, "romance": max(0.0, min(1.0, change))}
+                            print(f"Romance {sim2.first_name} -> {sim1.first_name}: Initialized to {sim2.relationships[sim1_id]['romance']:.2f} ({analysis_result})")
+                    else:
+                         print(f"Romance analysis between {sim1.first_name} and {sim2.first_name}: NEUTRAL, no change.")
+
+                elif not sim1:
+                    print(f"Warning: Received 'romance_analysis' for unknown Sim1 ID: {sim1_id}")
+                elif not sim2:
+                    print(f"Warning: Received 'romance_analysis' for unknown Sim2 ID: {sim2_id}")
+
+                # --- Remove pair from pending analysis lock ---
+                if sim1_id and sim2_id:
+                    analysis_pair = tuple(sorted((sim1_id, sim2_id)))
+                    city.pending_romance_analysis.discard(analysis_pair)
+
+            else:
+                print(f"Warning: Received unknown result type from Ollama queue: {result_type}")
+
+
+class ThroughputMeter:
+    """Measures the simulated seconds per wall-clock second, averaged over `window` wall seconds."""
+
+    def __init__(self, window: float = 1.0, sim_time: float = 0.0):
+        self.window = window
+        self.rate = 0.0 # Latest measurement
+        self._wall_start = time.perf_counter()
+        self._sim_start = sim_time
+
+    def update(self, sim_time: float) -> bool:
+        """Takes the current simulated time, and returns True when a window closed and `rate` was updated."""
+        now = time.perf_counter()
+        elapsed = now - self._wall_start
+        if elapsed < self.window:
+            return False
+        self.rate = (sim_time - self._sim_start) / elapsed
+        self._wall_start, self._sim_start = now, sim_time
+        return True
+
+
+def initialize_sims(initial_sims, sims_dict, ollama_client, sim_creation_config, world_width, world_height, TILE_SIZE, city=None, load_sprites=True):
+    """Creates initial_sims Sims at random positions and adds them to sims_dict by ID.
+
+    With load_sprites False the Sims get a character name but no sprite sheet, which needs no display.
+    """
+    for _ in range(initial_sims): # Use retrieved initial_sims
+        if city is not None: # Spawn on a walkable tile
+            x, y = city.random_destination()
+        else:
+            x = max(0, min(random.randint(0, world_width), world_width - TILE_SIZE - 1))
+            y = max(0, min(random.randint(0, world_height), world_height - TILE_SIZE - 1))
+        new_sim = Sim(
+            sim_id=str(uuid.uuid4()),  # Generate unique ID
+            x=x,
+            y=y,
+            ollama_client=ollama_client, # Pass the client instance
+            sim_config=sim_creation_config, # Pass the retrieved sim config dictionary
+            load_sprite=load_sprites,
+        )
+        sims_dict[new_sim.sim_id] = new_sim
+    return sims_dict
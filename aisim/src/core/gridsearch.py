@@ -0,0 +1,147 @@
+import heapq
+from typing import List, Optional, Tuple
+
+# Kept free of pygame and aisim imports: path-planning worker processes import only this module
+
+# The 8 neighbours of a tile as (d_col, d_row, step length); diagonals cost 1.4 like the walk graph
+NEIGHBOURS = ((1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+              (1, 1, 1.4), (-1, -1, 1.4), (1, -1, 1.4), (-1, 1, 1.4))
+
+INF = float('inf')
+
+
+def octile(a: int, b: int, width: int) -> float:
+    """Returns the octile distance between two flat cell indices."""
+    ay, ax = divmod(a, width)
+    by, bx = divmod(b, width)
+    dx, dy = abs(ax - bx), abs(ay - by)
+    return max(dx, dy) + 0.4 * min(dx, dy)
+
+
+def grid_astar(costs: List[float], width: int, height: int, start: int, goal: int, min_cost: float = 1.0) -> Optional[List[int]]:
+    """Runs A* between flat cell indices over per-cell entry costs (inf = blocked).
+
+    Returns the cells from start to goal (both included), or None if the goal is unreachable.
+    `min_cost` is the cheapest entry cost, which keeps the octile heuristic admissible.
+    """
+    if costs[start] == INF or costs[goal] == INF:
+        return None
+    best = {start: 0.0}
+    came_from = {}
+    heap = [(octile(start, goal, width) * min_cost, start)]
+    closed = set()
+    while heap:
+        _, index = heapq.heappop(heap)
+        if index == goal:
+            cells = [goal]
+            while cells[-1] != start:
+                cells.append(came_from[cells[-1]])
+            cells.reverse()
+            return cells
+        if index in closed:
+            continue
+        closed.add(index)
+        row, col = divmod(index, width)
+        dist = best[index]
+        for dc, dr, step in NEIGHBOURS:
+            c, r = col + dc, row + dr
+            if 0 <= c < width and 0 <= r < height:
+                other = r * width + c
+                cost = costs[other]
+                if cost == INF or other in closed:
+                    continue
+                new_dist = dist + step * cost
+                if new_dist < best.get(other, INF):
+                    best[other] = new_dist
+                    came_from[other] = index
+                    heapq.heappush(heap, (new_dist + octile(other, goal, width) * min_cost, other))
+    return None
+
+
+def line_tiles(c0: int, r0: int, c1: int, r1: int) -> List[Tuple[int, int]]:
+    """Returns every tile a straight line between two tile centers touches (both end tiles included).
+
+    Where the line passes exactly through a tile corner, both tiles beside the corner are
+    included, so lines of sight never squeeze diagonally between two blocked tiles.
+    """
+    n_c, n_r = abs(c1 - c0), abs(r1 - r0)
+    step_c, step_r = (1 if c1 > c0 else -1), (1 if r1 > r0 else -1)
+    c, r = c0, r0
+    tiles = [(c, r)]
+    i_c = i_r = 0
+    while i_c < n_c or i_r < n_r:
+        decision = (1 + 2 * i_c) * n_r - (1 + 2 * i_r) * n_c # Which tile border the line crosses next
+        if decision == 0:
+            tiles.append((c + step_c, r))
+            tiles.append((c, r + step_r))
+            c, r, i_c, i_r = c + step_c, r + step_r, i_c + 1, i_r + 1
+        elif decision < 0:
+            c, i_c = c + step_c, i_c + 1
+        else:
+            r, i_r = r + step_r, i_r + 1
+        tiles.append((c, r))
+    return tiles
+
+
+def _furthest_visible(visible, candidates: List[int], seen: int, hidden: int) -> int:
+    """Returns the index into candidates of the last one in sight, searching between seen (in sight) and hidden.
+
+    Gallops out from seen, then bisects, so finding a candidate d places away takes O(log d) tests.
+    """
+    step = 1
+    while seen + step < hidden and visible(candidates[seen + step]):
+        seen += step
+        step *= 2
+    hidden = min(seen + step, hidden)
+    while hidden - seen > 1:
+        middle = (seen + hidden) // 2
+        if visible(candidates[middle]):
+            seen = middle
+        else:
+            hidden = middle
+    return seen
+
+
+def string_pull(tiles: List[Tuple[int, int]], costs: List[float], width: int) -> List[Tuple[int, int]]:
+    """String-pulls a (col, row) tile path down to its corners over flat per-cell costs.
+
+    A run of tiles is replaced by a straight line when every tile the line touches costs
+    no more than the most expensive tile of the run, so shortcuts never cut through
+    blocked or costlier terrain the original path avoided. Between the tiles where it
+    turns the path runs straight, so lines of sight are tested at the turns, and the
+    furthest one in sight is found by galloping search; single tiles are only searched
+    between the last turn in sight and the first one out of it.
+    """
+    count = len(tiles)
+    if count <= 2:
+        return list(tiles)
+    tile_costs = [costs[r * width + c] for c, r in tiles]
+    anchor = 0
+
+    def visible(end):
+        if end - anchor <= 1: # Consecutive tiles of the path are always kept
+            return True
+        ceiling = max(tile_costs[anchor:end + 1])
+        (c0, r0), (c1, r1) = tiles[anchor], tiles[end]
+        return all(costs[r * width + c] <= ceiling for c, r in line_tiles(c0, r0, c1, r1))
+
+    turns = [0]
+    for i in range(1, count - 1):
+        (c0, r0), (c1, r1), (c2, r2) = tiles[i - 1], tiles[i], tiles[i + 1]
+        if (c1 - c0, r1 - r0) != (c2 - c1, r2 - r1):
+            turns.append(i)
+    turns.append(count - 1)
+    indices = list(range(count))
+    corners = [tiles[0]]
+    turn = 0 # turns[turn] is in sight of the anchor
+    while True:
+        turn = _furthest_visible(visible, turns, turn, len(turns))
+        if turn == len(turns) - 1:
+            break
+        # turns[turn + 1] is out of sight: the furthest tile in sight before it becomes a corner
+        anchor = _furthest_visible(visible, indices, max(turns[turn], anchor + 1), turns[turn + 1])
+        corners.append(tiles[anchor])
+        if turns[turn] < anchor:
+            turns[turn] = anchor # In sight of itself, so the search carries on from the new corner
+    corners.append(tiles[-1])
+    return corners
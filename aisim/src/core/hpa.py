@@ -0,0 +1,307 @@
+import heapq
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from aisim.src.core.gridsearch import NEIGHBOURS, INF, octile
+# Border runs at least this long get an entrance at each end instead of one in the middle
+LONG_ENTRANCE = 6
+
+
+def local_dijkstra(costs: List[float], width: int, bounds: Tuple[int, int, int, int], source: int, reverse: bool = False,
+                   targets: Optional[set] = None) -> Tuple[Dict[int, float], Dict[int, int]]:
+    """Runs Dijkstra from a flat cell index, restricted to bounds (first_col, first_row, end_col, end_row).
+
+    Moving into a cell costs its step length times the cell's entry cost. With `reverse`,
+    distances are *to* the source instead of from it. Stops early once every target is
+    settled. Returns ({cell: distance}, {cell: predecessor}) where the predecessor is the
+    previous cell on the way from the source.
+    """
+    first_col, first_row, end_col, end_row = bounds
+    distance = {source: 0.0}
+    previous = {}
+    remaining = set(targets) if targets else None
+    if remaining is not None:
+        remaining.discard(source)
+    heap = [(0.0, source)]
+    done = set()
+    while heap:
+        dist, index = heapq.heappop(heap)
+        if index in done:
+            continue
+        done.add(index)
+        if remaining is not None:
+            remaining.discard(index)
+            if not remaining:
+                break
+        row, col = divmod(index, width)
+        for dc, dr, step in NEIGHBOURS:
+            c, r = col + dc, row + dr
+            if first_col <= c < end_col and first_row <= r < end_row:
+                other = r * width + c
+                if costs[other] == INF or other in done:
+                    continue
+                new_dist = dist + step * (costs[index] if reverse else costs[other])
+                if new_dist < distance.get(other, INF):
+                    distance[other] = new_dist
+                    previous[other] = index
+                    heapq.heappush(heap, (new_dist, other))
+    return {cell: d for cell, d in distance.items() if cell in done}, previous
+
+
+def _trace(previous: Dict[int, int], source: int, cell: int) -> List[int]:
+    """Follows predecessors from cell back to the source; returns the cells from the source to cell."""
+    cells = [cell]
+    while cell != source:
+        cell = previous[cell]
+        cells.append(cell)
+    cells.reverse()
+    return cells
+
+
+class HpaRoute:
+    """An abstract route through cluster entrances, refined into tiles one leg at a time."""
+
+    def __init__(self, pathfinder: 'HierarchicalPathfinder', nodes: List[int], first_leg: List[int], last_leg: List[int]):
+        self.pathfinder = pathfinder
+        self.nodes = nodes # Abstract nodes from the start cell to the goal cell
+        self._first_leg = first_leg # Cells from the start to nodes[1]
+        self._last_leg = last_leg # Cells from nodes[-2] to the goal
+        self._edge = 0 # Next abstract edge to refine
+
+    @property
+    def done(self) -> bool:
+        return self._edge >= len(self.nodes) - 1
+
+    def next_leg(self) -> Optional[List[Tuple[int, int]]]:
+        """Refines the next edges (up to and including one inside a cluster) into (col, row) tiles.
+
+        The first leg starts with the start tile; later legs start at the tile after the
+        previous leg's end. Returns None when the route is finished or was invalidated by a
+        terrain change in a cluster it still has to cross.
+        """
+        cells = []
+        last_index = len(self.nodes) - 2
+        while self._edge <= last_index:
+            edge = self._edge
+            if edge == 0:
+                leg = self._first_leg
+            elif edge == last_index:
+                leg = self._last_leg
+            else:
+                leg = self.pathfinder.edge_cells(self.nodes[edge], self.nodes[edge + 1])
+                if leg is None:
+                    return None
+            cells.extend(leg if not cells and edge == 0 else leg[1:])
+            self._edge += 1
+            if len(leg) > 2 or self.done:
+                break # Stop after a leg that crosses a cluster; one-step entrance hops join the next leg
+        if not cells:
+            return None
+        width = self.pathfinder.grid_width
+        return [(cell % width, cell // width) for cell in cells]
+
+
+class HierarchicalPathfinder:
+    """HPA* over a grid of per-tile entry costs (inf = blocked).
+
+    The grid is split into square clusters. Entrances are placed on walkable runs along
+    each border between neighbouring clusters, and paths between the entrances of one
+    cluster are precomputed. A query searches this small abstract graph and the route
+    is refined one leg at a time (`HpaRoute`). Borders and clusters are built lazily on
+    first use, and `invalidate` drops only the ones a terrain change touches.
+    """
+
+    def __init__(self, costs: np.ndarray, cluster_size: int = 16):
+        self.cluster_size = cluster_size
+        self.set_costs(costs)
+
+    def set_costs(self, costs: np.ndarray, region: Optional[Tuple[int, int, int, int]] = None):
+        """Replaces the cost grid; with a region (first_col, first_row, end_col, end_row), only clusters there are rebuilt."""
+        self.grid_height, self.grid_width = costs.shape
+        self.costs = costs.ravel().tolist()
+        finite = costs[np.isfinite(costs)]
+        self.min_cost = float(finite.min()) if finite.size else 1.0 # Keeps the A* heuristic admissible
+        self.clusters_x = -(-self.grid_width // self.cluster_size)
+        self.clusters_y = -(-self.grid_height // self.cluster_size)
+        if region is None:
+            self._borders: Dict[Tuple[int, int, int], Dict[int, List[int]]] = {} # {(cx, cy, side): {cell: [cells across]}}
+            self._intra: Dict[Tuple[int, int], Dict[int, Dict[int, Tuple[float, List[int]]]]] = {} # {cluster: {a: {b: (cost, cells)}}}
+        else:
+            self.invalidate(*region)
+
+    def invalidate(self, first_col: int, first_row: int, end_col: int, end_row: int):
+        """Drops the borders and cluster paths a change to the given tile region can affect."""
+        size = self.cluster_size
+        # Grown by one tile: a change on a border row alters the entrances of both clusters
+        cx0, cy0 = max(0, (first_col - 1) // size), max(0, (first_row - 1) // size)
+        cx1, cy1 = min(self.clusters_x - 1, end_col // size), min(self.clusters_y - 1, end_row // size)
+        touched = {(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)}
+        for cx, cy in touched:
+            self._borders.pop((cx, cy, 0), None) # Border with the cluster to the right
+            self._borders.pop((cx, cy, 1), None) # Border with the cluster below
+        # Entrances changed on the borders of touched clusters, so their neighbours' paths are stale too
+        for cx, cy in touched:
+            for cluster in ((cx, cy), (cx - 1, cy), (cx + 1, cy), (cx, cy - 1), (cx, cy + 1)):
+                self._intra.pop(cluster, None)
+
+    def cluster_of(self, cell: int) -> Tuple[int, int]:
+        row, col = divmod(cell, self.grid_width)
+        return (col // self.cluster_size, row // self.cluster_size)
+
+    def cluster_bounds(self, cluster: Tuple[int, int]) -> Tuple[int, int, int, int]:
+        cx, cy = cluster
+        size = self.cluster_size
+        return (cx * size, cy * size, min(self.grid_width, (cx + 1) * size), min(self.grid_height, (cy + 1) * size))
+
+    def _border(self, cx: int, cy: int, side: int) -> Dict[int, List[int]]:
+        """Returns the entrance pairs on the right (side 0) or bottom (side 1) border of a cluster, building them once."""
+        key = (cx, cy, side)
+        border = self._borders.get(key)
+        if border is not None:
+            return border
+        border = {}
+        first_col, first_row, end_col, end_row = self.cluster_bounds((cx, cy))
+        width, costs = self.grid_width, self.costs
+        if side == 0 and end_col < self.grid_width:
+            pairs = [(r * width + end_col - 1, r * width + end_col) for r in range(first_row, end_row)]
+        elif side == 1 and end_row < self.grid_height:
+            pairs = [(end_row * width - width + c, end_row * width + c) for c in range(first_col, end_col)]
+        else:
+            pairs = []
+        run = []
+        for pair in pairs + [None]:
+            if pair is not None and costs[pair[0]] != INF and costs[pair[1]] != INF:
+                run.append(pair)
+                continue
+            if run:
+                for inside, outside in ((run[0], run[-1]) if len(run) >= LONG_ENTRANCE else (run[len(run) // 2],)):
+                    border.setdefault(inside, []).append(outside)
+                    border.setdefault(outside, []).append(inside)
+                run = []
+        self._borders[key] = border
+        return border
+
+    def _cluster_borders(self, cluster: Tuple[int, int]) -> List[Dict[int, List[int]]]:
+        """Returns the (up to four) borders of a cluster."""
+        cx, cy = cluster
+        borders = []
+        if cx + 1 < self.clusters_x: borders.append(self._border(cx, cy, 0))
+        if cy + 1 < self.clusters_y: borders.append(self._border(cx, cy, 1))
+        if cx > 0: borders.append(self._border(cx - 1, cy, 0))
+        if cy > 0: borders.append(self._border(cx, cy - 1, 1))
+        return borders
+
+    def entrances(self, cluster: Tuple[int, int]) -> List[int]:
+        """Returns the entrance cells inside a cluster."""
+        nodes = set()
+        for border in self._cluster_borders(cluster):
+            nodes.update(cell for cell in border if self.cluster_of(cell) == cluster)
+        return sorted(nodes)
+
+    def _cluster_paths(self, cluster: Tuple[int, int]) -> Dict[int, Dict[int, Tuple[float, List[int]]]]:
+        """Returns the precomputed paths between the entrances of a cluster, building them once."""
+        paths = self._intra.get(cluster)
+        if paths is not None:
+            return paths
+        nodes = self.entrances(cluster)
+        bounds = self.cluster_bounds(cluster)
+        paths = {node: {} for node in nodes}
+        # One search per pair: the reverse walk reuses the cells and only re-prices the entry costs
+        for i, node in enumerate(nodes[:-1]):
+            later = nodes[i + 1:]
+            distance, previous = local_dijkstra(self.costs, self.grid_width, bounds, node, targets=set(later))
+            for other in later:
+                if other in distance:
+                    cells = _trace(previous, node, other)
+                    paths[node][other] = (distance[other], cells)
+                    paths[other][node] = (self._path_cost(cells[::-1]), cells[::-1])
+        self._intra[cluster] = paths
+        return paths
+
+    def _path_cost(self, cells: List[int]) -> float:
+        """Returns the cost of walking a list of adjacent cells."""
+        width, costs = self.grid_width, self.costs
+        cost = 0.0
+        for a, b in zip(cells, cells[1:]):
+            cost += (1.4 if a % width != b % width and a // width != b // width else 1.0) * costs[b]
+        return cost
+
+    def edge_cells(self, a: int, b: int) -> Optional[List[int]]:
+        """Returns the cells of an abstract edge (an entrance hop or a path inside a cluster), or None if it no longer exists."""
+        cluster = self.cluster_of(a)
+        if cluster != self.cluster_of(b):
+            for border in self._cluster_borders(cluster):
+                if b in border.get(a, ()):
+                    return [a, b]
+            return None
+        entry = self._cluster_paths(cluster).get(a, {}).get(b)
+        return entry[1] if entry else None
+
+    def _neighbours(self, node: int):
+        """Yields (other node, cost) for the abstract edges leaving a node."""
+        cluster = self.cluster_of(node)
+        for other, (cost, _) in self._cluster_paths(cluster).get(node, {}).items():
+            yield other, cost
+        for border in self._cluster_borders(cluster):
+            for other in border.get(node, ()):
+                yield other, self.costs[other] # One straight step into the neighbouring cluster
+
+    def _heuristic(self, a: int, b: int) -> float:
+        """Octile distance scaled by the cheapest tile cost."""
+        return octile(a, b, self.grid_width) * self.min_cost
+
+    def find_route(self, start: Tuple[int, int], goal: Tuple[int, int]) -> Optional[HpaRoute]:
+        """Searches the abstract graph from start to goal tile (col, row); returns None if unreachable or already there."""
+        width = self.grid_width
+        start_cell, goal_cell = start[1] * width + start[0], goal[1] * width + goal[0]
+        if start_cell == goal_cell or self.costs[start_cell] == INF or self.costs[goal_cell] == INF:
+            return None
+        start_cluster, goal_cluster = self.cluster_of(start_cell), self.cluster_of(goal_cell)
+        # Connect the start and goal to the entrances of their clusters
+        start_nodes = set(self.entrances(start_cluster))
+        start_dist, start_prev = local_dijkstra(self.costs, width, self.cluster_bounds(start_cluster), start_cell,
+                                                targets=start_nodes | {goal_cell})
+        if start_cluster == goal_cluster and goal_cell in start_dist:
+            return HpaRoute(self, [start_cell, goal_cell], _trace(start_prev, start_cell, goal_cell), [])
+        goal_dist, goal_prev = local_dijkstra(self.costs, width, self.cluster_bounds(goal_cluster), goal_cell, reverse=True,
+                                              targets=set(self.entrances(goal_cluster)))
+
+        # A* over the entrances; the goal is reached through any entrance of its cluster
+        open_heap = []
+        best = {}
+        came_from = {}
+        for node in start_nodes:
+            if node in start_dist:
+                best[node] = start_dist[node]
+                if node != start_cell:
+                    came_from[node] = start_cell
+                heapq.heappush(open_heap, (start_dist[node] + self._heuristic(node, goal_cell), node))
+        goal_cost, goal_parent = INF, None
+        closed = set()
+        while open_heap:
+            estimate, node = heapq.heappop(open_heap)
+            if estimate >= goal_cost:
+                break
+            if node in closed:
+                continue
+            closed.add(node)
+            if node in goal_dist and best[node] + goal_dist[node] < goal_cost:
+                goal_cost, goal_parent = best[node] + goal_dist[node], node
+            for other, cost in self._neighbours(node):
+                new_cost = best[node] + cost
+                if new_cost < best.get(other, INF):
+                    best[other] = new_cost
+                    came_from[other] = node
+                    heapq.heappush(open_heap, (new_cost + self._heuristic(other, goal_cell), other))
+        if goal_parent is None:
+            return None
+
+        nodes = [goal_cell, goal_parent]
+        while nodes[-1] != start_cell:
+            nodes.append(came_from[nodes[-1]])
+        nodes.reverse()
+        last_leg = _trace(goal_prev, goal_cell, goal_parent)[::-1] # Reverse search: predecessors point toward the goal
+        if len(nodes) == 2: # The start is itself an entrance of the goal's cluster
+            return HpaRoute(self, nodes, last_leg, last_leg)
+        # A start on an entrance may leave through an abstract edge instead of its local search
+        first_leg = _trace(start_prev, start_cell, nodes[1]) if nodes[1] in start_dist else self.edge_cells(start_cell, nodes[1])
+        return HpaRoute(self, nodes, first_leg, last_leg)
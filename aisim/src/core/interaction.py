@@ -1,37 +1,43 @@
 import math
 from typing import List
 import logging
-logging.basicConfig(level=logging.DEBUG)
 from aisim.src.core.configuration import config_manager
 BUBBLE_DISPLAY_TIME = config_manager.get_entry('simulation.bubble_display_time_seconds', 5.0) # Import for timer
 import random # Import random
 
-__all__ = ['check_interactions', '_end_interaction'] # Explicitly export functions
+__all__ = ['check_interactions', 'meet', '_end_interaction'] # Explicitly export functions
 
 INTERACTION_DISTANCE = config_manager.get_entry('simulation.interaction_distance')  # Max distance for interaction (pixels)
 ENABLE_TALKING = config_manager.get_entry('simulation.enable_talking', False)
 BUBBLE_DISPLAY_TIME = config_manager.get_entry('simulation.bubble_display_time_seconds', 5.0)
 MAX_TOTAL_TURNS = config_manager.get_entry('ollama.conversation_max_turns', 4)
+IGNORE_INTERACTION_TIME = config_manager.get_entry('simulation.ignore_interaction_time', 5.0) # Seconds before a Sim can interact again
 
-def check_interactions(self, all_sims, current_time, city): # Add city parameter
-    """Checks for and handles interactions with nearby Sims"""
-    ignore_interaction_time = config_manager.get_entry('simulation.ignore_interaction_time', 5.0)
-    for other_sim in all_sims:
+def meet(self, other_sim):
+    """Initializes the relationship of two Sims if this is their first meeting."""
+    if other_sim.sim_id not in self.relationships:
+        self.relationships[other_sim.sim_id] = {"friendship": 0.0, "romance": 0.0}
+    if self.sim_id not in other_sim.relationships:
+        other_sim.relationships[self.sim_id] = {"friendship": 0.0, "romance": 0.0}
+
+def check_interactions(self, all_sims, current_time, city, nearby_sims=None): # Add city parameter
+    """Checks for and handles interactions with nearby Sims.
+
+    `nearby_sims` limits the candidates to Sims already known to be close (see
+    `SimPopulation.close_pairs`). Conversations in progress are looked up in the City's registry.
+    """
+    for other_sim in (all_sims if nearby_sims is None else nearby_sims):
         if other_sim.sim_id == self.sim_id:
             continue  # Don't interact with self
 
         dist = math.dist((self.x, self.y), (other_sim.x, other_sim.y))
 
         # --- Interaction Start Condition ---
-        can_interact_self = not self.is_interacting and (current_time - self.last_interaction_time > ignore_interaction_time)
-        can_interact_other = not other_sim.is_interacting and (current_time - other_sim.last_interaction_time > ignore_interaction_time)
-        # Initialize relationship if first meeting
-        if other_sim.sim_id not in self.relationships:
-            self.relationships[other_sim.sim_id] = {"friendship": 0.0, "romance": 0.0}
-        if self.sim_id not in other_sim.relationships:
-            other_sim.relationships[self.sim_id] = {"friendship": 0.0, "romance": 0.0}
-
-        if dist < INTERACTION_DISTANCE and can_interact_self and can_interact_other and not is_interaction_in_progress(self, all_sims):
+        can_interact_self = not self.is_interacting and (current_time - self.last_interaction_time > IGNORE_INTERACTION_TIME)
+        can_interact_other = not other_sim.is_interacting and (current_time - other_sim.last_interaction_time > IGNORE_INTERACTION_TIME)
+        meet(self, other_sim) # Initialize relationship if first meeting
+
+        if dist < INTERACTION_DISTANCE and can_interact_self and can_interact_other and not is_interaction_in_progress(self, city):
             # --- Potential Interaction Start ---
             # Don't stop movement or set is_interacting yet.
             # Check if a conversation is possible first.
@@ -54,40 +60,35 @@ def check_interactions(self, all_sims, current_time, city): # Add city parameter
             if ENABLE_TALKING == True:
                 initiate_conversation(self, other_sim, city, all_sims, current_time)
             else:
-                 self.conversation_history = None
-                 other_sim.conversation_history = None
+                 self.conversation.history = None
+                 other_sim.conversation.history = None
             
 
-        # --- Post-Interaction Start Logic (Relationship, Memory, Logging) ---
-        # This part runs regardless of whether a conversation was started,
-        # as long as the interaction condition was met.
-        # Store interaction in memory
-        # Basic interaction effect: slightly increase friendship
-        friendship_increase = 0.01  # Placeholder
-        self.relationships[other_sim.sim_id]["friendship"] = min(1.0, self.relationships[other_sim.sim_id]["friendship"] + friendship_increase)
-        other_sim.relationships[self.sim_id]["friendship"] = min(1.0, other_sim.relationships[self.sim_id]["friendship"] + friendship_increase)
-
-        interaction_event = {"type": "interaction", "with_sim_id": other_sim.sim_id, "friendship_change": friendship_increase}
-        self.memory.append(interaction_event)
-        other_sim.memory.append({"type": "interaction", "with_sim_id": self.sim_id, "friendship_change": friendship_increase})
-
-        # Mood boost from positive interaction
-        self.mood = min(1.0, self.mood + 0.05)
-        other_sim.mood = min(1.0, other_sim.mood + 0.05)
-
-def is_interaction_in_progress(sim1, all_sims):
-    """Checks if any Sims are currently interacting. Exclude sim1 and his partner."""
-    for sim in all_sims:
-        if sim.sim_id == sim1.sim_id or sim.sim_id == sim1.conversation_partner_id:
-            continue
-        if sim.is_interacting:
-            return True
-    return False
+            # --- Post-Interaction Start Logic (Relationship, Memory, Logging) ---
+            # This part runs regardless of whether a conversation was started,
+            # but only when the interaction condition is met, not for every nearby Sim.
+            # Store interaction in memory
+            # Basic interaction effect: slightly increase friendship
+            friendship_increase = 0.01  # Placeholder
+            self.relationships[other_sim.sim_id]["friendship"] = min(1.0, self.relationships[other_sim.sim_id]["friendship"] + friendship_increase)
+            other_sim.relationships[self.sim_id]["friendship"] = min(1.0, other_sim.relationships[self.sim_id]["friendship"] + friendship_increase)
+
+            interaction_event = {"type": "interaction", "with_sim_id": other_sim.sim_id, "friendship_change": friendship_increase}
+            self.memory.append(interaction_event)
+            other_sim.memory.append({"type": "interaction", "with_sim_id": self.sim_id, "friendship_change": friendship_increase})
+
+            # Mood boost from positive interaction
+            self.mood = min(1.0, self.mood + 0.05)
+            other_sim.mood = min(1.0, other_sim.mood + 0.05)
+
+def is_interaction_in_progress(sim1, city):
+    """Checks if any Sims are currently interacting. Exclude sim1 and their partner."""
+    return city.registry.interaction_in_progress(sim1.sim_id, sim1.conversation.partner_id)
 
 def _end_interaction(self, city, all_sims: List['Sim']): # Add city parameter
     """Cleans up state at the end of an interaction, releasing the Ollama lock if held."""
-    logging.info(f"Sim {self.sim_id}: Ending interaction with partner ID {self.conversation_partner_id}")
-    partner = self._find_sim_by_id(self.conversation_partner_id, all_sims)
+    logging.info(f"Sim {self.sim_id}: Ending interaction with partner ID {self.conversation.partner_id}")
+    partner = city.registry.get(self.conversation.partner_id)
 
     # --- Release Ollama Lock if held ---
     # Check if the lock is held *before* resetting state, as state might be needed
@@ -103,7 +104,7 @@ def _end_interaction(self, city, all_sims: List['Sim']): # Add city parameter
         city.ollama_client_locked = False
 
     # --- Capture data for romance analysis *before* clearing state ---
-    final_history = self.conversation_history[:] if self.conversation_history else None
+    final_history = self.conversation.history[:] if self.conversation.history else None
     sim1_id = self.sim_id
     sim1_name = self.first_name
     sim2_id = None
@@ -116,23 +117,11 @@ def _end_interaction(self, city, all_sims: List['Sim']): # Add city parameter
     # --- Reset Partner State (if partner exists and was interacting) ---
     if partner and partner.is_interacting:
             partner.is_interacting = False
-            partner.conversation_history = None
-            partner.conversation_message = None # Reset conversation bubble message
-            partner.conversation_message_timer = 0.0 # Reset conversation bubble timer
-            partner.is_my_turn_to_speak = False
-            partner.waiting_for_ollama_response = False
-            partner.conversation_partner_id = None
-            partner.conversation_turns = 0
+            partner.conversation.end() # Also clears the bubble
 
     # --- Reset Self State ---
     self.is_interacting = False
-    self.conversation_history = None
-    self.conversation_message = None # Reset conversation bubble message
-    self.conversation_message_timer = 0.0 # Reset conversation bubble timer
-    self.is_my_turn_to_speak = False
-    self.waiting_for_ollama_response = False
-    self.conversation_partner_id = None
-    self.conversation_turns = 0
+    self.conversation.end() # Also clears the bubble
 
     # --- Trigger Romance Analysis ---
     if final_history and sim2_id is not None: # Only analyze if there was history and a valid partner
@@ -159,7 +148,7 @@ def handle_ollama_response(self, response_text: str, all_sims: List['Sim'], city
     # Release the lock if this response corresponds to the end of a conversation turn.
     # Note: The lock is acquired in _initiate_conversation or conversation_update.
     # The lock should be released here, after receiving the response for that turn.
-    if self.waiting_for_ollama_response and self.is_interacting: # Check if we were actually waiting for a *conversation* response
+    if self.conversation.waiting_for_response and self.is_interacting: # Check if we were actually waiting for a *conversation* response
         if city.ollama_client_locked:
             city.ollama_client_locked = False
             logging.info(f"Sim {self.sim_id}: Released Ollama lock after receiving response.")
@@ -168,53 +157,53 @@ def handle_ollama_response(self, response_text: str, all_sims: List['Sim'], city
             logging.warning(f"Sim {self.sim_id}: Received conversation response, but Ollama lock was already released.")
 
     # Always mark as no longer waiting, regardless of lock state or interaction type
-    self.waiting_for_ollama_response = False
+    self.conversation.waiting_for_response = False
 
-    if self.is_interacting and self.conversation_partner_id is not None:
+    if self.is_interacting and self.conversation.partner_id is not None:
         # --- Handle Conversation Response ---
-        self.conversation_message = response_text
-        self.conversation_message_timer = BUBBLE_DISPLAY_TIME # Start the timer for the speaker's bubble
+        self.conversation.message = response_text
+        self.conversation.message_timer = BUBBLE_DISPLAY_TIME # Start the timer for the speaker's bubble
 
         # Add to history
         new_entry = {"speaker": self.first_name, "line": response_text}
-        if self.conversation_history is None: self.conversation_history = []
-        self.conversation_history.append(new_entry)
+        if self.conversation.history is None: self.conversation.history = []
+        self.conversation.history.append(new_entry)
 
         # Update partner
-        partner = self._find_sim_by_id(self.conversation_partner_id, all_sims)
+        partner = city.registry.get(self.conversation.partner_id)
         if partner:
-            if partner.conversation_history is None: partner.conversation_history = []
-            partner.conversation_history.append(new_entry) # Share history
-            partner.waiting_for_ollama_response = False # Partner isn't waiting yet (will wait on their update cycle)
-            partner.is_my_turn_to_speak = True # Pass the turn to the partner
+            if partner.conversation.history is None: partner.conversation.history = []
+            partner.conversation.history.append(new_entry) # Share history
+            partner.conversation.waiting_for_response = False # Partner isn't waiting yet (will wait on their update cycle)
+            partner.conversation.is_my_turn_to_speak = True # Pass the turn to the partner
             logging.info(f"Sim {self.sim_id}: Passed turn to {partner.sim_id}")
         else:
-            logging.error(f"Sim {self.sim_id}: Partner {self.conversation_partner_id} not found during response handling! Ending interaction.")
+            logging.error(f"Sim {self.sim_id}: Partner {self.conversation.partner_id} not found during response handling! Ending interaction.")
             _end_interaction(self, city, all_sims) # End interaction if partner vanished
 
         # Update self state *after* processing partner
-        self.is_my_turn_to_speak = False # It's no longer the speaker's turn
-        self.conversation_turns += 1 # Increment turn counter *after* successfully speaking
+        self.conversation.is_my_turn_to_speak = False # It's no longer the speaker's turn
+        self.conversation.turns += 1 # Increment turn counter *after* successfully speaking
 
         # Check if max turns reached *after* this turn
         # Calculate max turns *per sim* based on total turns. Each sim speaks roughly half the total turns.
         # Use ceil division equivalent to handle odd max_total_turns gracefully: (N + 1) // 2
         max_turns_per_sim = (MAX_TOTAL_TURNS + 1) // 2
 
-        if self.conversation_turns >= max_turns_per_sim:
-            logging.info(f"Sim {self.sim_id}: Reached max turns ({self.conversation_turns}/{max_turns_per_sim}) in conversation with {self.conversation_partner_id}. Ending interaction.")
+        if self.conversation.turns >= max_turns_per_sim:
+            logging.info(f"Sim {self.sim_id}: Reached max turns ({self.conversation.turns}/{max_turns_per_sim}) in conversation with {self.conversation.partner_id}. Ending interaction.")
             _end_interaction(self, city, all_sims) # End interaction after reaching max turns
 
     elif not self.is_interacting:
         # Ensure conversation bubble is cleared while not interacting
-        self.conversation_message = None
-        self.conversation_message_timer = 0.0
+        self.conversation.message = None
+        self.conversation.message_timer = 0.0
 
 
 def initiate_conversation(initiator_sim, other_sim, city, all_sims, current_time):
     """Handles the conversation initiation logic between two Sims, respecting the Ollama lock."""
     # Global Conversation Lock Check
-    if is_interaction_in_progress(initiator_sim, all_sims):
+    if is_interaction_in_progress(initiator_sim, city):
         return
 
     # Pending Romance Analysis Lock Check (Existing)
@@ -252,20 +241,20 @@ def initiate_conversation(initiator_sim, other_sim, city, all_sims, current_time
         second_speaker_listener.last_interaction_time = current_time
 
         # Initialize conversation details
-        first_speaker.conversation_history = []
-        second_speaker_listener.conversation_history = []
-        first_speaker.conversation_partner_id = second_speaker_listener.sim_id
-        second_speaker_listener.conversation_partner_id = first_speaker.sim_id
-        first_speaker.conversation_turns = 0
-        second_speaker_listener.conversation_turns = 0
-        first_speaker.waiting_for_ollama_response = False # Will be set by _send_request
-        second_speaker_listener.waiting_for_ollama_response = False
-        first_speaker.conversation_last_response_time = current_time
-        second_speaker_listener.conversation_last_response_time = current_time
+        first_speaker.conversation.history = []
+        second_speaker_listener.conversation.history = []
+        first_speaker.conversation.partner_id = second_speaker_listener.sim_id
+        second_speaker_listener.conversation.partner_id = first_speaker.sim_id
+        first_speaker.conversation.turns = 0
+        second_speaker_listener.conversation.turns = 0
+        first_speaker.conversation.waiting_for_response = False # Will be set by _send_request
+        second_speaker_listener.conversation.waiting_for_response = False
+        first_speaker.conversation.last_response_time = current_time
+        second_speaker_listener.conversation.last_response_time = current_time
 
         # Set turns
-        first_speaker.is_my_turn_to_speak = True
-        second_speaker_listener.is_my_turn_to_speak = False
+        first_speaker.conversation.is_my_turn_to_speak = True
+        second_speaker_listener.conversation.is_my_turn_to_speak = False
 
         # --- Send the first conversation request ---
         # Note: We assume _send_conversation_request will be updated per Step 3 to accept
@@ -309,16 +298,16 @@ def _send_conversation_request(speaker, listener, current_time: float) -> bool:
             speaker.sim_id,
             speaker.first_name,
             listener.first_name,
-            speaker.conversation_history, # Send speaker's current view of history
+            speaker.conversation.history, # Send speaker's current view of history
             speaker.personality_description,
             romance_level # Pass the romance level
         )
 
         if request_sent_successfully:
             # Update speaker state on successful request dispatch
-            speaker.waiting_for_ollama_response = True
-            speaker.conversation_last_response_time = current_time # Record time request was sent
-            logging.info(f"Sim {speaker.sim_id}: Conversation request sent. Waiting for response. Turn: {speaker.conversation_turns}")
+            speaker.conversation.waiting_for_response = True
+            speaker.conversation.last_response_time = current_time # Record time request was sent
+            logging.info(f"Sim {speaker.sim_id}: Conversation request sent. Waiting for response. Turn: {speaker.conversation.turns}")
             return True
         else:
             # The client itself indicated failure (e.g., queue full, internal error)
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import numpy as np
+from typing import Dict, List, Optional
+
+CACHE_FORMAT_VERSION = 1 # Bump when the stored layers change meaning
+SEED_FILE = "seed.txt" # Map seed pinned by the first launch without a configured seed
+
+
+def map_cache_key(seed: int, grid_width: int, grid_height: int, sprite_definitions: List[Dict], generation: Dict) -> str:
+    """Returns a hash identifying a generated map: seed, grid size, generation settings and sprite definitions."""
+    payload = json.dumps({
+        'version': CACHE_FORMAT_VERSION,
+        'seed': seed,
+        'grid': [grid_width, grid_height],
+        'generation': generation,
+        'sprites': sprite_definitions,
+    }, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def map_cache_path(cache_dir: str, key: str) -> str:
+    """Returns the cache file path for a key."""
+    return os.path.join(cache_dir, f"map_{key}.npz")
+
+
+def load_map_cache(path: str) -> Optional[Dict[str, np.ndarray]]:
+    """Loads the cached map layers from an .npz file, returning None if it is missing or unreadable."""
+    if not os.path.isfile(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read map cache {path}: {e}. Regenerating.")
+        return None
+
+
+def save_map_cache(path: str, layers: Dict[str, np.ndarray]):
+    """Writes map layers to an uncompressed .npz file (written to a temp file first so readers never see a partial file)."""
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **layers)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f"Could not write map cache {path}: {e}")
+
+
+def pinned_seed(cache_dir: str) -> int:
+    """Returns the map seed pinned in cache_dir, drawing a random one and writing it there on first use.
+
+    Launches without a configured seed then generate the same map, so they hit the map cache.
+    Delete the file to get a new world.
+    """
+    path = os.path.join(cache_dir, SEED_FILE)
+    try:
+        with open(path, 'r') as f:
+            return int(f.read().strip())
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read pinned seed {path}: {e}. Drawing a new one.")
+    seed = random.randrange(2**32)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(f"{seed}\n")
+    except OSError as e:
+        logging.warning(f"Could not write pinned seed {path}: {e}")
+    return seed
@@ -0,0 +1,244 @@
+import logging
+import random
+import numpy as np
+from typing import List, Set, Tuple
+from aisim.src.core.tiles import SpriteTable, COVERED_ID, TILE_GRASS, TILE_PATH, TILE_PROP, TILE_MAP_DTYPE
+
+# Neighbour bits of the path connectivity mask
+PATH_N, PATH_E, PATH_S, PATH_W = 1, 2, 4, 8
+
+# Path sprite for each connectivity mask; ends reuse the straight-end sprites
+PATH_SPRITES = {
+    0: 'path_dirt_h_end', # Isolated cell
+    PATH_N: 'path_dirt_v_end', # End pointing South
+    PATH_S: 'path_dirt_v_end', # End pointing North (use same sprite, visual rotation needed later)
+    PATH_E: 'path_dirt_h_end', # End pointing West
+    PATH_W: 'path_dirt_h_end', # End pointing East
+    PATH_N | PATH_S: 'path_dirt_v_straight',
+    PATH_E | PATH_W: 'path_dirt_h_straight',
+    PATH_N | PATH_E: 'path_dirt_corner_ne',
+    PATH_N | PATH_W: 'path_dirt_corner_nw',
+    PATH_S | PATH_E: 'path_dirt_corner_se',
+    PATH_S | PATH_W: 'path_dirt_corner_sw',
+    PATH_N | PATH_S | PATH_E: 'path_dirt_t_nse',
+    PATH_N | PATH_S | PATH_W: 'path_dirt_t_nsw',
+    PATH_N | PATH_E | PATH_W: 'path_dirt_t_new',
+    PATH_S | PATH_E | PATH_W: 'path_dirt_t_sew',
+    PATH_N | PATH_S | PATH_E | PATH_W: 'path_dirt_cross_nsew',
+}
+
+
+def build_path_lut(sprite_table: SpriteTable, fallback_id: int) -> np.ndarray:
+    """Returns the 16-entry table mapping a connectivity mask to a path sprite ID (fallback_id where a sprite is missing)."""
+    lut = np.full(16, fallback_id, dtype=TILE_MAP_DTYPE)
+    for bits, name in PATH_SPRITES.items():
+        sprite_id = sprite_table.get_id(name)
+        if sprite_id is None:
+            logging.warning(f"Path sprite '{name}' not found. Falling back to sprite ID {fallback_id}.")
+            continue
+        lut[bits] = sprite_id
+    return lut
+
+
+def path_bitmask(path_mask: np.ndarray) -> np.ndarray:
+    """Returns the 4-neighbour connectivity mask of every cell inside a path layer padded by one cell."""
+    return ((path_mask[:-2, 1:-1] * PATH_N) | (path_mask[1:-1, 2:] * PATH_E) |
+            (path_mask[2:, 1:-1] * PATH_S) | (path_mask[1:-1, :-2] * PATH_W)).astype(np.uint8)
+
+
+def autotile_paths(tile_map: np.ndarray, sprite_table: SpriteTable, lut: np.ndarray, first_row: int = 0, first_col: int = 0, end_row: int = None, end_col: int = None):
+    """Re-assigns the sprites of all path cells in a region from their connectivity.
+
+    The region is grown by one cell, since editing a cell changes its neighbours' masks.
+    Without a region the whole map is autotiled.
+    """
+    height, width = tile_map.shape
+    r0, c0 = max(0, first_row - 1), max(0, first_col - 1)
+    r1 = height if end_row is None else min(height, end_row + 1)
+    c1 = width if end_col is None else min(width, end_col + 1)
+    if r0 >= r1 or c0 >= c1:
+        return
+    # Read the path layer with one extra cell on each side (outside the map counts as no path)
+    window = np.zeros((r1 - r0 + 2, c1 - c0 + 2), dtype=bool)
+    src_r0, src_c0 = max(0, r0 - 1), max(0, c0 - 1)
+    src_r1, src_c1 = min(height, r1 + 1), min(width, c1 + 1)
+    window[src_r0 - r0 + 1:src_r1 - r0 + 1, src_c0 - c0 + 1:src_c1 - c0 + 1] = sprite_table.mask(tile_map[src_r0:src_r1, src_c0:src_c1], TILE_PATH)
+    is_path = window[1:-1, 1:-1]
+    region = tile_map[r0:r1, c0:c1]
+    region[is_path] = lut[path_bitmask(window)][is_path]
+
+
+def summed_area_table(mask: np.ndarray) -> np.ndarray:
+    """Returns the zero-padded summed-area table of a 2D mask (shape + 1 in each dimension)."""
+    sat = np.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=np.int32)
+    np.cumsum(np.cumsum(mask, axis=0, dtype=np.int32), axis=1, out=sat[1:, 1:])
+    return sat
+
+
+def window_sums(sat: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Returns the mask sum of every height x width window, indexed by the window's top-left cell."""
+    return sat[height:, width:] - sat[:-height, width:] - sat[height:, :-width] + sat[:-height, :-width]
+
+
+class MapGenerator:
+    """Seeded procedural generator for the city tile map.
+
+    The grass layer is drawn in one NumPy call, the random-walk paths only mark a
+    boolean layer (sprites are assigned once at the end), and props are placed by
+    sampling anchors whose footprint sum in a summed-area table of blocked cells is zero.
+    The same seed and grid size always produce the same map.
+    """
+
+    def __init__(self, sprite_table: SpriteTable, grass_ids: List[int], grid_width: int, grid_height: int, seed: int):
+        """Initializes the generator for a grid of the given size."""
+        self.sprite_table = sprite_table
+        self.grass_ids = grass_ids
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.walk_rng = random.Random(seed) # Scalar draws in the path walk are faster with the stdlib RNG
+
+    def generate(self, num_paths: int = 3, path_max_steps: int = 100, num_props: int = 50, with_pond: bool = True) -> np.ndarray:
+        """Runs all generation stages and returns the tile map of sprite IDs."""
+        tile_map = self._generate_base()
+        if with_pond:
+            self._place_pond(tile_map)
+        path_mask = self._generate_path_mask(tile_map, num_paths, path_max_steps)
+        self._apply_path_sprites(tile_map, path_mask)
+        placed = self._place_props(tile_map, num_props)
+        logging.info(f"Generated {self.grid_width}x{self.grid_height} tile map (seed {self.seed}): {int(path_mask.sum())} path tiles, {placed} props.")
+        return tile_map
+
+    def _generate_base(self) -> np.ndarray:
+        """Fills the whole map with random grass sprites."""
+        grass = np.asarray(self.grass_ids, dtype=TILE_MAP_DTYPE)
+        return grass[self.rng.integers(0, len(grass), size=(self.grid_height, self.grid_width))]
+
+    def _place(self, tile_map: np.ndarray, r: int, c: int, sprite_id: int):
+        """Places a sprite at its top-left cell and marks the rest of its footprint as covered."""
+        h, w = int(self.sprite_table.span_h[sprite_id]), int(self.sprite_table.span_w[sprite_id])
+        tile_map[r:r + h, c:c + w] = COVERED_ID # Slicing clips at the map edge
+        tile_map[r, c] = sprite_id
+
+    def _place_pond(self, tile_map: np.ndarray):
+        """Adds a large pond near the center of the map, if it fits with a margin."""
+        pond_id = self.sprite_table.get_id('water_pond_large')
+        if pond_id is None:
+            return
+        h, w = int(self.sprite_table.span_h[pond_id]), int(self.sprite_table.span_w[pond_id])
+        if self.grid_width > w + 4 and self.grid_height > h + 4:
+            self._place(tile_map, (self.grid_height - h) // 2, (self.grid_width - w) // 2, pond_id)
+
+    def _generate_path_mask(self, tile_map: np.ndarray, num_paths: int, max_steps: int) -> np.ndarray:
+        """Random-walks twisting paths over grass and returns them as a boolean layer."""
+        if self.grid_width < 3 or self.grid_height < 3:
+            return np.zeros(tile_map.shape, dtype=bool)
+        rand = self.walk_rng
+        # Walkable for paths: grass, plus cells that already became path during the walk
+        grass = self.sprite_table.mask(tile_map, TILE_GRASS).tolist()
+        path_tiles: Set[Tuple[int, int]] = set()
+        height, width = self.grid_height, self.grid_width
+
+        for path_idx in range(num_paths):
+            # --- Choose Starting Point near an edge, avoiding corners ---
+            start = None
+            for _ in range(20):
+                edge = rand.randrange(4)
+                if edge == 0: r, c = 0, rand.randint(1, width - 2)
+                elif edge == 1: r, c = height - 1, rand.randint(1, width - 2)
+                elif edge == 2: r, c = rand.randint(1, height - 2), 0
+                else: r, c = rand.randint(1, height - 2), width - 1
+                if grass[r][c] and (r, c) not in path_tiles:
+                    start = (r, c)
+                    break
+            if start is None:
+                logging.debug(f"Path {path_idx + 1}: Could not find valid starting point. Skipping.")
+                continue
+
+            curr_r, curr_c = start
+            prev_r, prev_c = -1, -1 # No previous tile initially
+            path_tiles.add(start)
+
+            # --- Random Walk ---
+            for step in range(max_steps):
+                steps = []
+                weights = []
+                for dr, dc in ((-1, 0), (1, 0), (0, 1), (0, -1)):
+                    next_r, next_c = curr_r + dr, curr_c + dc
+                    if not (0 <= next_r < height and 0 <= next_c < width):
+                        continue
+                    if next_r == prev_r and next_c == prev_c:
+                        continue # Avoid immediate U-turn
+                    is_existing_path = (next_r, next_c) in path_tiles
+                    if not (grass[next_r][next_c] or is_existing_path):
+                        continue # Only grass or existing paths; avoid water, props, covered tiles
+                    weight = 0.3 if is_existing_path else 1.0 # Lower weight for joining existing paths
+                    if prev_r != -1 and next_r - curr_r == curr_r - prev_r and next_c - curr_c == curr_c - prev_c:
+                        weight *= 1.5 # Favor going straight
+                    steps.append((next_r, next_c))
+                    weights.append(weight)
+
+                if not steps:
+                    break # Walker is stuck
+                # Weighted pick (inlined; random.choices costs more than the rest of the step)
+                pick = rand.random() * sum(weights)
+                choice = len(steps) - 1
+                for i, weight in enumerate(weights):
+                    pick -= weight
+                    if pick < 0:
+                        choice = i
+                        break
+                prev_r, prev_c = curr_r, curr_c
+                curr_r, curr_c = steps[choice]
+                path_tiles.add((curr_r, curr_c))
+
+        path_mask = np.zeros(tile_map.shape, dtype=bool)
+        if path_tiles:
+            rows, cols = zip(*path_tiles)
+            path_mask[list(rows), list(cols)] = True
+        return path_mask
+
+    def _apply_path_sprites(self, tile_map: np.ndarray, path_mask: np.ndarray):
+        """Assigns path sprites to every path cell based on its path neighbours."""
+        lut = build_path_lut(self.sprite_table, self.grass_ids[0])
+        tile_map[path_mask] = lut[PATH_N | PATH_S | PATH_E | PATH_W] # Any path sprite marks the cell before autotiling
+        autotile_paths(tile_map, self.sprite_table, lut)
+
+    def _place_props(self, tile_map: np.ndarray, num_props: int) -> int:
+        """Places props on free grass, testing footprints against a summed-area table of blocked cells."""
+        prop_ids = np.asarray(self.sprite_table.ids_with(TILE_PROP))
+        if num_props <= 0 or len(prop_ids) == 0:
+            return 0
+        blocked = ~self.sprite_table.mask(tile_map, TILE_GRASS) # Paths, water, covered cells
+        chosen = self.rng.choice(prop_ids, size=num_props)
+        placed = 0
+        # Props with the same footprint share one summed-area table pass
+        footprints = {}
+        for prop_id in chosen.tolist():
+            key = (int(self.sprite_table.span_h[prop_id]), int(self.sprite_table.span_w[prop_id]))
+            footprints.setdefault(key, []).append(prop_id)
+
+        for (h, w), ids in footprints.items():
+            if h > self.grid_height or w > self.grid_width:
+                continue
+            free = window_sums(summed_area_table(blocked), h, w) == 0
+            anchors = np.flatnonzero(free)
+            if len(anchors) == 0:
+                continue
+            # Sample extra candidates since props placed in this batch can block later ones
+            candidates = self.rng.choice(anchors, size=min(len(anchors), 2 * len(ids)), replace=False)
+            free_width = free.shape[1]
+            remaining = iter(ids)
+            prop_id = next(remaining, None)
+            for anchor in candidates.tolist():
+                if prop_id is None:
+                    break
+                r, c = divmod(anchor, free_width)
+                if blocked[r:r + h, c:c + w].any():
+                    continue # Taken by a prop placed earlier in this batch
+                self._place(tile_map, r, c, prop_id)
+                blocked[r:r + h, c:c + w] = True
+                placed += 1
+                prop_id = next(remaining, None)
+        return placed
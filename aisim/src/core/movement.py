@@ -1,9 +1,17 @@
-import networkx as nx
+import logging
 import math
 import random
+import numpy as np
 from aisim.src.core.configuration import config_manager # Import the centralized config manager
+from aisim.src.core.navigation import path_array
+from aisim.src.core.population import DOWN, LEFT, RIGHT, UP
 
 TILE_SIZE = config_manager.get_entry('city.tile_size')
+POI_TRIP_CHANCE = config_manager.get_entry('navigation.poi_trip_chance', 0.5) # Share of trips that go to a point of interest
+STEER_WAIT_TIME = config_manager.get_entry('movement.steer_wait_time', 0.4) # Blocked this long: try a sidestep
+REPLAN_AFTER_BLOCKED = config_manager.get_entry('movement.replan_after_blocked', 2.0) # Blocked this long: plan a new path
+STOP_CHANCE = 0.01 # Chance per update that a walking Sim pauses for the frame
+WEATHER_MOOD_DRIFT = {"Rainy": -0.005, "Snowy": -0.005, "Sunny": 0.003} # Mood change per second by weather
 def get_tile_coords(x, y, grid_width, grid_height):
     """Converts pixel coordinates to grid tile coordinates (col, row)."""
     col = math.floor(x / TILE_SIZE)
@@ -26,7 +34,11 @@ def get_coords_from_node(node, graph):
     return (0, 0) # Should not happen if node is valid
 
 def get_path(start_coords, end_coords, graph, city_width, city_height):
-    """Calculates the shortest path using A*."""
+    """Calculates the cheapest path over the walk graph using A*.
+
+    Edges weigh their step length in tiles times the mean entry cost of their tiles, so the
+    heuristic is the octile distance in tiles times the lowest entry cost (`graph.graph['min_cost']`).
+    """
     # Clamp end_coords to grid bounds
     end_x = max(0, min(end_coords[0], city_width - 1))
     end_y = max(0, min(end_coords[1], city_height - 1))
@@ -42,12 +54,14 @@ def get_path(start_coords, end_coords, graph, city_width, city_height):
     if start_node == end_node:
         return None  # Already at destination
 
+    import networkx as nx # Deferred so importing this module stays cheap; already loaded once the City exists
     try:
-        # A* heuristic: Euclidean distance
+        min_cost = graph.graph.get('min_cost', 1.0)
+
+        # A* heuristic: octile distance between the tiles (node IDs), never more than the cheapest path
         def heuristic(u, v):
-            pos_u = graph.nodes[u]['pos']
-            pos_v = graph.nodes[v]['pos']
-            return abs(pos_u[0] - pos_v[0]) + abs(pos_u[1] - pos_v[1])
+            d_col, d_row = abs(u[0] - v[0]), abs(u[1] - v[1])
+            return (max(d_col, d_row) + 0.4 * min(d_col, d_row)) * min_cost
 
         path_nodes = nx.astar_path(graph, start_node, end_node, heuristic=heuristic, weight='weight')
         # Convert node path back to coordinate path
@@ -61,6 +75,76 @@ def get_path(start_coords, end_coords, graph, city_width, city_height):
         logging.error(f"Node not found for path calculation: start={start_node}, end={end_node}, error={e}")
         return None
 
+def find_path(sim, city, end_coords, background=False):
+    """Plans a path from the Sim to end_coords with the City's planner and returns the waypoints to walk now.
+
+    With HPA*, the route is kept on the Sim and only its first leg is refined; later legs
+    are refined as the Sim reaches the end of each one (see next_route_leg). With
+    `background` and a path-planner pool, the search is queued and None is returned; the
+    main loop hands the result over through apply_planned_path. With D* Lite, the search is
+    kept on the Sim (`Sim.replanner`) so change_direction can repair it instead of starting over.
+    """
+    sim.route = None
+    sim.replanner = None
+    navigation = getattr(city, 'navigation', None)
+    if navigation is not None and not navigation.reachable(navigation.tile_at((sim.x, sim.y)), navigation.tile_at(end_coords)):
+        return None # Blocked or in another region: a search would only fail after exploring everything reachable
+    if navigation is not None and navigation.incremental: # Planned here: the search state must live with the Sim
+        replanner = navigation.plan_incremental((sim.x, sim.y), end_coords)
+        if replanner is None:
+            return None
+        sim.replanner = replanner
+        return navigation.waypoints(replanner.path())
+    if background and navigation is not None and navigation.planner is not None:
+        navigation.planner.request_path(sim.sim_id, navigation.tile_at((sim.x, sim.y)), navigation.tile_at(end_coords))
+        return None
+    if navigation is not None and navigation.hpa is not None:
+        route = navigation.plan_route((sim.x, sim.y), end_coords)
+        if route is None:
+            return None
+        sim.route = route
+        return navigation.next_leg(route)
+    path = get_path((sim.x, sim.y), end_coords, city.graph, city.width, city.height)
+    if path is None:
+        return None
+    if navigation is not None: # String-pulled to its corners
+        return navigation.waypoints([navigation.tile_at(point) for point in path])
+    return path_array(path)
+
+def next_route_leg(sim, city):
+    """Returns the waypoints of the Sim's next HPA* route leg, or None when there is no route left."""
+    if sim.route is None or sim.route.done:
+        sim.route = None
+        return None
+    path = city.navigation.next_leg(sim.route)
+    if path is None:
+        sim.route = None # Stale after a terrain change; a new trip is planned
+    return path
+
+def apply_planned_path(sim, tiles, city):
+    """Hands a path planned in the background to its Sim, unless the Sim got busy or found another path meanwhile."""
+    if sim.path is not None or sim.is_interacting or not tiles or len(tiles) < 2:
+        return
+    sim.path = city.navigation.waypoints(tiles, smooth=False) # String-pulled by the planner's workers
+    sim.path_index = 0
+    sim.route = None
+
+def plan_trip(sim, city):
+    """Picks a new trip: a point of interest read from its shared flow field, or a random destination.
+
+    Returns None while a background search for the Sim is in flight; the Sim idles until it arrives.
+    """
+    navigation = getattr(city, 'navigation', None)
+    if navigation is not None and navigation.planner is not None and navigation.planner.is_pending(sim.sim_id):
+        return None
+    if navigation is not None and random.random() < POI_TRIP_CHANCE:
+        poi = navigation.random_poi()
+        path = navigation.route((sim.x, sim.y), poi) if poi else None
+        if path is not None:
+            sim.route = None
+            return path
+    return find_path(sim, city, city.random_destination((sim.x, sim.y)), background=True)
+
 def movement_update(sim, dt, city, weather_state, all_sims, current_time, tile_size, direction_change_frequency):
     """Updates the Sim's state, following a path if available, checks for collisions, and logs data."""
     sim.is_blocked = False # Reset blocked status at the start of movement update
@@ -70,38 +154,32 @@ def movement_update(sim, dt, city, weather_state, all_sims, current_time, tile_s
     sim.y = max(0, min(sim.y, city.height - 1))
 
     # Update current tile based on position *before* any early returns
-    sim.current_tile = get_tile_coords(sim.x, sim.y, city.grid_width, city.grid_height)
+    tile = get_tile_coords(sim.x, sim.y, city.grid_width, city.grid_height)
+    congestion = getattr(city, 'congestion', None)
+    if tile != sim.current_tile and congestion is not None: # Tile transitions feed the City's density grid
+        congestion.enter(tile)
+    sim.current_tile = tile
 
     # logging.debug(f"Sim {sim.sim_id}: movement update called, x={sim.x:.2f}, y={sim.y:.2f}, current_tile={sim.current_tile}, target={sim.target}, path={sim.path}, path_index={sim.path_index}")
-    if not hasattr(sim, 'time_since_last_direction_change'):
-        sim.time_since_last_direction_change = 0.0
-
     # If interacting, no further movement logic is needed, but tile is updated
-    if hasattr(sim, 'is_interacting') and sim.is_interacting:
+    if sim.is_interacting:
         return
 
     # Only assign a new path if not interacting and no path exists
-    if not sim.path and not sim.is_interacting:
-        sim.path = get_path((sim.x, sim.y), (random.randint(0, city.width), random.randint(0, city.height)), city.graph, city.width, city.height)
+    if sim.path is None and not sim.is_interacting:
+        sim.path = plan_trip(sim, city)
         # logging.debug(f"Sim {sim.sim_id}: New path assigned in movement_update: {sim.path}") # Log path assignment
-        if not sim.path:  # Still no path (e.g., couldn't find one)
+        if sim.path is None:  # Still no path (e.g., couldn't find one)
             return # Wait until next update to try again
-    # Follow the current path
-    if sim.path and sim.path_index < len(sim.path):
-        target_x, target_y = sim.path[sim.path_index]
+    # Follow the current path (an (n, 2) array of corner waypoints)
+    if sim.path is not None and sim.path_index < len(sim.path):
+        target_x, target_y = sim.path[sim.path_index].tolist()
         dx = target_x - sim.x
         dy = target_y - sim.y
-        distance = math.sqrt(dx**2 + dy**2)
+        distance = math.hypot(dx, dy)
 
         if distance < TILE_SIZE/4: # Reached waypoint (1/4 tile distance)
-            # logging.debug(f"Sim {sim.sim_id}: Reached waypoint {sim.path_index} at ({sim.x:.1f}, {sim.y:.1f}), target was ({target_x:.1f}, {target_y:.1f})")
-            sim.path_index += 1
-            if sim.path_index >= len(sim.path): # Reached final destination
-                # logging.debug(f"Sim {sim.sim_id}: Reached final destination at ({sim.x:.1f}, {sim.y:.1f})")
-                sim.path = None
-                sim.target = None
-                sim.path_index = 0
-                sim.mood = min(1.0, sim.mood + 0.1) # Mood boost for reaching destination
+            advance_waypoint(sim, city)
         else: # Move towards waypoint
             # Normalize direction vector
             norm_dx = dx / distance
@@ -113,30 +191,15 @@ def movement_update(sim, dt, city, weather_state, all_sims, current_time, tile_s
             next_tile = get_tile_coords(next_x, next_y, city.grid_width, city.grid_height)
 
             # --- Collision Detection BEFORE Movement ---
-            collision_detected = False
-            for other_sim in all_sims:
-                if other_sim.sim_id == sim.sim_id:
-                    continue  # Don't check collision with self
-
-                # Ensure both tiles are valid before comparing
-                if (other_sim.current_tile is not None and
-                    next_tile is not None and
-                    len(other_sim.current_tile) == 2 and
-                    len(next_tile) == 2 and
-                    other_sim.current_tile == next_tile): # Direct tuple comparison
-                    # Collision detected, change direction immediately
-                    collision_detected = True
-                    # logging.debug(f"Sim {sim.sim_id}: Predicted collision at tile {next_tile} with Sim {other_sim.sim_id}. Changing direction.")
-                    change_direction(sim, city, direction_change_frequency)
-                    break  # Found a collision, no need to check further
-
-            if collision_detected:
-                # No movement this frame due to collision
-                sim.is_blocked = True
-                return # Stop movement processing for this frame
+            registry = getattr(city, 'registry', None)
+            if registry.is_occupied(next_tile, sim) if registry is not None else is_tile_occupied(next_tile, sim, all_sims):
+                handle_blocked(sim, city, all_sims, dt, norm_dx, norm_dy, direction_change_frequency,
+                               registry.tiles if registry is not None else None)
+                return # No movement this frame due to collision
+            sim.blocked_time = 0.0
 
             # --- Move (if no collision) ---
-            if random.random() < 0.01:  # Reduced chance to stop
+            if random.random() < STOP_CHANCE:  # Reduced chance to stop
                 return
             # is_blocked check might be redundant now due to early return, but keep for safety
             if not sim.is_blocked:
@@ -163,10 +226,9 @@ def movement_update(sim, dt, city, weather_state, all_sims, current_time, tile_s
                 sim.animation_frame = 0 # Reset animation frame
 
     # --- Mood Update based on Weather ---
-    if weather_state in ["Rainy", "Snowy"]:
-        sim.mood = max(-1.0, sim.mood - 0.005 * dt) # Slowly decrease mood in bad weather
-    elif weather_state == "Sunny":
-         sim.mood = min(1.0, sim.mood + 0.003 * dt) # Slowly increase mood in good weather
+    drift = WEATHER_MOOD_DRIFT.get(weather_state)
+    if drift:
+        sim.mood = max(-1.0, min(1.0, sim.mood + drift * dt)) # Slowly follows the weather
 
     # --- Interaction Check ---
     # Clamp mood
@@ -174,11 +236,199 @@ def movement_update(sim, dt, city, weather_state, all_sims, current_time, tile_s
 
     # Current tile is now updated at the beginning of the function
 
+def advance_waypoint(sim, city):
+    """Moves a Sim that reached its current waypoint on to the next one, the next route leg, or arrival."""
+    # logging.debug(f"Sim {sim.sim_id}: Reached waypoint {sim.path_index} at ({sim.x:.1f}, {sim.y:.1f})")
+    sim.path_index += 1
+    sim.sidestepping = False # A sidestep waypoint is only ever the current one
+    if sim.path_index >= len(sim.path) and sim.route is not None: # End of an HPA* leg: refine the next one
+        next_leg = next_route_leg(sim, city)
+        if next_leg is not None:
+            sim.path = next_leg
+            sim.path_index = 0
+    if sim.path_index >= len(sim.path): # Reached final destination
+        # logging.debug(f"Sim {sim.sim_id}: Reached final destination at ({sim.x:.1f}, {sim.y:.1f})")
+        sim.path = None
+        sim.target = None
+        sim.path_index = 0
+        sim.replanner = None
+        sim.mood = min(1.0, sim.mood + 0.1) # Mood boost for reaching destination
+
+def handle_blocked(sim, city, all_sims, dt, norm_dx, norm_dy, direction_change_frequency, occupied=None):
+    """Local steering for a Sim whose next tile is occupied: wait for the other Sim to move on,
+    then sidestep, and only throw the path away if the way stays blocked.
+
+    `occupied` is the set of (col, row) tiles Sims stand on, if the caller has it (see sidestep).
+    """
+    sim.is_blocked = True
+    sim.blocked_time += dt
+    if sim.blocked_time >= REPLAN_AFTER_BLOCKED:
+        # logging.debug(f"Sim {sim.sim_id}: Blocked at tile {sim.current_tile} for {sim.blocked_time:.1f}s. Replanning.")
+        sim.blocked_time = 0.0
+        change_direction(sim, city, direction_change_frequency)
+    elif sim.blocked_time >= STEER_WAIT_TIME and not sim.sidestepping:
+        sidestep(sim, city, all_sims, norm_dx, norm_dy, occupied)
+
+def movement_update_population(population, dt, city, weather_state, all_sims, direction_change_frequency):
+    """Runs movement_update for every Sim of a `SimPopulation` at once.
+
+    Waypoint following, collision prediction, moving, facing and weather mood drift are
+    vector operations over the population arrays. Only the events stay per Sim in Python:
+    planning a trip, reaching a waypoint, and steering around a blocked tile.
+    """
+    n = population.count
+    if n == 0:
+        return
+    sims = population.sims
+    x, y = population.x, population.y
+    population.is_blocked[:] = False
+    np.clip(x, 0, city.width - 1, out=x)
+    np.clip(y, 0, city.height - 1, out=y)
+
+    # Current tiles (see get_tile_coords); tile transitions feed the City's density grid
+    col = np.clip(np.floor(x / TILE_SIZE).astype(np.int32), 0, city.grid_width - 1)
+    row = np.clip(np.floor(y / TILE_SIZE).astype(np.int32), 0, city.grid_height - 1)
+    congestion = getattr(city, 'congestion', None)
+    registry = getattr(city, 'registry', None)
+    moved = (col != population.tile_col) | (row != population.tile_row)
+    if moved.any():
+        if congestion is not None:
+            congestion.enter_many(col[moved], row[moved])
+        if registry is not None: # The arrays are written directly below, so the tile index is told here
+            for slot, tile in zip(np.flatnonzero(moved).tolist(), zip(col[moved].tolist(), row[moved].tolist())):
+                sim = sims[slot]
+                if registry.get(sim.sim_id) is sim:
+                    registry.move(sim, tile)
+    population.tile_col[:] = col
+    population.tile_row[:] = row
+
+    active = ~population.is_interacting
+    navigation = getattr(city, 'navigation', None)
+    pending = navigation.planner.active_requests if navigation is not None and navigation.planner is not None else ()
+    for slot in np.flatnonzero(active & ~population.has_path).tolist():
+        sim = sims[slot]
+        if sim.sim_id in pending: # Still waiting for its background search
+            continue
+        path = plan_trip(sim, city)
+        if path is not None:
+            sim.path = path
+    walking = active & population.has_path # Sims still without a path wait for the next update
+
+    # Waypoint following and arrival detection
+    following = walking & (population.path_index < population.path_length)
+    dx = population.waypoint_x - x
+    dy = population.waypoint_y - y
+    distance = np.hypot(dx, dy)
+    arrived = following & (distance < TILE_SIZE / 4)
+    for slot in np.flatnonzero(arrived).tolist():
+        advance_waypoint(sims[slot], city)
+    movers = following & ~arrived
+    distance[~movers] = 1.0
+    norm_dx, norm_dy = dx / distance, dy / distance
+    step = population.speed * dt
+    next_x, next_y = x + norm_dx * step, y + norm_dy * step
+
+    # Collision prediction: a next tile any other Sim stands on blocks the move
+    width = city.grid_width
+    tiles = row.astype(np.int64) * width + col
+    next_tiles = (np.clip(np.floor(next_y / TILE_SIZE).astype(np.int64), 0, city.grid_height - 1) * width
+                  + np.clip(np.floor(next_x / TILE_SIZE).astype(np.int64), 0, width - 1))
+    occupied = np.sort(tiles)
+    others = (np.searchsorted(occupied, next_tiles, side='right') - np.searchsorted(occupied, next_tiles, side='left')
+              - (next_tiles == tiles))
+    blocked = movers & (others > 0)
+    blocked_slots = np.flatnonzero(blocked).tolist()
+    occupied = None # Tiles Sims stand on, for sidestep, instead of scanning all Sims
+    if blocked_slots:
+        occupied = registry.tiles if registry is not None else set(zip(col.tolist(), row.tolist()))
+    for slot in blocked_slots:
+        handle_blocked(sims[slot], city, all_sims, dt, float(norm_dx[slot]), float(norm_dy[slot]), direction_change_frequency, occupied)
+    free = movers & ~blocked
+    population.blocked_time[free] = 0.0
+    paused = free & (np.random.random(n) < STOP_CHANCE)
+    going = free & ~paused
+    x[going] = next_x[going]
+    y[going] = next_y[going]
+
+    # Facing follows the dominant axis of the step; a turn restarts the walk cycle
+    new_direction = np.where(np.abs(norm_dx) > np.abs(norm_dy), np.where(norm_dx > 0, RIGHT, LEFT),
+                             np.where(norm_dy > 0, DOWN, UP)).astype(np.int8)
+    population.direction_timer[going] += dt
+    turned = going & (population.direction != new_direction)
+    population.direction[turned] = new_direction[turned]
+    population.previous_direction[turned] = new_direction[turned]
+    population.previous_angle[turned] = np.arctan2(norm_dy[turned], norm_dx[turned])
+    population.direction_timer[turned] = 0.0
+    population.animation_frame[turned] = 0
+
+    # Weather mood drift, for the Sims movement_update would not have returned early for
+    drift = WEATHER_MOOD_DRIFT.get(weather_state)
+    settled = walking & ~blocked & ~paused
+    if drift:
+        population.mood[settled] += drift * dt
+    np.clip(population.mood, -1.0, 1.0, out=population.mood)
+
+def is_tile_occupied(tile, sim, all_sims):
+    """Checks whether another Sim stands on a tile."""
+    for other_sim in all_sims:
+        if other_sim is not sim and other_sim.current_tile == tile:
+            return True
+    return False
+
+def sidestep(sim, city, all_sims, norm_dx, norm_dy, occupied=None):
+    """Steps around a blocking Sim: inserts the center of a free neighbouring tile, to the side of
+    (or diagonally past) the direction of travel, as the next waypoint. Returns True if one was found.
+
+    `occupied`, the set of tiles Sims stand on, replaces a scan of all_sims per candidate tile.
+    """
+    col, row = sim.current_tile
+    # Unit step toward the blocked tile, then its two perpendiculars and the two forward diagonals
+    step_col, step_row = round(norm_dx), round(norm_dy)
+    sides = [(-step_row, step_col), (step_row, -step_col)]
+    random.shuffle(sides) # No preferred side, so two Sims facing each other rarely pick the same escape
+    forward_diagonals = [(step_col + side_col, step_row + side_row) for side_col, side_row in sides]
+    for d_col, d_row in forward_diagonals + sides:
+        if (d_col, d_row) == (0, 0) or abs(d_col) > 1 or abs(d_row) > 1:
+            continue
+        tile = (col + d_col, row + d_row)
+        if not (0 <= tile[0] < city.grid_width and 0 <= tile[1] < city.grid_height) or tile not in city.graph:
+            continue
+        if (tile in occupied) if occupied is not None else is_tile_occupied(tile, sim, all_sims):
+            continue
+        sim.path = np.insert(path_array(sim.path), sim.path_index, get_coords_from_node(tile, city.graph), axis=0)
+        sim.sidestepping = True
+        return True
+    return False
+
+def repair_path(sim, city):
+    """Repairs the Sim's D* Lite search around the Sims standing next to it. Returns True if it has a new path."""
+    if getattr(sim, 'replanner', None) is None:
+        return False
+    col, row = sim.current_tile
+    registry = getattr(city, 'registry', None)
+    if registry is not None:
+        blocked = [other.current_tile for other in registry.near(sim.current_tile) if other is not sim]
+    else:
+        blocked = [other.current_tile for other in city.sims
+                   if other is not sim and abs(other.current_tile[0] - col) <= 1 and abs(other.current_tile[1] - row) <= 1]
+    path = city.navigation.repair(sim.replanner, (sim.x, sim.y), blocked)
+    if path is None:
+        sim.replanner = None
+        return False
+    sim.path = path
+    sim.path_index = 0
+    sim.target = tuple(path[0].tolist())
+    sim.sidestepping = False
+    return True
+
 def change_direction(sim, city, direction_change_frequency):
-    """Changes the Sim's direction."""
+    """Changes the Sim's direction (or, with D* Lite, repairs its path around the blockage)."""
+    if repair_path(sim, city):
+        return
     # Stop following the current path
     sim.path = None
     sim.target = None
+    sim.sidestepping = False
 
     # Get available directions
     available_directions = get_available_directions(sim, city)
@@ -189,10 +439,10 @@ def change_direction(sim, city, direction_change_frequency):
         new_direction = random.choice(available_directions)
         # print(f"Sim {sim.sim_id}: Available directions: {available_directions}, chosen direction: {new_direction}")
         # Update the Sim's path
-        sim.path = get_path((sim.x, sim.y), new_direction, city.graph, city.width, city.height)
-        if sim.path:
+        sim.path = find_path(sim, city, new_direction)
+        if sim.path is not None:
             sim.path_index = 0
-            sim.target = sim.path[sim.path_index]
+            sim.target = tuple(sim.path[sim.path_index].tolist())
             # logging.debug(f"Sim {sim.sim_id}: Changed direction to {new_direction}")
         # else:
             # logging.debug(f"Sim {sim.sim_id}: No path found after changing direction.")
@@ -211,15 +461,13 @@ def get_available_directions(sim, city):
             # logging.warning(f"Sim {sim.sim_id}: current_node {current_node} not in city.graph.nodes")
             return []
         neighbors = list(city.graph.neighbors(current_node))
+        registry = getattr(city, 'registry', None)
+        interacting = list(registry.interacting.values()) if registry is not None else [other for other in city.sims if other.is_interacting]
         for neighbor in neighbors:
             neighbor_coords = get_coords_from_node(neighbor, city.graph)
             if neighbor_coords:
                 # Check if any sim is interacting at the neighbor coords
-                is_interacting = False
-                for other_sim in city.sims:
-                    if other_sim.is_interacting and math.dist((other_sim.x, other_sim.y), neighbor_coords) < 10:
-                        is_interacting = True
-                    break
+                is_interacting = any(math.dist((other_sim.x, other_sim.y), neighbor_coords) < 10 for other_sim in interacting)
                 if not is_interacting:
                     directions.append(neighbor_coords)
     # logging.debug(f"Sim {sim.sim_id}: Available directions: {directions}")
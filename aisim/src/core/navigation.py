@@ -0,0 +1,459 @@
+import heapq
+import logging
+import random
+import weakref
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from aisim.src.core.tiles import SpriteTable, COVERED_ID, TILE_PATH, TILE_WATER, TILE_PROP
+from aisim.src.core.gridsearch import NEIGHBOURS, line_tiles, string_pull
+from aisim.src.core.hpa import HierarchicalPathfinder
+from aisim.src.core.dstar_lite import DStarLite
+from aisim.src.core.path_planner import PathPlanner
+
+# Points of interest Sims can walk to: name -> category flags of the tiles (or footprints) they gather at
+POI_FLAGS = {'path': TILE_PATH, 'pond': TILE_WATER, 'props': TILE_PROP}
+# Footprints Sims cannot walk onto
+BLOCKING_FLAGS = TILE_WATER | TILE_PROP
+
+
+def footprint_flags(tile_map: np.ndarray, sprite_table: SpriteTable) -> np.ndarray:
+    """Returns per-cell category flags where covered cells take the flags of the sprite covering them.
+
+    Only props and water are placed with covered footprints, so only their anchors are painted.
+    """
+    flags = sprite_table.flags[tile_map]
+    covered = tile_map == COVERED_ID
+    if not covered.any():
+        return flags
+    spans = (sprite_table.span_w > 1) | (sprite_table.span_h > 1)
+    anchors = np.argwhere(spans[tile_map] & ((flags & (TILE_PROP | TILE_WATER)) != 0))
+    for r, c in anchors:
+        sprite_id = tile_map[r, c]
+        h, w = int(sprite_table.span_h[sprite_id]), int(sprite_table.span_w[sprite_id])
+        region = flags[r:r + h, c:c + w]
+        region[covered[r:r + h, c:c + w]] = sprite_table.flags[sprite_id]
+    return flags
+
+
+def dilate(mask: np.ndarray) -> np.ndarray:
+    """Grows a boolean mask by one cell in all 8 directions."""
+    grown = mask.copy()
+    grown[1:, :] |= mask[:-1, :]
+    grown[:-1, :] |= mask[1:, :]
+    vertical = grown.copy() # Growing the vertical result sideways also covers the diagonals
+    grown[:, 1:] |= vertical[:, :-1]
+    grown[:, :-1] |= vertical[:, 1:]
+    return grown
+
+
+def terrain_costs(flags: np.ndarray, path_cost: float = 1.0) -> np.ndarray:
+    """Returns per-tile entry costs from footprint flags (see `footprint_flags`): inf under water and props, `path_cost` on paths, 1 elsewhere."""
+    costs = np.where((flags & TILE_PATH) != 0, np.float32(path_cost), np.float32(1.0)).astype(np.float32)
+    costs[(flags & BLOCKING_FLAGS) != 0] = np.inf
+    return costs
+
+
+def label_components(walkable: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Labels the 8-connected regions of a boolean mask.
+
+    Returns (labels, count): int32 labels 1..count on walkable cells and 0 elsewhere. Works
+    on horizontal runs of walkable cells, joining runs of neighbouring rows that touch
+    (diagonally included), so only the runs go through the Python union-find.
+    """
+    height, width = walkable.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = walkable
+    edges = np.diff(padded, axis=1)
+    run_rows, starts = np.nonzero(edges == 1) # Row-major order, so runs line up with walkable cells
+    ends = np.nonzero(edges == -1)[1] # Exclusive
+    parent = list(range(len(starts)))
+
+    def find(run):
+        while parent[run] != run:
+            parent[run] = parent[parent[run]]
+            run = parent[run]
+        return run
+
+    row_first = np.searchsorted(run_rows, np.arange(height + 1))
+    for row in range(1, height):
+        above = slice(row_first[row - 1], row_first[row])
+        lo, hi = row_first[row], row_first[row + 1]
+        if lo == hi or above.start == above.stop:
+            continue
+        # Runs of the row above touching each run: end reaches past its start - 1 and start before its end + 1
+        first = above.start + np.searchsorted(ends[above], starts[lo:hi], side='left')
+        last = above.start + np.searchsorted(starts[above], ends[lo:hi], side='right')
+        for run, a, b in zip(range(lo, hi), first.tolist(), last.tolist()):
+            for other in range(a, b):
+                root, other_root = find(run), find(other)
+                if root != other_root:
+                    parent[other_root] = root
+    roots = np.array([find(run) for run in range(len(starts))], dtype=np.int64)
+    unique_roots, run_labels = np.unique(roots, return_inverse=True)
+    labels = np.zeros(walkable.shape, dtype=np.int32)
+    labels[walkable] = np.repeat(run_labels.astype(np.int32) + 1, ends - starts)
+    return labels, len(unique_roots)
+
+
+def smooth_tiles(tiles: List[Tuple[int, int]], costs: np.ndarray) -> List[Tuple[int, int]]:
+    """String-pulls a tile path down to its corners over a cost grid (see `string_pull`)."""
+    return string_pull(tiles, costs.ravel().tolist(), costs.shape[1])
+
+
+def path_array(points) -> np.ndarray:
+    """Packs waypoints into a compact (n, 2) float32 array, the form Sims store their path in."""
+    return np.asarray(points, dtype=np.float32).reshape(-1, 2)
+
+
+def dijkstra_field(costs: np.ndarray, goals: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Runs a multi-source Dijkstra from the goal cells over a grid of per-cell entry costs.
+
+    Returns (distance, next_index): the cost to reach the nearest goal from every cell
+    (inf if unreachable) and the flat index of the neighbour to step to (-1 at goals and
+    unreachable cells). Cells with an infinite cost are never entered.
+    """
+    height, width = costs.shape
+    flat_costs = costs.ravel().tolist()
+    distance = [float('inf')] * (height * width)
+    next_index = [-1] * (height * width)
+    heap = []
+    for index in np.flatnonzero(goals.ravel()).tolist():
+        distance[index] = 0.0
+        heap.append((0.0, index))
+    heapq.heapify(heap)
+    neighbours = [(dc, dr, dr * width + dc, step) for dc, dr, step in NEIGHBOURS]
+    while heap:
+        dist, index = heapq.heappop(heap)
+        if dist > distance[index]:
+            continue # Stale entry
+        row, col = divmod(index, width)
+        # Searching outward from the goals: a Sim at `other` would step into `index`, paying its entry cost
+        entry_cost = flat_costs[index]
+        for dc, dr, offset, step in neighbours:
+            c, r = col + dc, row + dr
+            if 0 <= c < width and 0 <= r < height:
+                other = index + offset
+                new_dist = dist + step * entry_cost
+                if new_dist < distance[other] and flat_costs[other] != float('inf'):
+                    distance[other] = new_dist
+                    next_index[other] = index
+                    heapq.heappush(heap, (new_dist, other))
+    return (np.array(distance, dtype=np.float32).reshape(height, width),
+            np.array(next_index, dtype=np.int32).reshape(height, width))
+
+
+class FlowField:
+    """Distance and next-step field toward a set of goal tiles, shared by every Sim heading there."""
+
+    def __init__(self, costs: np.ndarray, goals: np.ndarray):
+        """Computes the field for the goal mask over the given cost grid."""
+        self.grid_height, self.grid_width = costs.shape
+        self.distance, self.next_index = dijkstra_field(costs, goals)
+        self._next = self.next_index.ravel()
+
+    def reachable(self, col: int, row: int) -> bool:
+        """Checks whether a goal can be reached from (col, row)."""
+        return bool(np.isfinite(self.distance[row, col]))
+
+    def next_step(self, col: int, row: int) -> Optional[Tuple[int, int]]:
+        """Returns the neighbouring tile to step to from (col, row), or None at a goal or if unreachable."""
+        index = int(self._next[row * self.grid_width + col])
+        if index < 0:
+            return None
+        row, col = divmod(index, self.grid_width)
+        return (col, row)
+
+    def tiles_from(self, col: int, row: int) -> Optional[List[Tuple[int, int]]]:
+        """Returns the tiles from (col, row) to its nearest goal (both included), or None if unreachable."""
+        if not self.reachable(col, row):
+            return None
+        width = self.grid_width
+        index = row * width + col
+        tiles = [(col, row)]
+        while self._next[index] >= 0:
+            index = int(self._next[index])
+            tiles.append((index % width, index // width))
+        return tiles
+
+
+class Navigation:
+    """Routing over a full (non-streamed) tile map.
+
+    Holds flow fields toward the City's points of interest (path tiles, props and the
+    pond), computed on first use and cached until the terrain changes, so Sims walking
+    to the same kind of place read their route from one shared field instead of each
+    running their own search. With the 'hpa' planner, point-to-point trips go through a
+    `HierarchicalPathfinder` instead of the A* walk graph. With the 'dstar_lite' planner,
+    each trip keeps a `DStarLite` search that is repaired when the Sim gets blocked or the
+    terrain changes. With `path_workers`, trips are planned in the background by a
+    `PathPlanner` process pool. Point-to-point searches see congestion (`set_penalty`)
+    on top of the terrain costs; the shared flow fields use the terrain costs alone, so
+    crowding never forces them to be recomputed.
+    """
+
+    def __init__(self, tile_map: np.ndarray, sprite_table: SpriteTable, tile_size: int, planner: str = 'astar', cluster_size: int = 16,
+                 path_workers: int = 0, smooth_paths: bool = True, path_cost: float = 1.0,
+                 terrain: Optional[np.ndarray] = None, components: Optional[np.ndarray] = None, flow_fields: bool = True):
+        """Builds the per-tile costs and goal masks; planner is 'astar' (walk graph), 'hpa' or 'dstar_lite'.
+
+        `terrain` and `components` are the costs and component labels already derived from
+        tile_map (loaded from the map cache), which are then not recomputed. Without
+        `flow_fields` no points of interest are marked, so every trip is searched.
+        """
+        self.sprite_table = sprite_table
+        self.flow_fields = flow_fields
+        self._max_span = int(max(sprite_table.span_w.max(initial=1), sprite_table.span_h.max(initial=1))) # Widest footprint in tiles
+        self.tile_size = tile_size
+        self.smooth_paths = smooth_paths
+        self.path_cost = path_cost
+        self.grid_height, self.grid_width = tile_map.shape
+        # Entry cost per tile (inf under water and props)
+        self.terrain = terrain if terrain is not None else terrain_costs(footprint_flags(tile_map, sprite_table), path_cost)
+        self.penalty = np.zeros(tile_map.shape, dtype=np.float32) # Extra cost from congestion, as a multiple of the terrain cost
+        # Terrain with congestion; updated in place, so searches holding it see every change
+        self.costs = self.terrain.copy()
+        # costs as a flat list, built on first use and kept in step with costs; shared by string-pulling and the D* Lite searches
+        self._flat_costs: Optional[List[float]] = None
+        self.components = np.zeros(tile_map.shape, dtype=np.int32) # Connected walkable regions, 1..n (0 = blocked)
+        self._component_cells = np.zeros(0, dtype=np.int64) # Flat cells sorted by component, sliced by _component_offsets
+        self._component_offsets = np.zeros(1, dtype=np.int64)
+        self.goals: Dict[str, np.ndarray] = {}
+        self._fields: Dict[str, FlowField] = {}
+        self.hpa = None
+        if planner == 'hpa':
+            self.hpa = HierarchicalPathfinder(self.costs, cluster_size)
+        self.incremental = planner == 'dstar_lite'
+        self._replanners = weakref.WeakSet() # Live per-trip D* Lite searches, told about terrain edits
+        self.planner = PathPlanner(self.costs, path_workers, smooth_paths) if path_workers > 0 else None
+        self.update_terrain(tile_map, terrain=terrain, components=components)
+
+    def update_terrain(self, tile_map: np.ndarray, region: Optional[Tuple[int, int, int, int]] = None,
+                       terrain: Optional[np.ndarray] = None, components: Optional[np.ndarray] = None):
+        """Recomputes costs, components and goals after the tile map changed and drops the cached fields.
+
+        `region` (first_col, first_row, end_col, end_row) covers the changed tiles (and the
+        footprints of changed anchors); only it and the cells next to it are recomputed, and
+        components are relabelled only if walkability changed there. `terrain` and
+        `components`, when given, are used instead of being derived from tile_map.
+        """
+        if region is not None:
+            self._update_region(tile_map, region)
+            return
+        flags = footprint_flags(tile_map, self.sprite_table)
+        self.terrain = terrain if terrain is not None else terrain_costs(flags, self.path_cost)
+        self.costs[:] = self.terrain * (1 + self.penalty)
+        self._sync_flat_costs()
+        self._label_components(components)
+        self.goals = {}
+        for name, goals in self._goal_masks(flags).items():
+            if goals.any():
+                self.goals[name] = goals
+        self._fields.clear()
+
+    def _goal_masks(self, flags: np.ndarray) -> Dict[str, np.ndarray]:
+        """Returns the goal mask of each point of interest over a block of footprint flags (none without flow fields)."""
+        masks = {}
+        for name, poi_flags in (POI_FLAGS.items() if self.flow_fields else ()):
+            footprint = (flags & poi_flags) != 0
+            # Sims gather next to ponds and props; paths are walked onto
+            masks[name] = footprint if name == 'path' else dilate(footprint) & ~footprint
+        return masks
+
+    def _update_region(self, tile_map: np.ndarray, region: Tuple[int, int, int, int]):
+        """Recomputes terrain, costs and goals around a changed region of the tile map (see update_terrain)."""
+        first_col, first_row, end_col, end_row = region
+        height, width = self.grid_height, self.grid_width
+        # Path edits re-autotile the neighbouring cells as well
+        col0, row0 = max(0, first_col - 1), max(0, first_row - 1)
+        col1, row1 = min(width, end_col + 1), min(height, end_row + 1)
+        # Flags are read one cell further for the goal dilation, and span - 1 more up-left for footprints reaching in from their anchors
+        reach = self._max_span
+        block_col, block_row = max(0, col0 - reach), max(0, row0 - reach)
+        flags = footprint_flags(tile_map[block_row:min(height, row1 + 1), block_col:min(width, col1 + 1)], self.sprite_table)
+        inner = (slice(row0 - block_row, row1 - block_row), slice(col0 - block_col, col1 - block_col))
+        cells = (slice(row0, row1), slice(col0, col1))
+
+        terrain = terrain_costs(flags[inner], self.path_cost)
+        terrain_changed = (terrain != self.terrain[cells]).any()
+        walkability_changed = (np.isfinite(terrain) != np.isfinite(self.terrain[cells])).any()
+        self.terrain[cells] = terrain
+        self.costs[cells] = terrain * (1 + self.penalty[cells])
+        tiles = [(col, row) for row in range(row0, row1) for col in range(col0, col1)]
+        self._sync_flat_costs(tiles)
+        if walkability_changed:
+            self._label_components()
+        self._publish_costs(tiles)
+
+        for name, goals in self._goal_masks(flags).items():
+            mask = self.goals.get(name)
+            if mask is None:
+                if not goals[inner].any():
+                    continue
+                mask = self.goals[name] = np.zeros((height, width), dtype=bool)
+            if (mask[cells] == goals[inner]).all():
+                continue
+            mask[cells] = goals[inner]
+            self._fields.pop(name, None)
+            if not mask.any():
+                del self.goals[name]
+        if terrain_changed: # Every field's distances run over the terrain
+            self._fields.clear()
+
+    def set_penalty(self, penalty: np.ndarray) -> List[Tuple[int, int]]:
+        """Sets the congestion penalty per tile (see `CongestionGrid.penalty`); returns the (col, row) tiles whose cost changed."""
+        costs = self.terrain * (1 + penalty)
+        changed = costs != self.costs # Blocked tiles stay inf, so they never count as changed
+        self.penalty = penalty
+        if not changed.any():
+            return []
+        self.costs[changed] = costs[changed]
+        rows, cols = np.nonzero(changed)
+        tiles = list(zip(cols.tolist(), rows.tolist()))
+        self._sync_flat_costs(tiles)
+        self._publish_costs(tiles)
+        return tiles
+
+    def flat_costs(self) -> List[float]:
+        """Returns `costs` as a flat row-major list; scalar lookups on a list are much faster than on the array."""
+        if self._flat_costs is None:
+            self._flat_costs = self.costs.ravel().tolist()
+        return self._flat_costs
+
+    def _sync_flat_costs(self, tiles: Optional[List[Tuple[int, int]]] = None):
+        """Copies changed costs (all of them without tiles) into the flat list, in place so its holders see them."""
+        flat = self._flat_costs
+        if flat is None:
+            return
+        if tiles is None:
+            flat[:] = self.costs.ravel().tolist()
+            return
+        costs, width = self.costs, self.grid_width
+        for col, row in tiles:
+            flat[row * width + col] = float(costs[row, col])
+
+    def _publish_costs(self, tiles: List[Tuple[int, int]]):
+        """Passes changed tile costs on to the searches that keep their own copy of the cost grid."""
+        if self.hpa is not None:
+            (col, row), rest = tiles[0], tiles[1:]
+            self.hpa.set_costs(self.costs, (col, row, col + 1, row + 1))
+            for col, row in rest: # Only the clusters around each tile are rebuilt
+                self.hpa.invalidate(col, row, col + 1, row + 1)
+        if self.planner is not None:
+            self.planner.update_costs(self.costs)
+        for replanner in list(self._replanners):
+            replanner.update_cells(tiles)
+
+    def _label_components(self, components: Optional[np.ndarray] = None):
+        """Labels the connected walkable regions (unless their labels are given) and indexes their cells for sampling."""
+        if components is None:
+            components, count = label_components(np.isfinite(self.terrain))
+        else:
+            count = int(components.max(initial=0))
+        self.components = components
+        labels = self.components.ravel()
+        self._component_cells = np.argsort(labels, kind='stable')
+        self._component_offsets = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=count + 1))))
+
+    def component_at(self, tile: Tuple[int, int]) -> int:
+        """Returns the component of a tile, or of a walkable neighbour when the tile itself is blocked (0 if none)."""
+        col, row = tile
+        label = int(self.components[row, col])
+        if label:
+            return label
+        around = self.components[max(0, row - 1):row + 2, max(0, col - 1):col + 2]
+        return int(around.max()) if around.size else 0
+
+    def random_tile(self, near_coords=None) -> Optional[Tuple[int, int]]:
+        """Returns a random walkable (col, row) tile, reachable from near_coords when given; None if there is none."""
+        offsets = self._component_offsets
+        label = self.component_at(self.tile_at(near_coords)) if near_coords is not None else 0
+        first, end = (offsets[label], offsets[label + 1]) if label else (offsets[1], offsets[-1])
+        if first >= end:
+            return None
+        cell = int(self._component_cells[random.randrange(first, end)])
+        return (cell % self.grid_width, cell // self.grid_width)
+
+    def reachable(self, start_tile: Tuple[int, int], goal_tile: Tuple[int, int]) -> bool:
+        """Checks whether a walkable goal tile lies in the same connected region as the start."""
+        label = int(self.components[goal_tile[1], goal_tile[0]])
+        return label != 0 and label == self.component_at(start_tile)
+
+    def close(self):
+        """Stops the background path planner, if any."""
+        if self.planner is not None:
+            self.planner.close()
+            self.planner = None
+
+    def poi_names(self) -> List[str]:
+        """Returns the names of the points of interest present on the map."""
+        return list(self.goals)
+
+    def random_poi(self) -> Optional[str]:
+        """Returns a random point of interest name, or None if the map has none."""
+        return random.choice(self.poi_names()) if self.goals else None
+
+    def field(self, name: str) -> FlowField:
+        """Returns the flow field toward a point of interest, computing it on first use."""
+        field = self._fields.get(name)
+        if field is None:
+            field = FlowField(self.terrain, self.goals[name])
+            self._fields[name] = field
+            logging.debug(f"Computed flow field '{name}' ({int(self.goals[name].sum())} goal tiles).")
+        return field
+
+    def route(self, start_coords, name: str) -> Optional[np.ndarray]:
+        """Returns tile-center waypoints from a world position to the nearest tile of a point of interest.
+
+        Returns a path array (see `waypoints`); None if the Sim already stands there or cannot reach it.
+        """
+        if name not in self.goals:
+            return None
+        tiles = self.field(name).tiles_from(*self.tile_at(start_coords))
+        if not tiles or len(tiles) < 2:
+            return None
+        return self.waypoints(tiles)
+
+    def tile_at(self, coords) -> Tuple[int, int]:
+        """Returns the (col, row) tile under a world position, clamped to the grid."""
+        return (max(0, min(int(coords[0] // self.tile_size), self.grid_width - 1)),
+                max(0, min(int(coords[1] // self.tile_size), self.grid_height - 1)))
+
+    def waypoints(self, tiles: List[Tuple[int, int]], smooth: bool = True) -> np.ndarray:
+        """Converts a tile path to tile-center world positions, string-pulled to its corners, as a path array.
+
+        Pass smooth=False for paths that must be walked tile by tile or were string-pulled already.
+        """
+        if self.smooth_paths and smooth:
+            tiles = string_pull(tiles, self.flat_costs(), self.grid_width)
+        return (np.asarray(tiles, dtype=np.float32).reshape(-1, 2) + 0.5) * self.tile_size
+
+    def plan_route(self, start_coords, end_coords):
+        """Plans an HPA* route between world positions; returns the route (see `next_leg`) or None."""
+        return self.hpa.find_route(self.tile_at(start_coords), self.tile_at(end_coords))
+
+    def next_leg(self, route) -> Optional[np.ndarray]:
+        """Refines the next leg of an HPA* route into waypoints, or returns None when it is finished or stale."""
+        tiles = route.next_leg()
+        return self.waypoints(tiles) if tiles else None
+
+    def plan_incremental(self, start_coords, end_coords) -> Optional[DStarLite]:
+        """Starts a D* Lite search between world positions; returns it, or None if the end cannot be reached."""
+        # Congestion only adds to the terrain costs, so the cheapest terrain bounds every cost from below
+        replanner = DStarLite(self.costs, self.tile_at(start_coords), self.tile_at(end_coords),
+                              self.flat_costs(), min(1.0, self.path_cost))
+        if replanner.path() is None:
+            return None
+        self._replanners.add(replanner)
+        return replanner
+
+    def repair(self, replanner: DStarLite, start_coords, blocked_tiles) -> Optional[np.ndarray]:
+        """Repairs a D* Lite search from a world position around blocked tiles; returns the new waypoints or None.
+
+        The path is not string-pulled, since smoothing only sees the terrain and could cut back through a blocked tile.
+        """
+        replanner.move_start(self.tile_at(start_coords))
+        replanner.set_blocked(blocked_tiles)
+        tiles = replanner.path()
+        if tiles is None or len(tiles) < 2:
+            return None
+        return self.waypoints(tiles, smooth=False)
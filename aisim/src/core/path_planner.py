@@ -0,0 +1,110 @@
+import logging
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from aisim.src.core.gridsearch import grid_astar, string_pull
+
+# Kept free of pygame so the spawned worker processes only need NumPy and gridsearch to unpickle tasks
+
+# Per worker process: the attached cost grid and a list copy for the cost version last searched
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(shm_name: str, shape: Tuple[int, int]):
+    """Attaches a worker process to the shared cost grid (read-only by convention)."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_state.update(shm=shm, costs=np.ndarray(shape, dtype=np.float32, buffer=shm.buf), version=None)
+
+
+def _plan_worker(start: int, goal: int, version: int, smooth: bool = True):
+    """Runs grid A* in a worker process; returns the (col, row) tiles from start to goal, or None.
+
+    With smooth, the path is string-pulled to its corners here as well, off the main thread.
+    """
+    state = _worker_state
+    if state['version'] != version:
+        # Scalar lookups on a list are much faster than on the array; rebuilt only after cost changes
+        costs = state['costs']
+        finite = costs[np.isfinite(costs)]
+        state.update(flat=costs.ravel().tolist(), min_cost=float(finite.min()) if finite.size else 1.0, version=version)
+    height, width = state['costs'].shape
+    cells = grid_astar(state['flat'], width, height, start, goal, state['min_cost'])
+    if not cells:
+        return None
+    tiles = [(cell % width, cell // width) for cell in cells]
+    return string_pull(tiles, state['flat'], width) if smooth else tiles
+
+
+class PathPlanner:
+    """Plans paths on a pool of worker processes so searches never stall the render loop.
+
+    The per-tile cost grid lives in shared memory that the workers only read. Finished
+    paths are put on a queue that the main loop drains with `check_for_results`, the
+    same way it polls `OllamaClient`. With `smooth`, the workers also string-pull the
+    paths, so they arrive ready to walk.
+    """
+
+    def __init__(self, costs: np.ndarray, workers: int = 2, smooth: bool = True):
+        """Copies the cost grid into shared memory and creates the (lazily started) worker pool."""
+        self.grid_height, self.grid_width = costs.shape
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, costs.size * np.dtype(np.float32).itemsize))
+        self.costs = np.ndarray(costs.shape, dtype=np.float32, buffer=self._shm.buf)
+        self.costs[:] = costs
+        self.version = 0 # Bumped on every cost update so workers refresh their copy
+        self.smooth = smooth
+        # Spawned workers do not inherit the display, the Ollama threads or any other state of this process
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=_init_worker, initargs=(self._shm.name, costs.shape))
+        self.results_queue = queue.Queue()
+        self.active_requests = set() # Sim IDs with a search in flight
+
+    def update_costs(self, costs: np.ndarray):
+        """Publishes a new cost grid to the workers (searches already running may use either version)."""
+        self.costs[:] = costs
+        self.version += 1
+
+    def is_pending(self, sim_id: Any) -> bool:
+        """Checks whether a Sim is waiting for a path."""
+        return sim_id in self.active_requests
+
+    def request_path(self, sim_id: Any, start: Tuple[int, int], goal: Tuple[int, int]) -> bool:
+        """Queues a search between (col, row) tiles for a Sim. Returns False if the Sim already has one in flight."""
+        if sim_id in self.active_requests:
+            return False
+        self.active_requests.add(sim_id)
+        width = self.grid_width
+        future = self._pool.submit(_plan_worker, start[1] * width + start[0], goal[1] * width + goal[0], self.version, self.smooth)
+        future.add_done_callback(lambda done: self._on_done(sim_id, done))
+        return True
+
+    def _on_done(self, sim_id: Any, future):
+        """Puts a finished search on the results queue (runs on the pool's management thread)."""
+        tiles = None
+        if not future.cancelled():
+            try:
+                tiles = future.result()
+            except Exception as e:
+                logging.warning(f"Path planning failed for Sim {sim_id}: {e}")
+        self.results_queue.put({'type': 'path', 'sim_id': sim_id, 'data': tiles})
+
+    def check_for_results(self) -> Optional[Dict[str, Any]]:
+        """Returns the next finished search ({'type': 'path', 'sim_id', 'data': tiles or None}), or None. Non-blocking.
+
+        The tiles are already string-pulled when the planner smooths paths.
+        """
+        try:
+            result_data = self.results_queue.get_nowait()
+        except queue.Empty:
+            return None
+        self.active_requests.discard(result_data['sim_id'])
+        return result_data
+
+    def close(self):
+        """Stops the workers and releases the shared cost grid."""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        del self.costs # Drop the view before closing the buffer it points into
+        self._shm.close()
+        self._shm.unlink()
@@ -2,24 +2,34 @@ import os
 import random
 import json
 import logging # Added missing import
+import threading
 from typing import Dict
 from aisim.src.core.configuration import config_manager # Import the centralized config manager
 
 PERSONALITIES_DIR = config_manager.get_entry('sim.personalities_path') # Directory to store personality files
 
-# --- Load Attributes Data ---
-ATTRIBUTES_DATA = {} # Default empty
+# --- Attributes Data (loaded on first use, or preloaded in the background at startup) ---
 ATTRIBUTES_FILE_PATH = config_manager.get_entry('sim.attributes_file_path')
-if ATTRIBUTES_FILE_PATH:
-    try:
-        with open(ATTRIBUTES_FILE_PATH, 'r') as f:
-            ATTRIBUTES_DATA = json.load(f)
-    except FileNotFoundError:
-        logging.error(f"Attributes file not found at {ATTRIBUTES_FILE_PATH}")
-    except json.JSONDecodeError:
-        logging.error(f"Could not decode JSON from {ATTRIBUTES_FILE_PATH}")
-else:
-    logging.warning("'sim.attributes_file_path' not configured")
+_attributes_data = None
+_attributes_lock = threading.Lock()
+
+def get_attributes_data() -> Dict:
+    """Returns the personality attributes, reading the attributes file on first call."""
+    global _attributes_data
+    with _attributes_lock:
+        if _attributes_data is None:
+            _attributes_data = {} # Default empty
+            if ATTRIBUTES_FILE_PATH:
+                try:
+                    with open(ATTRIBUTES_FILE_PATH, 'r') as f:
+                        _attributes_data = json.load(f)
+                except FileNotFoundError:
+                    logging.error(f"Attributes file not found at {ATTRIBUTES_FILE_PATH}")
+                except json.JSONDecodeError:
+                    logging.error(f"Could not decode JSON from {ATTRIBUTES_FILE_PATH}")
+            else:
+                logging.warning("'sim.attributes_file_path' not configured")
+        return _attributes_data
 
 def load_or_generate_personality_for_sim(self, sim_config: Dict):
     """Loads personality from file if exists, otherwise generates and saves it."""
@@ -36,13 +46,13 @@ def load_or_generate_personality_for_sim(self, sim_config: Dict):
         except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
             logging.error(f"Error loading personality for {self.full_name} from {personality_file}: {e}. Regenerating.")
             # Fallback to generation if loading fails
-            self.personality = _generate_personality(ATTRIBUTES_DATA, sim_config.get("personality", {}))
+            self.personality = _generate_personality(get_attributes_data(), sim_config.get("personality", {}))
             self.personality_description = self.ollama_client.calculate_personality_description(self.personality, self.sex)
             save_personality(self, personality_file) # Attempt to save the newly generated data
     else:
         logging.info(f"Personality file not found for {self.full_name}. Generating...")
         # Generate personality (structured)
-        self.personality = _generate_personality(ATTRIBUTES_DATA, sim_config.get("personality", {}))
+        self.personality = _generate_personality(get_attributes_data(), sim_config.get("personality", {}))
         # Generate description (via Ollama)
         self.personality_description = self.ollama_client.calculate_personality_description(self.personality, self.sex)
         # Save to file
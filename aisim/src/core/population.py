@@ -0,0 +1,268 @@
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Facing directions, stored as their index in the direction arrays
+DIRECTIONS = ('front', 'down', 'left', 'right', 'up')
+DIRECTION_CODES = {name: code for code, name in enumerate(DIRECTIONS)}
+FRONT, DOWN, LEFT, RIGHT, UP = range(len(DIRECTIONS))
+
+# Per-Sim array fields and their dtypes
+FIELDS = {
+    'x': np.float64, 'y': np.float64, 'speed': np.float64, 'mood': np.float64,
+    'previous_x': np.float64, 'previous_y': np.float64, # Position before the latest fixed step, for interpolated drawing
+    'tile_col': np.int32, 'tile_row': np.int32, # -1 until the first movement update
+    'is_interacting': np.bool_, 'last_interaction_time': np.float64, 'is_blocked': np.bool_, 'blocked_time': np.float64,
+    'has_path': np.bool_, 'path_length': np.int32, 'path_index': np.int32,
+    'waypoint_x': np.float64, 'waypoint_y': np.float64, # path[path_index] while path_index < path_length
+    'direction': np.int8, 'previous_direction': np.int8, 'previous_angle': np.float64, 'direction_timer': np.float64,
+    'animation_frame': np.int32, 'animation_timer': np.float64, 'animation_speed': np.float64,
+}
+
+
+class ArrayField:
+    """A Sim attribute backed by one element of a `SimPopulation` array."""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, sim, owner=None):
+        if sim is None:
+            return self
+        return sim._population.arrays[self.name][sim._slot].item()
+
+    def __set__(self, sim, value):
+        sim._population.arrays[self.name][sim._slot] = value
+
+
+class SimPopulation:
+    """Per-Sim simulation state stored as a structure of arrays.
+
+    Position, speed, mood, the current waypoint and the animation timers of every Sim
+    live in one NumPy array per field (see `FIELDS`), indexed by the Sim's slot, so
+    movement, mood drift and animation run as vector operations over the whole
+    population. `Sim` objects are views: their attributes read and write these arrays.
+    Paths stay Python objects in `paths`, with their length and current waypoint
+    mirrored into the arrays whenever the path or its index changes.
+
+    Sims are drawn `interpolation` of the way from their position before the latest
+    step to their current one, so motion stays smooth when frames and fixed simulation
+    steps do not line up.
+    """
+
+    def __init__(self, capacity: int = 64):
+        """Creates an empty population with room for `capacity` Sims before the arrays grow."""
+        self.count = 0
+        self.arrays: Dict[str, np.ndarray] = {name: np.zeros(capacity, dtype=dtype) for name, dtype in FIELDS.items()}
+        self.sims: List[Any] = []
+        self.paths: List[Optional[np.ndarray]] = []
+        self.interpolation = 1.0 # 0 draws the Sims where the latest step started, 1 where it ended
+
+    def __getattr__(self, name):
+        # Arrays as attributes (population.x, ...), trimmed to the live Sims
+        arrays = self.__dict__.get('arrays')
+        if arrays is None or name not in arrays:
+            raise AttributeError(name)
+        return arrays[name][:self.count]
+
+    def add(self, sim) -> int:
+        """Allocates a slot for a Sim and returns it."""
+        slot = self.count
+        if slot == len(self.arrays['x']):
+            for name, array in self.arrays.items():
+                grown = np.zeros(max(1, 2 * len(array)), dtype=array.dtype)
+                grown[:len(array)] = array
+                self.arrays[name] = grown
+        self.count += 1
+        self.sims.append(sim)
+        self.paths.append(None)
+        self.arrays['tile_col'][slot] = self.arrays['tile_row'][slot] = -1
+        return slot
+
+    def remove(self, sim):
+        """Frees a Sim's slot, moving the last Sim into it.
+
+        The removed Sim keeps its state in a population of its own, so it can still be read
+        but is no longer moved by updates of this one.
+        """
+        slot, last = sim._slot, self.count - 1
+        own = SimPopulation(capacity=1)
+        own.add(sim)
+        own.paths[0] = self.paths[slot]
+        for name, array in self.arrays.items():
+            own.arrays[name][0] = array[slot]
+            array[slot] = array[last]
+            array[last] = 0
+        moved = self.sims[last]
+        self.sims[slot], self.paths[slot] = moved, self.paths[last]
+        moved._slot = slot
+        self.sims.pop()
+        self.paths.pop()
+        self.count -= 1
+        sim._population, sim._slot = own, 0
+
+    def set_path(self, slot: int, path: Optional[np.ndarray]):
+        """Stores a Sim's path and mirrors its length and current waypoint into the arrays."""
+        self.paths[slot] = path
+        self.arrays['has_path'][slot] = path is not None
+        self.arrays['path_length'][slot] = 0 if path is None else len(path)
+        self.sync_waypoint(slot)
+
+    def sync_waypoint(self, slot: int):
+        """Copies path[path_index] of a Sim into the waypoint arrays."""
+        index = self.arrays['path_index'][slot]
+        if index < self.arrays['path_length'][slot]:
+            self.arrays['waypoint_x'][slot], self.arrays['waypoint_y'][slot] = self.paths[slot][index].tolist()
+
+    def save_positions(self):
+        """Remembers the current positions as the start of the next step."""
+        self.previous_x[:] = self.x
+        self.previous_y[:] = self.y
+
+    def close_pairs(self, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the slots (i, j), i != j, of every ordered pair of Sims closer than radius.
+
+        Sims are bucketed into radius-sized cells, so only Sims in neighbouring cells are compared.
+        """
+        n = self.count
+        if n < 2:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        x, y = self.x, self.y
+        cell_x = np.floor(x / radius).astype(np.int64)
+        cell_y = np.floor(y / radius).astype(np.int64)
+        cell_y -= cell_y.min() - 1 # From 1, so the row above stays a valid key
+        stride = int(cell_y.max()) + 2 # Keys of neighbouring columns never collide
+        keys = cell_x * stride + cell_y
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        firsts, seconds = [], []
+        for d_x, d_y in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)): # Each neighbouring cell pair once
+            neighbour_keys = keys + d_x * stride + d_y
+            lo = np.searchsorted(sorted_keys, neighbour_keys, side='left')
+            counts = np.searchsorted(sorted_keys, neighbour_keys, side='right') - lo
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            first = np.repeat(np.arange(n), counts)
+            starts = np.repeat(lo - np.cumsum(counts) + counts, counts) # Each run counts up from its lo
+            second = order[starts + np.arange(total)]
+            keep = first < second if (d_x, d_y) == (0, 0) else np.ones(total, dtype=bool)
+            firsts.append(first[keep])
+            seconds.append(second[keep])
+        if not firsts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        first, second = np.concatenate(firsts), np.concatenate(seconds)
+        close = np.hypot(x[first] - x[second], y[first] - y[second]) < radius
+        first, second = first[close], second[close]
+        return np.concatenate((first, second)), np.concatenate((second, first))
+
+    def animation_update(self, dt: float):
+        """Advances the walk-cycle animation of every Sim that is not interacting."""
+        idle = ~self.is_interacting
+        timer = self.animation_timer
+        timer[idle] += dt
+        tick = idle & (timer >= self.animation_speed)
+        timer[tick] -= self.animation_speed[tick]
+        frame = self.animation_frame
+        frame[tick] = (frame[tick] + 1) % 3 # Cycle through 3 columns (0, 1, 2)
+
+
+# The population Sims join unless given another one
+sim_population = SimPopulation()
+
+
+class SimState:
+    """Base for objects whose movement and animation state lives in a `SimPopulation` slot.
+
+    The attributes below read and write the slot's array elements, so code working on one
+    Sim and vector code working on the whole population see the same state.
+    """
+
+    __slots__ = ('_population', '_slot')
+
+    x = ArrayField()
+    y = ArrayField()
+    speed = ArrayField()
+    mood = ArrayField()
+    is_interacting = ArrayField()
+    last_interaction_time = ArrayField() # Simulation time the latest interaction started
+    is_blocked = ArrayField()
+    blocked_time = ArrayField() # Seconds the next tile has been occupied by another Sim
+    previous_angle = ArrayField()
+    animation_frame = ArrayField()
+    animation_timer = ArrayField()
+    animation_speed = ArrayField() # Time between frames in seconds
+
+    def __init__(self, population: Optional[SimPopulation] = None):
+        """Joins a population (the shared `sim_population` by default)."""
+        self._population = population if population is not None else sim_population
+        self._slot = self._population.add(self)
+
+    def leave_population(self):
+        """Leaves the population, so its updates no longer move this Sim (see `SimPopulation.remove`)."""
+        self._population.remove(self)
+
+    @property
+    def draw_position(self):
+        """The (x, y) to draw the Sim at, interpolated between its last two step positions."""
+        population, slot = self._population, self._slot
+        arrays = population.arrays
+        x, y = arrays['x'][slot].item(), arrays['y'][slot].item()
+        alpha = population.interpolation
+        if alpha >= 1.0:
+            return x, y
+        previous_x, previous_y = arrays['previous_x'][slot].item(), arrays['previous_y'][slot].item()
+        return previous_x + (x - previous_x) * alpha, previous_y + (y - previous_y) * alpha
+
+    @property
+    def path(self):
+        """The (n, 2) array of waypoints being followed, or None."""
+        return self._population.paths[self._slot]
+
+    @path.setter
+    def path(self, path):
+        self._population.set_path(self._slot, path)
+
+    @property
+    def path_index(self):
+        return int(self._population.arrays['path_index'][self._slot])
+
+    @path_index.setter
+    def path_index(self, index):
+        self._population.arrays['path_index'][self._slot] = index
+        self._population.sync_waypoint(self._slot)
+
+    @property
+    def current_tile(self):
+        """The (col, row) tile under the Sim, or None before its first movement update."""
+        arrays = self._population.arrays
+        col = int(arrays['tile_col'][self._slot])
+        return None if col < 0 else (col, int(arrays['tile_row'][self._slot]))
+
+    @current_tile.setter
+    def current_tile(self, tile):
+        arrays = self._population.arrays
+        arrays['tile_col'][self._slot], arrays['tile_row'][self._slot] = (-1, -1) if tile is None else tile
+
+    @property
+    def current_direction(self):
+        return DIRECTIONS[self._population.arrays['direction'][self._slot]]
+
+    @current_direction.setter
+    def current_direction(self, direction):
+        self._population.arrays['direction'][self._slot] = DIRECTION_CODES[direction]
+
+    @property
+    def previous_direction(self):
+        return DIRECTIONS[self._population.arrays['previous_direction'][self._slot]]
+
+    @previous_direction.setter
+    def previous_direction(self, direction):
+        self._population.arrays['previous_direction'][self._slot] = DIRECTION_CODES[direction]
+
+    @property
+    def time_since_last_direction_change(self):
+        return float(self._population.arrays['direction_timer'][self._slot])
+
+    @time_since_last_direction_change.setter
+    def time_since_last_direction_change(self, seconds):
+        self._population.arrays['direction_timer'][self._slot] = seconds
@@ -0,0 +1,103 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from aisim.src.core.sim import Sim
+
+
+class SimRegistry:
+    """Every Sim of a City by ID, with indexes kept current as the Sims change.
+
+    Besides the lookup by ID, the registry indexes the Sims that are interacting and the
+    Sims standing on each tile, so subsystems ask for these directly instead of scanning
+    every Sim. A registered Sim reports its own `is_interacting` and `current_tile`
+    changes; vector code that writes tiles straight into the population arrays reports
+    them with `move`.
+    """
+
+    def __init__(self):
+        self.sims: List['Sim'] = [] # In the order they were added
+        self._by_id: Dict[Any, 'Sim'] = {}
+        self.interacting: Dict[Any, 'Sim'] = {} # sim_id -> Sim, for Sims in a conversation
+        self.tiles: Dict[Tuple[int, int], List['Sim']] = {} # (col, row) -> Sims on it; tiles without Sims are left out
+        self._tile_of: Dict[Any, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.sims)
+
+    def __iter__(self) -> Iterator['Sim']:
+        return iter(self.sims)
+
+    def __contains__(self, sim_id) -> bool:
+        return sim_id in self._by_id
+
+    def add(self, sim: 'Sim'):
+        """Registers a Sim and indexes its current state."""
+        if sim.sim_id in self._by_id:
+            raise ValueError(f"Sim {sim.sim_id} is already registered")
+        self.sims.append(sim)
+        self._by_id[sim.sim_id] = sim
+        sim.registry = self
+        self.set_interacting(sim, sim.is_interacting)
+        self.move(sim, sim.current_tile)
+
+    def remove(self, sim: 'Sim'):
+        """Unregisters a Sim and drops it from every index."""
+        self.move(sim, None)
+        self.interacting.pop(sim.sim_id, None)
+        del self._by_id[sim.sim_id]
+        self.sims.remove(sim)
+        sim.registry = None
+
+    def get(self, sim_id) -> Optional['Sim']:
+        """Returns the Sim with this ID, or None."""
+        return self._by_id.get(sim_id)
+
+    def set_interacting(self, sim: 'Sim', interacting: bool):
+        """Adds the Sim to, or drops it from, the interacting index."""
+        if interacting:
+            self.interacting[sim.sim_id] = sim
+        else:
+            self.interacting.pop(sim.sim_id, None)
+
+    def waiting(self) -> List['Sim']:
+        """Returns the Sims waiting for an Ollama response.
+
+        A request is only in flight during a conversation, so these are found among the interacting Sims.
+        """
+        return [sim for sim in self.interacting.values() if sim.conversation.waiting_for_response]
+
+    def interaction_in_progress(self, *excluded_ids) -> bool:
+        """Whether any Sim other than those with the given IDs is interacting."""
+        return any(sim_id not in excluded_ids for sim_id in self.interacting)
+
+    def move(self, sim: 'Sim', tile: Optional[Tuple[int, int]]):
+        """Moves the Sim to another tile in the tile index (None takes it out)."""
+        old = self._tile_of.get(sim.sim_id)
+        if old == tile:
+            return
+        if old is not None:
+            others = self.tiles[old]
+            others.remove(sim)
+            if not others:
+                del self.tiles[old]
+        if tile is None:
+            self._tile_of.pop(sim.sim_id, None)
+            return
+        self._tile_of[sim.sim_id] = tile
+        self.tiles.setdefault(tile, []).append(sim)
+
+    def at(self, tile: Tuple[int, int]) -> List['Sim']:
+        """Returns the Sims standing on a tile."""
+        return self.tiles.get(tile, [])
+
+    def is_occupied(self, tile: Tuple[int, int], sim: Optional['Sim'] = None) -> bool:
+        """Whether a Sim other than `sim` stands on the tile."""
+        others = self.tiles.get(tile)
+        return bool(others) and (sim is None or len(others) > 1 or others[0] is not sim)
+
+    def near(self, tile: Tuple[int, int], radius: int = 1) -> Iterator['Sim']:
+        """Yields the Sims on the tiles within `radius` tiles (Chebyshev distance) of a tile."""
+        col, row = tile
+        for d_row in range(-radius, radius + 1):
+            for d_col in range(-radius, radius + 1):
+                yield from self.tiles.get((col + d_col, row + d_row), ())
@@ -2,29 +2,109 @@ import pygame
 import random
 import os
 import logging # Added missing import
-from typing import List, Dict, Optional
-from aisim.src.ai.ollama_client import OllamaClient
+import numpy as np
+from typing import Any, List, Dict, Optional, TYPE_CHECKING
 from aisim.src.core.interaction import _send_conversation_request # Import the function
-from aisim.src.core.interaction import check_interactions, _end_interaction
-from aisim.src.core.movement import get_coords_from_node, get_path, get_node_from_coords, movement_update
+from aisim.src.core.interaction import check_interactions, meet, _end_interaction, INTERACTION_DISTANCE, IGNORE_INTERACTION_TIME
+from aisim.src.core.movement import get_coords_from_node, get_path, get_node_from_coords, movement_update, movement_update_population
 from aisim.src.core.personality import _assign_sex, load_or_generate_personality_for_sim
 from aisim.src.core.configuration import config_manager # Import the centralized config manager
+from aisim.src.core.assets import get_asset_bundle
+from aisim.src.core.population import SimPopulation, SimState
+
+# Use TYPE_CHECKING to avoid importing the Ollama client (and ollama) just for type hints
+if TYPE_CHECKING:
+    from aisim.src.ai.ollama_client import OllamaClient
+    from aisim.src.core.registry import SimRegistry
 
 TILE_SIZE = config_manager.get_entry('city.tile_size', 32) # Add default value
 BUBBLE_DISPLAY_TIME = config_manager.get_entry('simulation.bubble_display_time_seconds', 5.0)
 CONVERSATION_MAX_TURNS = config_manager.get_entry('ollama.conversation_max_turns', 6)
-# Initialize font - needs pygame.init() - Ensure font module is initialized
-pygame.font.init()
-class Sim:
-    """Represents a single Sim in the simulation."""
+class SimAppearance:
+    """Render state of a Sim: its character sheet and how it is drawn."""
+
+    __slots__ = ('sprite_sheet', 'width', 'height', 'color', 'radius', '_frames')
+
+    def __init__(self, sprite_sheet: Optional[pygame.Surface], sim_config: Dict):
+        """Reads the sprite size and fallback circle style from the Sim config."""
+        self.sprite_sheet = sprite_sheet
+        self.width = sim_config.get("sprite_width", 32)
+        self.height = sim_config.get("sprite_height", 32)
+        self.color = tuple(sim_config.get("sim_color", [255, 255, 255])) # Fallback circle color, white by default
+        self.radius = sim_config.get("sim_radius", 5)
+        self._frames: Dict[tuple, pygame.Surface] = {} # (row, col) -> subsurface of the sheet
+
+    def frame(self, row: int, col: int) -> Optional[pygame.Surface]:
+        """Returns the sub-sprite at (row, col) of the sheet, cut out once and reused."""
+        if not self.sprite_sheet:
+            return None
+        sprite = self._frames.get((row, col))
+        if sprite is None:
+            sprite = self.sprite_sheet.subsurface((col * self.width, row * self.height, self.width, self.height))
+            self._frames[(row, col)] = sprite
+        return sprite
 
-    def __init__(self, sim_id, x, y, ollama_client: OllamaClient, sim_config: Dict):
-        """Initializes a Sim with ID, position, Ollama client, config, and bubble display time."""
+
+class Conversation:
+    """Conversation state of a Sim: whom it talks to, whose turn it is, and its speech bubble."""
+
+    __slots__ = ('history', 'is_my_turn_to_speak', 'waiting_for_response', 'partner_id', 'turns',
+                 'last_response_time', 'message', 'message_timer')
+
+    def __init__(self):
+        self.history: Optional[List[Dict[str, str]]] = None
+        self.is_my_turn_to_speak = False
+        self.waiting_for_response = False # A request to Ollama is in flight
+        self.partner_id: Optional[Any] = None
+        self.turns = 0
+        self.last_response_time = 0.0
+        self.message: Optional[str] = None # Text of the speech bubble
+        self.message_timer = 0.0 # Seconds the bubble stays up
+
+    def end(self):
+        """Leaves the conversation and clears the bubble."""
+        self.history = None
+        self.message = None
+        self.message_timer = 0.0
+        self.is_my_turn_to_speak = False
+        self.waiting_for_response = False
+        self.partner_id = None
+        self.turns = 0
+
+
+# Direction -> row of the character sheet; idle ('front') uses the 'down' row
+SPRITE_ROWS = {'front': 0, 'down': 0, 'left': 1, 'right': 2, 'up': 3}
+
+
+class Sim(SimState):
+    """Represents a single Sim in the simulation.
+
+    State is split by what uses it: movement and animation live in a `SimPopulation`
+    (see `SimState`), drawing in `appearance` and talking in `conversation`. The Sim
+    itself keeps identity, personality and relationships. All fields are declared in
+    `__slots__`, so Sims carry no per-instance `__dict__`. Once added to a City's
+    `SimRegistry`, a Sim reports its interaction and tile changes to it.
+    """
+
+    __slots__ = ('sim_id', 'character_name', 'first_name', 'last_name', 'full_name', 'sex',
+                 'ollama_client', 'personality', 'personality_description', 'memory', 'relationships',
+                 'last_update_time',
+                 'route', 'replanner', 'sidestepping', 'target',
+                 'appearance', 'conversation', 'registry')
+
+    def __init__(self, sim_id, x, y, ollama_client: 'OllamaClient', sim_config: Dict, population: Optional[SimPopulation] = None,
+                 load_sprite: bool = True):
+        """Initializes a Sim with ID, position, Ollama client, config, and bubble display time.
+
+        With load_sprite False the Sim gets a character but no sprite sheet, so no display is needed.
+        """
+        super().__init__(population)
         self.sim_id = sim_id  # Store the unique ID
+        self.registry: Optional['SimRegistry'] = None # Set by the registry the Sim is added to
         self.is_interacting = False
-        # self.talking_with = None # Replaced by conversation_partner_id
-        self.sprite_sheet = None
-        self.character_name, self.sprite_sheet = self._load_sprite_sheet()
+        self.character_name, sprite_sheet = self._load_sprite_sheet(load_sprite)
+        self.appearance = SimAppearance(sprite_sheet, sim_config)
+        self.conversation = Conversation()
         self.current_direction = 'front'
         self.previous_direction = 'front'
         self.previous_angle = 0.0
@@ -35,14 +115,12 @@ class Sim:
         self.y = y
         self.current_tile = None # Initialize current tile attribute
         self.speed = random.uniform(30, 70)  # Random speed for each sim
-        self.sim_color = tuple(sim_config.get("sim_color", [255, 255, 255])) # Load from config, fallback white
-        self.sprite_width = sim_config.get("sprite_width", 32)
-        self.sprite_height = sim_config.get("sprite_height", 32)
-        self.interaction_distance = sim_config.get("interaction_distance", 20)
-        self.sim_radius = sim_config.get("sim_radius", 5)
-        # self.color = (random.randint(50, 255), random.randint(50, 255), random.randint(50, 255)) # Unused visual color
         self.path = None
         self.path_index = 0
+        self.route = None # Remaining HPA* route when the path holds only its current leg
+        self.replanner = None # D* Lite search of the current trip, repaired when the Sim gets blocked
+        self.blocked_time = 0.0
+        self.sidestepping = False # Whether the current waypoint is a sidestep around a blocking Sim
         self.target = None
         self.ollama_client = ollama_client # Assign ollama_client earlier for use in personality gen
         self.personality = {}
@@ -52,29 +130,40 @@ class Sim:
         self.relationships = {}  # Key: other_sim_id, Value: {"friendship": float, "romance": float}
         self.mood = 0.0  # -1.0 (Sad) to 1.0 (Happy)
         self.last_interaction_time = 0.0  # Time of last interaction
+        self.last_update_time = None # Simulation time of the last sim_update
         # Animation attributes
         self.animation_frame = 0
         self.animation_timer = 0.0
-        self.animation_speed = 0.15 # Time between frames in seconds
-        # Conversation attributes
-        self.conversation_history: Optional[List[Dict[str, str]]] = None
-        self.is_my_turn_to_speak: bool = False
-        self.waiting_for_ollama_response: bool = False
-        self.conversation_partner_id: Optional[any] = None # Store partner ID
-        self.conversation_turns: int = 0
-        self.conversation_last_response_time: float = 0.0
-        self.conversation_message: Optional[str] = None # Separate attribute for conversation text
-        self.conversation_message_timer: float = 0.0 # Timer for conversation bubble
-    
+        self.animation_speed = 0.15
+
+    @property
+    def is_interacting(self):
+        return bool(self._population.arrays['is_interacting'][self._slot])
+
+    @is_interacting.setter
+    def is_interacting(self, interacting):
+        self._population.arrays['is_interacting'][self._slot] = interacting
+        if self.registry is not None:
+            self.registry.set_interacting(self, interacting)
+
+    @property
+    def current_tile(self):
+        return SimState.current_tile.fget(self)
+
+    @current_tile.setter
+    def current_tile(self, tile):
+        SimState.current_tile.fset(self, tile)
+        if self.registry is not None:
+            self.registry.move(self, tile)
+
     def sim_update(self, dt, city, weather_state, all_sims: List['Sim'], current_time, tile_size, direction_change_frequency): # Add tile_size and type hint
         """Updates the Sim's state, following a path if available, and logs data."""
-        self.tile_size = tile_size
         self.is_blocked = False # Reset blocked status
         # logging.debug(f"Sim {self.sim_id}: update called at start, x={self.x:.2f}, y={self.y:.2f}, target={self.target}, is_interacting={self.is_interacting}, path={self.path}")
         # Call the movement update method
         movement_update(self, dt, city, weather_state, all_sims, current_time, tile_size, direction_change_frequency)
         self.animation_update(dt) # Update animation frame
-        if hasattr(self, 'last_update_time') and self.last_update_time == current_time:
+        if self.last_update_time == current_time:
             return
         self.last_update_time = current_time
         # --- Conversation Logic ---
@@ -103,27 +192,27 @@ class Sim:
 
         # Check for conversation timeout (if waiting too long for a response)
         # Note: Using self.ollama_client requires ollama_client to be passed or accessible
-        if self.waiting_for_ollama_response and (current_time - self.conversation_last_response_time > self.ollama_client.conversation_response_timeout):
-            logging.warning(f"Sim {self.sim_id}: Conversation with {self.conversation_partner_id} timed out.")
+        if self.conversation.waiting_for_response and (current_time - self.conversation.last_response_time > self.ollama_client.conversation_response_timeout):
+            logging.warning(f"Sim {self.sim_id}: Conversation with {self.conversation.partner_id} timed out.")
             _end_interaction(self, city, all_sims) # Assumes _end_interaction is accessible globally or imported
             return # Stop further processing within this method
 
         # Check for max turns reached
         # Note: Using self.ollama_client requires ollama_client to be passed or accessible
-        if self.conversation_turns >= CONVERSATION_MAX_TURNS:
-             logging.info(f"Sim {self.sim_id}: Conversation with {self.conversation_partner_id} reached max turns.")
+        if self.conversation.turns >= CONVERSATION_MAX_TURNS:
+             logging.info(f"Sim {self.sim_id}: Conversation with {self.conversation.partner_id} reached max turns.")
              _end_interaction(self, city, all_sims) # Assumes _end_interaction is accessible
              return # Stop further processing within this method
 
         # --- Turn-Based Speaking Logic with Lock ---
-        if self.is_my_turn_to_speak and not self.waiting_for_ollama_response:
+        if self.conversation.is_my_turn_to_speak and not self.conversation.waiting_for_response:
             # logging.debug(f"Sim {self.sim_id}: My turn, attempting to speak. Lock state: {city.ollama_client_locked}")
             # Attempt to acquire the global Ollama lock
             if not city.ollama_client_locked:
                 city.ollama_client_locked = True # Acquire lock
-                logging.info(f"Sim {self.sim_id}: Acquired Ollama lock. Preparing to send request. Turn: {self.conversation_turns}")
+                logging.info(f"Sim {self.sim_id}: Acquired Ollama lock. Preparing to send request. Turn: {self.conversation.turns}")
 
-                partner = self._find_sim_by_id(self.conversation_partner_id, all_sims)
+                partner = city.registry.get(self.conversation.partner_id)
                 if partner:
                     # Call the imported _send_conversation_request function
                     # Pass self as speaker, partner as listener
@@ -138,7 +227,7 @@ class Sim:
                         # _end_interaction(self, city, all_sims) # Don't end immediately, allow retry next cycle?
                 else:
                     # Partner not found, end interaction and release lock
-                    logging.error(f"Sim {self.sim_id}: Conversation partner {self.conversation_partner_id} not found during turn! Ending interaction.")
+                    logging.error(f"Sim {self.sim_id}: Conversation partner {self.conversation.partner_id} not found during turn! Ending interaction.")
                     city.ollama_client_locked = False # Release the lock before ending
                     _end_interaction(self, city, all_sims)
                     return # Stop processing this conversation update
@@ -148,13 +237,6 @@ class Sim:
                 # Do nothing this cycle, will retry on the next update
 
 
-    def _find_sim_by_id(self, sim_id_to_find: any, all_sims: List['Sim']) -> Optional['Sim']:
-        """Helper to find a Sim object by its ID."""
-        for sim in all_sims:
-            if sim.sim_id == sim_id_to_find:
-                return sim
-        return None
-
     def animation_update(self, dt):
         """Updates the animation frame based on elapsed time."""
         if not self.is_interacting:
@@ -165,66 +247,25 @@ class Sim:
 
     def _get_sprite(self):
         """Returns the appropriate sub-sprite based on the direction and animation frame."""
-        if not self.sprite_sheet:
-            return None
-
-        # Define the dimensions of each sub-sprite
-        width = self.sprite_width
-        height = self.sprite_height
-
-        # Determine row based on direction (0-based index)
-        # Row 0: down (Task desc: Row 1)
-        # Row 1: left (Task desc: Row 2)
-        # Row 2: right (Task desc: Row 3)
-        # Row 3: up (Task desc: Row 4)
-        if self.current_direction == 'down':
-            row = 0
-        elif self.current_direction == 'left':
-            row = 1
-        elif self.current_direction == 'right':
-            row = 2
-        elif self.current_direction == 'up':
-            row = 3
-        else: # Default/idle (e.g., 'front') - use 'down' row
-            row = 0
-
-        # Use the current animation frame for the column
-        col = self.animation_frame
-
-        # Calculate the position of the sub-sprite in the sprite sheet
-        x = col * width
-        y = row * height
-
-        # Extract the sub-sprite
-        sprite = pygame.Surface((width, height), pygame.SRCALPHA)
-        sprite.blit(self.sprite_sheet, (0, 0), (x, y, width, height))
-
-        return sprite
+        return self.appearance.frame(SPRITE_ROWS.get(self.current_direction, 0), self.animation_frame)
 
     def get_portrait(self):
         """Returns the front-facing, non-animated portrait sprite."""
-        if not self.sprite_sheet:
-            return None
-
-        width = self.sprite_width
-        height = self.sprite_height
-        row = 0  # Front-facing row
-        col = 0  # First animation frame
-
-        # Calculate the position of the sub-sprite in the sprite sheet
-        x = col * width
-        y = row * height
+        portrait = self.appearance.frame(0, 0)
+        return portrait.copy() if portrait else None # A copy, so the caller may keep it after the sheet is gone
 
-        # Extract the sub-sprite
-        portrait = pygame.Surface((width, height), pygame.SRCALPHA)
-        portrait.blit(self.sprite_sheet, (0, 0), (x, y, width, height))
 
-        return portrait
+    def _load_sprite_sheet(self, load_image=True):
+       """Loads a random Sim's sprite sheet from the character sprites directory.
 
-
-    def _load_sprite_sheet(self):
-       """Loads a random Sim's sprite sheet from the character sprites directory."""
+       With load_image False only the character is picked and the sheet returned is None.
+       """
        try:
+           bundle = get_asset_bundle()
+           if bundle is not None and bundle.characters:
+               character_name = random.choice(bundle.characters) # Raw pixels from the asset bundle, no PNG decoding
+               return character_name, bundle.get_image(f"character:{character_name}") if load_image else None
+
            character_sprite_dir = config_manager.get_entry('sim.character_sprite_dir')
            if not character_sprite_dir or not os.path.isdir(character_sprite_dir):
                logging.error(f"Character sprite directory not found or not configured in Sim._load_sprite_sheet: {character_sprite_dir}")
@@ -236,30 +277,84 @@ class Sim:
                return "Unknown_Sim", None # Return default name if no sprites found
 
            chosen_sprite = random.choice(available_characters)
+           character_name = chosen_sprite[:-4]  # Remove ".png" extension
+           if not load_image:
+               return character_name, None
            sprite_path = os.path.join(character_sprite_dir, chosen_sprite) # Use the loaded directory path
            sprite_sheet = pygame.image.load(sprite_path).convert_alpha()
-           character_name = chosen_sprite[:-4]  # Remove ".png" extension
            return character_name, sprite_sheet
        except Exception as e:
            logging.error(f"Error loading sprite sheet: {e}")
            return "Unknown_Sim", None # Return a default name if loading fails
-    def draw(self, screen, dt, all_sims):
-        """Draws the Sim on the screen."""
-        sim_pos = (int(self.x), int(self.y))
+    def get_draw_rect(self, camera=None):
+        """Returns the screen rect covered by the Sim's sprite (centered on its draw position)."""
+        appearance = self.appearance
+        x, y = self.draw_position
+        if camera is None:
+            return pygame.Rect(int(x) - appearance.width // 2, int(y) - appearance.height // 2, appearance.width, appearance.height)
+        width = round(appearance.width * camera.zoom)
+        height = round(appearance.height * camera.zoom)
+        screen_x, screen_y = camera.world_to_screen(x, y)
+        return pygame.Rect(screen_x - width // 2, screen_y - height // 2, width, height)
+
+    def get_draw_state(self):
+        """Returns a tuple that changes whenever the Sim would look different on screen."""
+        x, y = self.draw_position
+        return (int(x), int(y), self.current_direction, self.animation_frame)
+
+    def draw(self, screen, dt, all_sims, camera=None):
+        """Draws the Sim on the screen, converting its world position through the camera if given."""
+        draw_rect = self.get_draw_rect(camera)
 
         # Get the sprite based on the current direction
         sprite = self._get_sprite() # Get sprite based on direction and animation frame
 
         # Draw Sim sprite or fallback circle
         if sprite:
+            if draw_rect.size != sprite.get_size():
+                sprite = pygame.transform.scale(sprite, draw_rect.size) # Camera zoom
             # Center the sprite on the sim's position
-            screen.blit(sprite, (sim_pos[0] - self.sprite_width // 2, sim_pos[1] - self.sprite_height // 2))
+            screen.blit(sprite, draw_rect.topleft)
         else:
             # Fallback: draw a colored circle
-            pygame.draw.circle(screen, self.sim_color, sim_pos, self.sim_radius) # Use configured fallback color and radius
+            radius = max(1, round(self.appearance.radius * (camera.zoom if camera else 1.0)))
+            pygame.draw.circle(screen, self.appearance.color, draw_rect.center, radius) # Use configured fallback color and radius
 
         # Bubble display logic (timer updates) is handled in the main loop (main.py)
-        # based on sim.conversation_message and sim.conversation_message_timer.
-        # The actual drawing is done via pygame_gui labels managed in main.py.
-
-
+        # based on sim.conversation.message and sim.conversation.message_timer.
+        # The actual drawing is done by the BubbleLayer (aisim/src/ui/bubble.py) created in main.py.
+
+
+def update_population(population: SimPopulation, dt, city, weather_state, current_time, direction_change_frequency):
+    """Updates every Sim of a population, like calling sim_update on each.
+
+    Movement and animation run batched over the population arrays; conversations and
+    interactions stay per Sim. Only pairs within interaction distance whose Sims are both free to
+    interact are checked; the other close pairs just meet.
+    """
+    all_sims = population.sims
+    movement_update_population(population, dt, city, weather_state, all_sims, direction_change_frequency)
+    population.animation_update(dt)
+    for sim in list(city.registry.interacting.values()): # Ending a conversation drops Sims from the index
+        sim.conversation_update(city, all_sims, current_time)
+    first, second = population.close_pairs(INTERACTION_DISTANCE)
+    if not len(first):
+        return
+    # Checking a pair only makes Sims less free to interact, so this holds for the whole loop below
+    free = ~population.is_interacting & (current_time - population.last_interaction_time > IGNORE_INTERACTION_TIME)
+    candidate = free[first] & free[second]
+    met = ~candidate & (first < second) # Pairs come in both orders
+    for i, j in zip(first[met].tolist(), second[met].tolist()):
+        meet(all_sims[i], all_sims[j])
+    first, second = first[candidate], second[candidate]
+    if not len(first):
+        return
+    order = np.argsort(first, kind='stable')
+    first, second = first[order].tolist(), second[order].tolist()
+    start = 0
+    for end in range(1, len(first) + 1):
+        if end == len(first) or first[end] != first[start]:
+            sim = all_sims[first[start]]
+            if not sim.is_interacting: # Conversation partners do not look for new ones
+                check_interactions(sim, all_sims, current_time, city, [all_sims[slot] for slot in second[start:end]])
+            start = end
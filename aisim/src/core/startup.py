@@ -0,0 +1,131 @@
+import importlib.util
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Kept free of third-party and aisim imports so it can be installed before anything heavy is imported
+
+
+class _TimedLoader:
+    """Wraps a module loader to time its exec_module (the module body, including nested imports)."""
+
+    def __init__(self, loader, profiler: 'StartupProfiler', name: str):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        module.__loader__ = self._loader # Modules that inspect their loader see the real one
+        self._profiler._begin_import(self._name)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._end_import(self._name)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _ImportTimer:
+    """Meta path finder that wraps every found module's loader with a _TimedLoader."""
+
+    def __init__(self, profiler: 'StartupProfiler'):
+        self._profiler = profiler
+        self._resolving = set()
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname in self._resolving:
+            return None # Let the real finders answer the lookup we are making ourselves
+        self._resolving.add(fullname)
+        try:
+            spec = importlib.util.find_spec(fullname)
+        except (ImportError, ValueError):
+            spec = None
+        finally:
+            self._resolving.discard(fullname)
+        if spec is None or spec.loader is None or not hasattr(spec.loader, 'exec_module'):
+            return spec
+        spec.loader = _TimedLoader(spec.loader, self._profiler, fullname)
+        return spec
+
+
+class StartupProfiler:
+    """Collects import and initialization timings during startup and prints a report.
+
+    Enabled with the `--profile-startup` command line flag or `AISIM_PROFILE_STARTUP=1`.
+    When disabled, `phase` only runs its block and nothing is recorded.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.start_time = time.perf_counter()
+        self.phases: List[Tuple[str, str, float, float]] = [] # (name, thread, start offset, duration)
+        self.imports: Dict[str, Tuple[float, float]] = {} # {module: (cumulative, self) seconds}
+        self._import_stack = threading.local()
+        self._lock = threading.Lock()
+        self._finder = None
+
+    def install_import_hook(self):
+        """Starts timing module imports (no-op when disabled)."""
+        if self.enabled and self._finder is None:
+            self._finder = _ImportTimer(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def remove_import_hook(self):
+        """Stops timing module imports."""
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    def _begin_import(self, name: str):
+        stack = getattr(self._import_stack, 'frames', None)
+        if stack is None:
+            stack = self._import_stack.frames = []
+        stack.append([name, time.perf_counter(), 0.0]) # [module, start, time spent in nested imports]
+
+    def _end_import(self, name: str):
+        stack = self._import_stack.frames
+        _, start, nested = stack.pop()
+        elapsed = time.perf_counter() - start
+        if stack:
+            stack[-1][2] += elapsed
+        with self._lock:
+            self.imports[name] = (elapsed, elapsed - nested)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Times an initialization step (may be used from several threads)."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.append((name, threading.current_thread().name, start - self.start_time, time.perf_counter() - start))
+
+    def report(self, top_imports: int = 15):
+        """Prints the recorded phases and the slowest imports, then stops profiling."""
+        if not self.enabled:
+            return
+        self.remove_import_hook()
+        total = time.perf_counter() - self.start_time
+        lines = [f"Startup profile: {total * 1000:.0f} ms until first frame", "  Phases (start, duration, thread):"]
+        for name, thread, offset, duration in sorted(self.phases, key=lambda phase: phase[2]):
+            lines.append(f"    {offset * 1000:7.0f} ms {duration * 1000:7.1f} ms  {name} [{thread}]")
+        lines.append(f"  Slowest imports (cumulative / self):")
+        for name, (cumulative, own) in sorted(self.imports.items(), key=lambda item: -item[1][0])[:top_imports]:
+            lines.append(f"    {cumulative * 1000:7.1f} ms {own * 1000:7.1f} ms  {name}")
+        print("\n".join(lines))
+        self.enabled = False
+
+
+startup_profiler = StartupProfiler('--profile-startup' in sys.argv or os.environ.get('AISIM_PROFILE_STARTUP') == '1')
+startup_profiler.install_import_hook()
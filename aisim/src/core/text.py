@@ -3,13 +3,19 @@ import os
 from typing import Optional, Tuple, List, Dict, Any
 from aisim.src.core.configuration import config_manager
 import logging # Added for potential future use in wrap_text
+from functools import lru_cache
 
 # Note: Removed unused bubble drawing functions, font initialization,
 # and related constants as they are handled by pygame_gui in main.py.
 
+WRAP_CACHE_SIZE = config_manager.get_entry('ui.wrap_cache_size', 512) # Number of wrapped texts kept in the LRU cache
+
 def wrap_text(text, font, max_width):
-    """Wraps text to fit within a specified width, preserving paragraphs."""
-    lines = []
+    """Wraps text to fit within a specified width, preserving paragraphs.
+
+    Results are memoized per (text, font, max_width), so re-wrapping the same bubble
+    every frame only costs a cache lookup.
+    """
     # Handle potential None or empty text
     if not text:
         return [""] # Return a list with an empty string for consistency
@@ -19,51 +25,69 @@ def wrap_text(text, font, max_width):
         # Cannot wrap without a font, return original text split by newlines
         return text.split('\n')
 
+    try:
+        return list(_wrap_text_cached(text, font, max_width)) # Copy so callers can't mutate the cached entry
+    except TypeError:
+        # Unhashable font object, wrap without caching
+        return list(_wrap_text_uncached(text, font, max_width))
+
+def _split_long_word(word, font, max_width, lines):
+    """Splits a word wider than max_width into chunks, using a binary search for each chunk length."""
+    start = 0
+    while start < len(word):
+        # Find the longest prefix of word[start:] that fits
+        low, high = 1, len(word) - start
+        while low < high:
+            mid = (low + high + 1) // 2
+            if font.size(word[start:start + mid])[0] <= max_width:
+                low = mid
+            else:
+                high = mid - 1
+        # If even the first character doesn't fit, low stays 1 and it is added anyway
+        lines.append(word[start:start + low])
+        start += low
+
+def _wrap_text_uncached(text, font, max_width):
+    """Wraps text by measuring each word once and accumulating line widths."""
+    lines = []
+    try:
+        space_width = font.size(' ')[0]
+    except pygame.error as e:
+        logging.error(f"Pygame error during text wrapping: {e}. Text: '{text}'")
+        return tuple(text.split('\n'))
+
     # Split into paragraphs first to preserve line breaks
-    paragraphs = text.split('\n')
-    for paragraph in paragraphs:
-        words = paragraph.split(' ')
+    for paragraph in text.split('\n'):
         current_line = []
-        while words:
-            word = words.pop(0)
-            # Handle empty words resulting from multiple spaces
-            if not word:
-                continue
-
-            test_line = ' '.join(current_line + [word])
+        current_width = 0
+        # Empty words result from multiple spaces and are skipped
+        for word in (w for w in paragraph.split(' ') if w):
             try:
-                # Check if the line fits
-                if font.size(test_line)[0] <= max_width:
+                word_width = font.size(word)[0]
+                # Check if the word fits on the current line
+                if current_line and current_width + space_width + word_width <= max_width:
                     current_line.append(word)
-                # If the line doesn't fit AND it's not the only word
-                elif current_line:
+                    current_width += space_width + word_width
+                    continue
+                # Line is full (or empty): flush it and start a new one with this word
+                if current_line:
                     lines.append(' '.join(current_line))
-                    current_line = [word] # Start new line with the word that didn't fit
-                # If the line doesn't fit and it IS the only word (word is too long)
+                if word_width <= max_width:
+                    current_line = [word]
+                    current_width = word_width
                 else:
-                    # Simple character-based wrap for overly long words
-                    temp_word = ""
-                    for char_index, char in enumerate(word):
-                        if font.size(temp_word + char)[0] <= max_width:
-                            temp_word += char
-                        else:
-                            # If even the first character doesn't fit, add it anyway
-                            if char_index == 0:
-                                lines.append(char)
-                                temp_word = "" # Reset for next char
-                            else:
-                                lines.append(temp_word)
-                                temp_word = char # Start new line part with current char
-                    if temp_word: # Add the remainder of the long word
-                        lines.append(temp_word)
+                    # Overly long word, wrap it character-wise
+                    _split_long_word(word, font, max_width, lines)
                     current_line = [] # Reset current line after handling long word
+                    current_width = 0
             except pygame.error as e:
-                 logging.error(f"Pygame error during text wrapping: {e}. Text: '{test_line}'")
-                 # Fallback: add the word that caused the error as a new line
-                 if current_line: # Add previous line if any
-                     lines.append(' '.join(current_line))
-                 lines.append(word) # Add the problematic word
-                 current_line = [] # Reset
+                logging.error(f"Pygame error during text wrapping: {e}. Word: '{word}'")
+                # Fallback: add the word that caused the error as a new line
+                if current_line: # Add previous line if any
+                    lines.append(' '.join(current_line))
+                lines.append(word) # Add the problematic word
+                current_line = [] # Reset
+                current_width = 0
 
         # Add the last line of the paragraph if it has content
         if current_line:
@@ -71,7 +95,9 @@ def wrap_text(text, font, max_width):
 
     # Ensure at least one line is returned if text was just whitespace or empty
     if not lines and text.strip() == "":
-        return [""]
+        return ("",)
     elif not lines: # If text was non-empty but resulted in no lines somehow (e.g., error)
-        return [text] # Return original text as a single line as fallback
-    return lines
+        return (text,) # Return original text as a single line as fallback
+    return tuple(lines)
+
+_wrap_text_cached = lru_cache(maxsize=WRAP_CACHE_SIZE)(_wrap_text_uncached)
@@ -0,0 +1,76 @@
+import numpy as np
+import pygame
+from typing import Dict, List, Optional
+
+# Sprite ID 0 is reserved for cells hidden under a multi-tile sprite anchored at another cell
+COVERED_ID = 0
+
+# Category flags stored per sprite ID (bitmask)
+TILE_GRASS = 1
+TILE_PATH = 2
+TILE_WATER = 4
+TILE_PROP = 8
+TILE_COVERED = 16
+
+PROP_PREFIXES = ('tree_', 'bush_', 'barrel', 'fence_', 'signpost_')
+TILE_MAP_DTYPE = np.uint16
+
+
+def _category_flags(name: str) -> int:
+    """Derives the category flags of a sprite from its name prefix."""
+    if name.startswith('grass_'): return TILE_GRASS
+    if name.startswith('path_'): return TILE_PATH
+    if name.startswith('water_'): return TILE_WATER
+    if name.startswith(PROP_PREFIXES): return TILE_PROP
+    return 0
+
+
+class SpriteTable:
+    """Maps sprite names to compact integer IDs and holds per-ID data for the tile map.
+
+    The tile map stores IDs instead of names, so classifying a tile is an index into
+    `flags`, and whole-map queries can run as NumPy operations (see `mask`).
+    """
+
+    def __init__(self, sprite_definitions: List[Dict], tile_size: int):
+        """Builds the table from the loaded sprite definitions (ID 0 is the covered placeholder)."""
+        self.definitions: List[Optional[Dict]] = [None] + list(sprite_definitions)
+        self.names: List[Optional[str]] = [None] + [s['name'] for s in sprite_definitions]
+        self.ids: Dict[str, int] = {name: i for i, name in enumerate(self.names) if name is not None}
+        self.flags = np.array([TILE_COVERED] + [_category_flags(name) for name in self.names[1:]], dtype=np.uint8)
+        # Footprint in tiles (ceiling division), used for placement and culling
+        self.span_w = np.array([1] + [(s['width'] + tile_size - 1) // tile_size for s in sprite_definitions], dtype=np.int32)
+        self.span_h = np.array([1] + [(s['height'] + tile_size - 1) // tile_size for s in sprite_definitions], dtype=np.int32)
+        self.source_rects: List[Optional[pygame.Rect]] = [None] + [pygame.Rect(s['x'], s['y'], s['width'], s['height']) for s in sprite_definitions]
+
+    def __len__(self):
+        return len(self.names)
+
+    def get_id(self, name: str) -> Optional[int]:
+        """Returns the ID of a sprite name, or None if it is unknown."""
+        return self.ids.get(name)
+
+    def get_name(self, sprite_id: int) -> Optional[str]:
+        """Returns the sprite name of an ID (None for covered cells)."""
+        return self.names[sprite_id]
+
+    def ids_with(self, flags: int) -> List[int]:
+        """Returns all sprite IDs having any of the given category flags."""
+        return np.flatnonzero(self.flags & flags).tolist()
+
+    def has(self, sprite_id: int, flags: int) -> bool:
+        """Checks whether a single sprite ID has any of the given category flags."""
+        return bool(self.flags[sprite_id] & flags)
+
+    def mask(self, tile_map: np.ndarray, flags: int) -> np.ndarray:
+        """Returns a boolean array marking every cell whose sprite has any of the given flags."""
+        return (self.flags[tile_map] & flags) != 0
+
+    def classify(self, sprite_id: int) -> str:
+        """Returns a readable tile type for an ID ("grass", "path", "water", "prop" or "unknown")."""
+        flags = int(self.flags[sprite_id])
+        if flags & TILE_GRASS: return "grass"
+        if flags & TILE_PATH: return "path"
+        if flags & TILE_WATER: return "water"
+        if flags & TILE_PROP: return "prop"
+        return "unknown"
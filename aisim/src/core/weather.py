@@ -1,13 +1,27 @@
 import random
 import pygame
 import logging # Added missing import
+
+# Screen tint overlay (RGBA) applied for each weather state
+TINT_COLORS = {
+    "Sunny": (255, 255, 0, 10), # Very subtle yellow overlay
+    "Cloudy": (100, 100, 100, 15), # Subtle gray overlay
+    "Rainy": (50, 50, 70, 40), # Darker blue/gray overlay
+    "Snowy": (200, 200, 220, 20), # Semi-transparent white overlay
+    "Thunderstorm": (30, 30, 40, 70), # Very dark blue/grey overlay
+}
+
 class Weather:
     """Manages the simulation's weather system."""
 
 
-    def __init__(self, config_manager, screen_width, screen_height):
-        """Initializes the weather system using simulation config."""
+    def __init__(self, config_manager, screen_width, screen_height, effects=True):
+        """Initializes the weather system using simulation config.
+
+        With effects False the weather still changes, but no rain, snow or lightning is simulated.
+        """
         self.config_manager = config_manager
+        self.effects = effects
 
         # Use config_manager directly with full paths
         self.change_frequency = self.config_manager.get_entry('weather.weather_change_frequency', 60.0)
@@ -45,6 +59,7 @@ class Weather:
         self.max_lightning_duration = 0.15 # Max duration of a flash
         self.is_lightning = False # Is a flash happening right now?
         self.lightning_probability = 0.6 # Chance of flash when timer is up
+        self._tint_cache = {} # {(state, size): SRCALPHA tint surface}, filled lazily in draw_effects
 
         logging.info(f"Initial weather: {self.current_state} (Changes possible every {self.change_frequency}s, transition: {self.transition_duration}s)")
 
@@ -108,6 +123,8 @@ class Weather:
 
     def _effects_update(self, dt):
         """Updates the state of ongoing effects like rain, snow, and lightning."""
+        if not self.effects:
+            return
         # --- Rain Logic (Used by Rainy and Thunderstorm) ---
         is_raining = self.current_state in ["Rainy", "Thunderstorm"]
         if is_raining:
@@ -192,34 +209,30 @@ class Weather:
             self.lightning_timer = random.uniform(5.0, 15.0)
 
 
+    def effects_active(self):
+        """Returns True while animated effects (particles, lightning, transition) are on screen."""
+        return bool(self.raindrops or self.snowflakes or self.is_lightning or self.is_transitioning)
+
+    def _get_tint_surface(self, size):
+        """Returns the cached tint overlay for the current weather, or None if it has no tint."""
+        tint_color = TINT_COLORS.get(self.current_state)
+        if tint_color is None:
+            return None
+        key = (self.current_state, size)
+        tint = self._tint_cache.get(key)
+        if tint is None:
+            tint = pygame.Surface(size, pygame.SRCALPHA)
+            tint.fill(tint_color)
+            self._tint_cache[key] = tint
+        return tint
+
     def draw_effects(self, screen):
         """Draws weather effects like rain, snow, or screen tints, and transition effects."""
         # --- Apply base tints based on weather ---
-        if self.current_state == "Sunny":
-             # Subtle yellow tint for brightness
-            tint = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
-            tint.fill((255, 255, 0, 10)) # Very subtle yellow overlay
-            screen.blit(tint, (0,0))
-        elif self.current_state == "Cloudy":
-             # Subtle gray tint
-            tint = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
-            tint.fill((100, 100, 100, 15)) # Subtle gray overlay
-            screen.blit(tint, (0,0))
-        elif self.current_state == "Rainy":
-            # Darker tint for rain
-            tint = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
-            tint.fill((50, 50, 70, 40)) # Darker blue/gray overlay
-            screen.blit(tint, (0,0))
-        elif self.current_state == "Snowy":
-            # Keep the whitish tint
-            tint = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
-            tint.fill((200, 200, 220, 20)) # Semi-transparent white overlay
-            screen.blit(tint, (0,0))
-        elif self.current_state == "Thunderstorm":
-            # Very dark tint for thunderstorm
-            tint = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
-            tint.fill((30, 30, 40, 70)) # Very dark blue/grey overlay
-            screen.blit(tint, (0,0))
+        # Tint surfaces are cached so the dirty-rect renderer can re-apply them per region cheaply
+        tint = self._get_tint_surface(screen.get_size())
+        if tint is not None:
+            screen.blit(tint, (0, 0))
 
 
         # --- Draw Particles (Rain/Snow) ---
@@ -0,0 +1,74 @@
+"""Runs the simulation without a window, as fast as the CPU allows.
+
+No display, fonts or pygame_gui are used and no sprites are loaded; the engine is stepped
+back to back with a fixed dt, and the achieved simulated seconds per wall-clock second are
+printed. Example:
+
+    python -m aisim.src.headless --seconds 3600 --sims 200
+"""
+import argparse
+import random
+import sys
+import time
+import numpy as np
+from aisim.src.core.configuration import config_manager
+from aisim.src.core.city import City, TILE_SIZE
+from aisim.src.core.engine import SimulationEngine, ThroughputMeter, initialize_sims
+from aisim.src.core.weather import Weather
+from aisim.src.ai.ollama_client import OllamaClient
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Run the simulation headless and report its throughput.")
+    parser.add_argument('--seconds', type=float, default=600.0, help="simulated seconds to run (default: 600)")
+    parser.add_argument('--dt', type=float, default=None,
+                        help="simulated seconds per step (default: the engine's fixed step, see simulation.timestep)")
+    parser.add_argument('--sims', type=int, default=config_manager.get_entry('simulation.initial_sims', 10),
+                        help="number of Sims (default: simulation.initial_sims)")
+    parser.add_argument('--seed', type=int, default=None, help="seed for the random number generators and the map")
+    parser.add_argument('--report', type=float, default=10.0,
+                        help="wall-clock seconds between progress reports, 0 for none (default: 10)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+    # World size in tiles defaults to one screen, as in the windowed simulation
+    world_width = config_manager.get_entry('city.world_width_tiles', config_manager.get_entry('simulation.screen_width', 800) // TILE_SIZE) * TILE_SIZE
+    world_height = config_manager.get_entry('city.world_height_tiles', config_manager.get_entry('simulation.screen_height', 600) // TILE_SIZE) * TILE_SIZE
+
+    # A --seed fixes the map too (drawn as an unseeded City would draw it), so its map is cached and never pinned
+    map_seed = random.randrange(2**32) if args.seed is not None else None
+    setup_start = time.perf_counter()
+    city = City(world_width, world_height, load_images=False, seed=map_seed)
+    weather = Weather(config_manager, world_width, world_height, effects=False)
+    ollama_client = OllamaClient()
+    for sim in initialize_sims(args.sims, {}, ollama_client, config_manager.get_entry('sim', {}),
+                               world_width, world_height, TILE_SIZE, city, load_sprites=False).values():
+        city.registry.add(sim)
+    city.city_update(0) # Load the chunks under the initial Sims when streaming
+    engine = SimulationEngine(city, weather, ollama_client, step_seconds=args.dt)
+    print(f"Set up {len(city.registry)} Sims on a {city.grid_width}x{city.grid_height} map in {time.perf_counter() - setup_start:.2f}s.")
+
+    start = time.perf_counter()
+    meter = ThroughputMeter(args.report)
+    try:
+        while engine.current_time < args.seconds:
+            engine.step(engine.step_seconds)
+            if args.report and meter.update(engine.current_time):
+                print(f"t={engine.current_time:.0f}s: {meter.rate:.1f} sim-s/s")
+    except KeyboardInterrupt:
+        print("Interrupted.")
+    finally:
+        city.close() # Stops the path-planning workers
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"Simulated {engine.current_time:.1f}s in {engine.ticks} steps over {elapsed:.2f}s: "
+          f"{engine.current_time / elapsed:.1f} sim-s/s, {engine.ticks / elapsed:.0f} steps/s.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,50 +1,78 @@
-import pygame
+from aisim.src.core.startup import startup_profiler # First, so the import timings cover everything below
+import logging
 import os
 import sys
-import random
-import uuid
-import os
-import pygame_gui # Import pygame_gui
+from concurrent.futures import ThreadPoolExecutor
+import pygame
 from aisim.src.core.configuration import config_manager # Import the centralized config manager
-from aisim.src.core.sim import Sim # Import Sim class (constants are now internal or loaded from config)
+from aisim.src.core.population import sim_population
 from aisim.src.core.weather import Weather
+from aisim.src.core.engine import SimulationEngine, ThroughputMeter, initialize_sims
 from aisim.src.core.city import City, TILE_SIZE # Import TILE_SIZE constant
-from aisim.src.ai.ollama_client import OllamaClient
-from aisim.src.core import interaction
+from aisim.src.ai.ollama_client import OllamaClient # Cheap: the ollama package itself is imported when the client is created
 from aisim.src.core.mood import get_mood_description # Needed for Sim details window (in panel.py)
-from aisim.src.ui.panel import create_or_focus_sim_details_window # Import the moved function
-from aisim.src.ui.bubble import manage_conversation_bubbles # Import the moved function
-print(f"Current working directory: {os.getcwd()}")
-print(f"Python sys.path: {sys.path}")
+from aisim.src.core.personality import get_attributes_data
+from aisim.src.core.movement import get_tile_coords
+from aisim.src.ui.bubble import BubbleLayer
+from aisim.src.ui.renderer import DirtyRectRenderer
+from aisim.src.ui.camera import Camera, PAN_SPEED
+logging.debug(f"Current working directory: {os.getcwd()}")
 SCREEN_WIDTH = config_manager.get_entry('simulation.screen_width', 800) # Default width
 SCREEN_HEIGHT = config_manager.get_entry('simulation.screen_height', 600) # Default height
 WINDOW_TITLE = config_manager.get_entry('simulation.window_title', "AI Simulation") # Default title
+# World size in tiles is independent of the window; defaults to exactly one screen
+WORLD_WIDTH = config_manager.get_entry('city.world_width_tiles', SCREEN_WIDTH // TILE_SIZE) * TILE_SIZE
+WORLD_HEIGHT = config_manager.get_entry('city.world_height_tiles', SCREEN_HEIGHT // TILE_SIZE) * TILE_SIZE
 
 # Dictionary to store active Sim detail windows {sim_id: UIWindow}
 active_detail_windows = {} # {sim_id: UIWindow}
-active_bubble_labels = {} # {sim_id: UILabel}
 # Function create_or_focus_sim_details_window moved to aisim.src.ui.panel
 
+def _timed(name, func):
+    """Runs a startup step under the startup profiler (used for the background init tasks)."""
+    with startup_profiler.phase(name):
+        return func()
+
+def _import_module(name):
+    """Imports a module so a later import in the main thread finds it already loaded."""
+    __import__(name)
+
 def main():
     # Get config values using the centralized manager
     fps = config_manager.get_entry('simulation.fps', 60)
     initial_sims = config_manager.get_entry('simulation.initial_sims', 10)
     sim_creation_config = config_manager.get_entry('sim', {}) # Pass the whole 'sim' section if Sim expects it
     movement_direction_change_frequency = config_manager.get_entry('movement.direction_change_frequency', 5.0)
-    pygame.init() # Pygame init needs to happen before font loading in Sim
+    render_mode = config_manager.get_entry('rendering.mode', 'dirty_rects') # 'dirty_rects' or 'full'
+    # Turbo mode draws every Nth frame (0: never by count) or once render_interval seconds have passed
+    turbo_render_every = config_manager.get_entry('simulation.turbo.render_every', 0)
+    turbo_render_interval_ms = config_manager.get_entry('simulation.turbo.render_interval', 0.1) * 1000
+    # Slow, display-independent setup runs in the background while the window is created
+    startup_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='startup')
+    ollama_future = startup_pool.submit(_timed, 'ollama client', OllamaClient) # Reads its own config section
+    attributes_future = startup_pool.submit(_timed, 'personality attributes', get_attributes_data)
+    gui_import_future = startup_pool.submit(_timed, 'import pygame_gui', lambda: _import_module('pygame_gui'))
+    graph_import_future = startup_pool.submit(_timed, 'import networkx', lambda: _import_module('networkx'))
+    startup_pool.shutdown(wait=False)
+
+    with startup_profiler.phase('pygame init'):
+        pygame.init() # Pygame init needs to happen before font loading in Sim
     # initialize_fonts() # Removed - Handled by pygame_gui theme
-    # Create AI Client
-    ollama_client = OllamaClient() # Reads its own config section
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    pygame.display.set_caption(WINDOW_TITLE)
+    with startup_profiler.phase('window'):
+        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        pygame.display.set_caption(WINDOW_TITLE)
     clock = pygame.time.Clock()
 
     # --- Pygame GUI Setup ---
-    ui_manager = pygame_gui.UIManager((SCREEN_WIDTH, SCREEN_HEIGHT), 'aisim/config/theme.json')
+    gui_import_future.result()
+    import pygame_gui
+    from aisim.src.ui.panel import create_or_focus_sim_details_window # Import the moved function
+    with startup_profiler.phase('ui manager'):
+        ui_manager = pygame_gui.UIManager((SCREEN_WIDTH, SCREEN_HEIGHT), 'aisim/config/theme.json')
 
     # --- Create Static UI Labels ---
     # Status Label (Top-Left)
-    status_label_rect = pygame.Rect(0, 0, 150, 25)
+    status_label_rect = pygame.Rect(0, 0, 260, 25)
     status_label_rect.topleft = (10, 10)
     status_label = pygame_gui.elements.UILabel(
         relative_rect=status_label_rect,
@@ -84,23 +112,40 @@ def main():
     # --- End Static UI Labels ---
     # --- End Pygame GUI Setup ---
 
+    # Conversation bubbles are drawn by a dedicated layer instead of pygame_gui labels
+    bubble_layer = BubbleLayer()
+
     # Create Simulation Components
     weather = Weather(config_manager, SCREEN_WIDTH, SCREEN_HEIGHT) # Pass the main config manager
-    city = City(SCREEN_WIDTH, SCREEN_HEIGHT) # City will use config_manager internally now
-
-    # Store sims in a dictionary for easy lookup by ID
-    sims_dict = {}
-    sims_dict = initialize_sims(initial_sims, sims_dict, ollama_client, sim_creation_config, SCREEN_WIDTH, SCREEN_HEIGHT, TILE_SIZE)
-
-    # Add sims to city
-    city.sims = list(sims_dict.values()) # City might still expect a list
+    graph_import_future.result()
+    with startup_profiler.phase('city'):
+        city = City(WORLD_WIDTH, WORLD_HEIGHT) # City will use config_manager internally now
+    camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, WORLD_WIDTH, WORLD_HEIGHT) # Pan with arrow keys, zoom with mouse wheel
+
+    # Sims need the AI client and the attribute data from the background tasks
+    ollama_client = ollama_future.result()
+    attributes_future.result()
+
+    # Register the sims with the city, which indexes them by ID, interaction and tile
+    registry = city.registry
+    with startup_profiler.phase('sims'):
+        for sim in initialize_sims(initial_sims, {}, ollama_client, sim_creation_config, WORLD_WIDTH, WORLD_HEIGHT, TILE_SIZE, city).values():
+            registry.add(sim)
+    city.city_update(0) # Load the chunks under the initial Sims when streaming
+    engine = SimulationEngine(city, weather, ollama_client, sim_population, movement_direction_change_frequency)
+
+    # Dirty-rect renderer redraws only changed regions; None means full redraw every frame
+    renderer = DirtyRectRenderer((SCREEN_WIDTH, SCREEN_HEIGHT)) if render_mode == 'dirty_rects' else None
 
     running = True
     paused = False
     time_scale = 1.0 # Normal speed
     time_scales = {pygame.K_1: 1.0, pygame.K_2: 2.0, pygame.K_4: 4.0, pygame.K_0: 10.0} # Add 0 for 10x
+    turbo = False # Simulate flat out and draw only some frames (T toggles)
+    turbo_frames = 0 # Frames since turbo mode was turned on
+    last_draw_ms = 0
+    throughput = ThroughputMeter() # Achieved sim-seconds per real second, shown in the status label
 
-    current_sim_time = 0.0 # Track total simulation time passed
     selected_sim = None # Track the currently selected Sim (for bottom label)
     selected_tile_info = None # Track the last clicked tile info
     last_click_time = 0
@@ -108,7 +153,7 @@ def main():
     DOUBLE_CLICK_TIME = 500 # Milliseconds
     while running:
         # Event handling
-        time_delta = clock.tick(fps) / 1000.0 # Calculate time_delta here for UIManager
+        time_delta = clock.tick(0 if turbo and not paused else fps) / 1000.0 # Calculate time_delta here for UIManager; turbo frames are not capped
 
         for event in pygame.event.get():
             ui_manager.process_events(event) # Pass events to the UI Manager
@@ -119,11 +164,18 @@ def main():
                     paused = not paused
                 elif event.key in time_scales: # Change speed
                      time_scale = time_scales[event.key]
+                     turbo = False
                      print(f"Time scale set to: {time_scale}x")
+                elif event.key == pygame.K_t: # Toggle turbo mode
+                    turbo = not turbo
+                    turbo_frames = 0
+                    print(f"Turbo mode {'on' if turbo else 'off'}")
                 # ADDED: Manual weather change trigger
                 elif event.key == pygame.K_w:
                     print("W key pressed - forcing next weather state.")
                     weather.force_next_weather() # Call the new method
+            elif event.type == pygame.MOUSEWHEEL: # Zoom the camera around the mouse cursor
+                camera.zoom_by(1 if event.y > 0 else -1, pygame.mouse.get_pos())
             # --- Mouse Button Down Logic (Refactored for GUI) ---
             elif event.type == pygame.MOUSEBUTTONDOWN:
                  if event.button == 1: # Left click
@@ -135,14 +187,14 @@ def main():
                     # the click was likely *not* on an interactive GUI element like a button or window drag bar.
                     # However, clicking *inside* a non-interactive part of a window might still reach here.
 
-                    mouse_x, mouse_y = event.pos
+                    mouse_x, mouse_y = camera.screen_to_world(*event.pos) # Sims and tiles live in world coordinates
                     current_time_ms = pygame.time.get_ticks()
                     clicked_on_sim_object = None
                     min_dist_sq = float('inf')
 
-                    # Find the closest sim to the click (same logic as before)
-                    for sim in sims_dict.values():
-                        sim_rect = pygame.Rect(sim.x - sim.sprite_width // 2, sim.y - sim.sprite_height // 2, sim.sprite_width, sim.sprite_height)
+                    # Find the closest sim to the click among the Sims on and around the clicked tile
+                    for sim in registry.near(get_tile_coords(mouse_x, mouse_y, city.grid_width, city.grid_height)):
+                        sim_rect = sim.get_draw_rect()
                         if sim_rect.collidepoint(mouse_x, mouse_y):
                              dist_sq = (sim.x - mouse_x)**2 + (sim.y - mouse_y)**2
                              if dist_sq < min_dist_sq:
@@ -157,7 +209,7 @@ def main():
                             print(f"Double-clicked Sim: {clicked_on_sim_object.sim_id}")
                             # --- Action: Create or Focus Sim Details Window (Call moved function) ---
                             create_or_focus_sim_details_window(
-                                clicked_on_sim_object, ui_manager, sims_dict, active_detail_windows, SCREEN_WIDTH, SCREEN_HEIGHT
+                                clicked_on_sim_object, ui_manager, registry, active_detail_windows, SCREEN_WIDTH, SCREEN_HEIGHT
                             )
                             selected_sim = clicked_on_sim_object # Keep track for bottom label
                             selected_tile_info = None
@@ -182,15 +234,10 @@ def main():
                         last_clicked_sim_id = None
 
                         # Calculate tile coordinates (same logic as before)
-                        tile_col = mouse_x // TILE_SIZE
-                        tile_row = mouse_y // TILE_SIZE
+                        tile_col = int(mouse_x // TILE_SIZE)
+                        tile_row = int(mouse_y // TILE_SIZE)
                         if 0 <= tile_row < city.grid_height and 0 <= tile_col < city.grid_width:
-                            tile_name = city.tile_map[tile_row][tile_col]
-                            tile_type = "unknown"
-                            if tile_name:
-                                if tile_name.startswith('grass_'): tile_type = "grass"
-                                elif tile_name.startswith('path_'): tile_type = "path"
-                                elif tile_name.startswith('prop_'): tile_type = "prop"
+                            tile_type = city.get_tile_type(tile_col, tile_row) # Sprite table lookup
                             selected_tile_info = {'coords': (tile_col, tile_row), 'type': tile_type}
                             print(f"Clicked empty space at tile {selected_tile_info['coords']} - Type: {selected_tile_info['type']}")
                         else:
@@ -219,100 +266,36 @@ def main():
             #         print("Button pressed!")
         # Calculate delta time (time since last frame) - Moved before event loop
 
+        # --- Camera Panning (held arrow keys, works while paused) ---
+        keys = pygame.key.get_pressed()
+        pan_x = (keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]) * PAN_SPEED * time_delta
+        pan_y = (keys[pygame.K_DOWN] - keys[pygame.K_UP]) * PAN_SPEED * time_delta
+        if pan_x or pan_y:
+            camera.pan(pan_x, pan_y)
+
         # Apply time controls
-        # dt is the time passed since the last frame (the smallest time unit) scaled by time_scale
+        # dt is the simulated time that passed this frame: the frame time scaled by time_scale
         if paused:
             dt = 0.0 # No time passes if paused
         else:
             # Use time_delta calculated before event loop for consistency
             dt = time_delta * time_scale # Apply speed multiplier
         # Game logic updates
-        # Only update simulation logic if time is passing
-        if dt > 0: # Only update simulation state if not paused
-            current_sim_time += dt # Increment simulation time
-            all_sims_list = list(sims_dict.values()) # Get list for passing to update
-            for sim in all_sims_list:
-                # Pass city.TILE_SIZE to sim.update for arrival checks
-                sim.sim_update(dt, city, weather.current_state, all_sims_list, current_sim_time, TILE_SIZE, movement_direction_change_frequency) # Use retrieved frequency
-            weather.weather_update(dt)
-            city.city_update(dt) # Update city state (currently does nothing)
-
-            # --- Poll for Ollama Results (Conversation Responses, Analysis) ---
-            while True:
-                result_data = ollama_client.check_for_results() # Use the updated method
-                if result_data is None:
-                    break # No more results in the queue for now
-
-                result_type = result_data.get('type')
-
-                if result_type == 'conversation':
-                    sim_id = result_data.get('sim_id')
-                    response_text = result_data.get('data')
-                    target_sim = sims_dict.get(sim_id)
-                    if target_sim and response_text:
-                        # Pass conversation response to the interaction handler
-                        interaction.handle_ollama_response(target_sim, response_text, all_sims_list, city)
-                    elif not target_sim:
-                        print(f"Warning: Received 'conversation' result for unknown Sim ID: {sim_id}")
-
-                elif result_type == 'romance_analysis':
-                    sim1_id = result_data.get('sim1_id')
-                    sim2_id = result_data.get('sim2_id')
-                    analysis_result = result_data.get('data') # INCREASE, DECREASE, NEUTRAL
-
-                    sim1 = sims_dict.get(sim1_id)
-                    sim2 = sims_dict.get(sim2_id)
-                    romance_change_step = config_manager.get_entry('simulation.romance_change_step', 0.05) # Get from config
-
-                    if sim1 and sim2 and analysis_result:
-                        change = 0.0
-                        if analysis_result == "INCREASE":
-                            change = romance_change_step
-                        elif analysis_result == "DECREASE":
-                            change = -romance_change_step
-
-                        if change != 0.0:
-                            # Update Sim 1's relationship towards Sim 2
-                            if sim2_id in sim1.relationships:
-                                current_romance_1 = sim1.relationships[sim2_id].get("romance", 0.0)
-                                new_romance_1 = max(0.0, min(1.0, current_romance_1 + change))
-                                sim1.relationships[sim2_id]["romance"] = new_romance_1
-                                print(f"Romance {sim1.first_name} -> {sim2.first_name}: {current_romance_1:.2f} -> {new_romance_1:.2f} ({analysis_result})")
-                            else: # Initialize if somehow missing
-                                sim1.relationships[sim2_id] = {"friendship": 0.0, "romance": max(0.0, min(1.0, change))}
-                                print(f"Romance {sim1.first_name} -> {sim2.first_name}: Initialized to {sim1.relationships[sim2_id]['romance']:.2f} ({analysis_result})")
-
-                            # Update Sim 2's relationship towards Sim 1
-                            if sim1_id in sim2.relationships:
-                                current_romance_2 = sim2.relationships[sim1_id].get("romance", 0.0)
-                                new_romance_2 = max(0.0, min(1.0, current_romance_2 + change))
-                                sim2.relationships[sim1_id]["romance"] = new_romance_2
-                                print(f"Romance {sim2.first_name} -> {sim1.first_name}: {current_romance_2:.2f} -> {new_romance_2:.2f} ({analysis_result})")
-                            else: # Initialize if somehow missing
-                                sim2.relationships[sim1_id] = {"friendship": 0.0, "romance": max(0.0, min(1.0, change))}
-                                print(f"Romance {sim2.first_name} -> {sim1.first_name}: Initialized to {sim2.relationships[sim1_id]['romance']:.2f} ({analysis_result})")
-                        else:
-                             print(f"Romance analysis between {sim1.first_name} and {sim2.first_name}: NEUTRAL, no change.")
-
-                    elif not sim1:
-                        print(f"Warning: Received 'romance_analysis' for unknown Sim1 ID: {sim1_id}")
-                    elif not sim2:
-                        print(f"Warning: Received 'romance_analysis' for unknown Sim2 ID: {sim2_id}")
-
-                    # --- Remove pair from pending analysis lock ---
-                    if sim1_id and sim2_id:
-                        analysis_pair = tuple(sorted((sim1_id, sim2_id)))
-                        city.pending_romance_analysis.discard(analysis_pair)
-
-                else:
-                    print(f"Warning: Received unknown result type from Ollama queue: {result_type}")
+        # The engine runs dt in fixed steps, so higher speeds take more steps per frame instead of longer ones
+        if turbo and not paused: # As many fixed steps as fit in one frame's time at the configured fps
+            engine.run_for(1.0 / fps)
+        elif dt > 0: # Only update simulation state if not paused
+            engine.advance(dt)
+        throughput.update(engine.current_time)
 
         # --- Update UI Label Text ---
         # Status Label
         if paused:
             status_label.set_text("PAUSED")
+        elif turbo:
+            status_label.set_text(f"TURBO: {throughput.rate:.1f} sim-s/s")
         else:
-            status_label.set_text(f"Speed: {time_scale}x")
+            status_label.set_text(f"Speed: {time_scale}x ({throughput.rate:.1f} sim-s/s)")
 
         # Weather Label
         weather_label.set_text(f"Weather: {weather.current_state}")
@@ -339,43 +322,44 @@ def main():
         # --- Update UI Manager ---
         ui_manager.update(time_delta) # Update GUI elements
 
-        # --- Drawing --- (Always draw, even when paused)
-        screen.fill(weather.get_current_color()) # Use weather color for background
-        # Draw city grid first
-        city.draw(screen)
+        # --- Turbo Mode: skip drawing all but some frames ---
+        if turbo and not paused:
+            turbo_frames += 1
+            now_ms = pygame.time.get_ticks()
+            if not (turbo_render_every and turbo_frames % turbo_render_every == 0) and now_ms - last_draw_ms < turbo_render_interval_ms:
+                continue
+            last_draw_ms = now_ms
 
-        # Draw simulation elements (Sims)
-        for sim in sims_dict.values(): # Iterate over dict values
-            sim.draw(screen, dt, all_sims_list)
-        weather.draw_effects(screen) # Draw weather effects over sims
-
-        # --- Manage Conversation Bubbles (Call moved function) ---
-        manage_conversation_bubbles(sims_dict, active_bubble_labels, ui_manager)
+        # --- Update Conversation Bubbles ---
+        # Done before drawing so new/moved bubbles are part of this frame's dirty regions
+        bubble_layer.update(registry.interacting.values(), camera) # Only Sims in a conversation have a bubble
 
+        # --- Drawing --- (Always draw, even when paused)
+        if renderer:
+            renderer.render(screen, city, registry.sims, weather, ui_manager, dt, bubble_layer, camera)
+        else:
+            screen.fill(weather.get_current_color()) # Use weather color for background
+            # Draw city grid first (only tiles inside the viewport)
+            city.draw(screen, camera)
 
-        # --- Draw UI Elements using Pygame GUI ---
-        ui_manager.draw_ui(screen)
-        # Removed manual drawing of status text, weather text, bottom info, and details panel
+            # Draw simulation elements (Sims inside the viewport)
+            screen_rect = screen.get_rect()
+            for sim in registry.sims:
+                if sim.get_draw_rect(camera).colliderect(screen_rect):
+                    sim.draw(screen, dt, registry.sims, camera)
+            weather.draw_effects(screen) # Draw weather effects over sims
+            bubble_layer.draw(screen) # Draw conversation bubbles over weather
 
-        # Removed test bubble drawing logic
-        pygame.display.flip() # Update the full display Surface to the screen
+            # --- Draw UI Elements using Pygame GUI ---
+            ui_manager.draw_ui(screen)
+            pygame.display.flip() # Update the full display Surface to the screen
+        startup_profiler.report() # Only prints once, after the first frame, when profiling is enabled
 
 
     # --- End of main loop ---
+    city.close() # Stops the path-planning workers
     pygame.quit()
     sys.exit()
 
-def initialize_sims(initial_sims, sims_dict, ollama_client, sim_creation_config, SCREEN_WIDTH, SCREEN_HEIGHT, TILE_SIZE):
-    for _ in range(initial_sims): # Use retrieved initial_sims
-        new_sim = Sim(
-            sim_id=str(uuid.uuid4()),  # Generate unique ID
-            x=max(0, min(random.randint(0, SCREEN_WIDTH), SCREEN_WIDTH - TILE_SIZE - 1)),
-            y=max(0, min(random.randint(0, SCREEN_HEIGHT), SCREEN_HEIGHT - TILE_SIZE - 1)),
-            ollama_client=ollama_client, # Pass the client instance
-            sim_config=sim_creation_config, # Pass the retrieved sim config dictionary
-        )
-        sims_dict[new_sim.sim_id] = new_sim
-    return sims_dict
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
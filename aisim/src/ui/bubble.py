@@ -1,110 +1,168 @@
 import pygame
-import pygame_gui
+import json
+import os
 import logging
-from typing import Dict, Set, TYPE_CHECKING
+from typing import Dict, List, Tuple, Optional, TYPE_CHECKING
+from aisim.src.core.configuration import config_manager
 from aisim.src.core.text import wrap_text  # Import the wrapping function
 
 # Use TYPE_CHECKING to avoid circular imports for type hints
 if TYPE_CHECKING:
     from aisim.src.core.sim import Sim
-    from pygame_gui import UIManager
-    from pygame_gui.elements import UILabel
+    from aisim.src.ui.camera import Camera
 
 MAX_BUBBLE_WIDTH = 180  # Max width in pixels for the bubble content
-
-
-def manage_conversation_bubbles(
-    sims_dict: Dict[str, 'Sim'],
-    active_bubble_labels: Dict[str, 'UILabel'],
-    ui_manager: 'UIManager'
-):
-    """Creates, updates, positions, and removes conversation bubble UILabels."""
-
-    sim_ids_with_active_bubbles: Set[str] = set()  # Track sims that *should* have a bubble this frame
-
-    for sim_id, sim in sims_dict.items():
-        bubble_text = sim.conversation_message
-        bubble_timer = sim.conversation_message_timer
-
-        if bubble_text and bubble_timer > 0:
-            sim_ids_with_active_bubbles.add(sim_id)
-            sim_pos = (int(sim.x), int(sim.y))
-            # Use sprite_height if available, otherwise default
-            sprite_height = getattr(sim, 'sprite_height', 32)
-            bubble_anchor_y = sim_pos[1] - sprite_height // 2 - 5  # Position above sprite
-
-            # Get the font used by the bubble style for wrapping/measuring
-            # This might require accessing the theme data more directly if just manager isn't enough
-            # For simplicity, let's assume we can get a default font or the label uses one we can access
-            # A more robust way might involve passing the font or theme object
+BUBBLE_THEME_ID = "@sim_bubble"  # Theme block holding the bubble colours and shape
+THEME_PATH = 'aisim/config/theme.json'
+POOL_BUCKET = 16  # Pooled surfaces are rounded up to multiples of this many pixels
+MAX_POOLED_SURFACES = 32  # Free surfaces kept for reuse per bucket size
+
+
+def _is_emoji(char: str) -> bool:
+    """Returns True for code points that the Monaco font has no glyph for and the emoji font covers."""
+    code = ord(char)
+    return code >= 0x1F000 or 0x2600 <= code <= 0x27BF or 0x2B00 <= code <= 0x2BFF or code == 0xFE0F
+
+
+class BubbleLayer:
+    """Renders conversation bubbles above Sims in one batched pass, without pygame_gui labels.
+
+    Each bubble's text is rendered once into a pooled surface when the message changes,
+    using per-character glyph caches for the Monaco and emoji fonts. Every frame only
+    repositions the cached surfaces and blits them all with a single `Surface.blits` call.
+    """
+
+    def __init__(self, theme_path: str = THEME_PATH):
+        """Loads the bubble style from the theme file and the bubble fonts."""
+        theme = {}
+        try:
+            with open(theme_path, 'r') as f:
+                theme = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            logging.warning(f"Could not load bubble theme from {theme_path}: {e}. Using defaults.")
+        style = theme.get(BUBBLE_THEME_ID, {})
+        colours = style.get('colours', {})
+        misc = style.get('misc', {})
+        label_font = theme.get('label', {}).get('font', {})
+
+        self.bg_color = pygame.Color(colours.get('dark_bg', '#FFFFFFE6'))
+        self.text_color = pygame.Color(colours.get('normal_text', '#000000'))
+        self.border_color = pygame.Color(colours.get('normal_border', '#404040'))
+        self.corner_radius = int(misc.get('shape_corner_radius', 8))
+        self.border_width = int(misc.get('border_width', 1))
+        self.padding_x = int(misc.get('text_horiz_alignment_padding', 5))
+        self.padding_y = int(misc.get('text_vert_alignment_padding', 5))
+
+        font_size = int(label_font.get('size', 14))
+        if not pygame.font.get_init(): pygame.font.init()
+        self.font = self._load_font(config_manager.get_entry('sim.panel_font_dir'), font_size) or pygame.font.Font(None, font_size)
+        self.emoji_font = self._load_font(config_manager.get_entry('sim.panel_font_emoji_dir'), font_size)
+        self.line_height = self.font.get_linesize()
+
+        self._glyph_cache: Dict[Tuple[bool, str], pygame.Surface] = {}  # {(is_emoji, char): glyph surface}
+        self._bubbles: Dict[str, Tuple[str, pygame.Surface, pygame.Rect]] = {}  # {sim_id: (text, surface, rect)}
+        self._surface_pool: Dict[Tuple[int, int], List[pygame.Surface]] = {}  # {bucket size: free surfaces}
+
+    def _load_font(self, font_path: Optional[str], size: int) -> Optional[pygame.font.Font]:
+        """Loads a font file, returning None if it is not available."""
+        if not font_path or not os.path.isfile(font_path):
+            logging.warning(f"Bubble font not found: {font_path}")
+            return None
+        try:
+            return pygame.font.Font(font_path, size)
+        except (pygame.error, OSError) as e:
+            logging.warning(f"Could not load bubble font {font_path}: {e}")
+            return None
+
+    def _get_glyph(self, char: str) -> pygame.Surface:
+        """Returns the cached glyph surface for a character, rendering it on first use."""
+        use_emoji = self.emoji_font is not None and _is_emoji(char)
+        key = (use_emoji, char)
+        glyph = self._glyph_cache.get(key)
+        if glyph is None:
+            font = self.emoji_font if use_emoji else self.font
             try:
-                # Attempt to get font details from the theme for the specific class
-                # Note: This specific method might not exist, adjust based on pygame_gui capabilities
-                # Fallback to a default font if theme access is complex/unavailable
-                bubble_font = ui_manager.get_theme().get_font('@sim_bubble')
-            except Exception:
-                # Fallback if theme font access fails
-                bubble_font = pygame.font.Font(None, 14)  # Default fallback
-                logging.warning("Could not get bubble font from theme, using fallback.")
-
-            if sim_id in active_bubble_labels:
-                # --- Update Existing Bubble ---
-                bubble_label = active_bubble_labels[sim_id]
-                current_label_text = bubble_label.text  # Get text with potential newlines
-
-                # Wrap the *original* bubble_text for comparison and potential update
-                wrapped_lines = wrap_text(bubble_text, bubble_font, MAX_BUBBLE_WIDTH)
-                new_wrapped_text = "\n".join(wrapped_lines)
-
-                if current_label_text != new_wrapped_text:
-                    logging.debug(f"Updating bubble text for {sim_id}")
-                    bubble_label.set_text(new_wrapped_text)
-                    # Allow the UIManager to update the label's size based on new text
-                    # We only need to reposition it based on its new rect later
-
-                # Reposition based on current sim location and label's current rect
-                # Get the *current* rect after potential text update and manager processing
-                current_rect = bubble_label.get_relative_rect()
-                current_rect.midbottom = (sim_pos[0], bubble_anchor_y)
-                bubble_label.set_relative_position(current_rect.topleft)  # Set position based on midbottom anchor
-                bubble_label.show()  # Ensure it's visible
-
+                glyph = font.render(char, True, self.text_color)
+            except pygame.error as e:
+                logging.warning(f"Could not render glyph {char!r}: {e}")
+                glyph = font.render('?', True, self.text_color)
+            self._glyph_cache[key] = glyph
+        return glyph
+
+    def _acquire_surface(self, width: int, height: int) -> pygame.Surface:
+        """Takes a transparent surface of at least the given size from the pool."""
+        bucket = (-(-width // POOL_BUCKET) * POOL_BUCKET, -(-height // POOL_BUCKET) * POOL_BUCKET)
+        free = self._surface_pool.get(bucket)
+        if free:
+            surface = free.pop()
+            surface.fill((0, 0, 0, 0))
+            return surface
+        return pygame.Surface(bucket, pygame.SRCALPHA)
+
+    def _release_surface(self, surface: pygame.Surface):
+        """Returns a surface to the pool for reuse by a later bubble."""
+        free = self._surface_pool.setdefault(surface.get_size(), [])
+        if len(free) < MAX_POOLED_SURFACES:
+            free.append(surface)
+
+    def _render_bubble(self, text: str) -> Tuple[pygame.Surface, pygame.Rect]:
+        """Renders the wrapped text and bubble background into a pooled surface."""
+        lines = wrap_text(text, self.font, MAX_BUBBLE_WIDTH)
+        line_glyphs = [[self._get_glyph(char) for char in line] for line in lines]
+        text_width = max((sum(glyph.get_width() for glyph in glyphs) for glyphs in line_glyphs), default=0)
+        width = text_width + 2 * self.padding_x
+        height = len(lines) * self.line_height + 2 * self.padding_y
+
+        surface = self._acquire_surface(width, height)
+        bubble_rect = pygame.Rect(0, 0, width, height)
+        pygame.draw.rect(surface, self.bg_color, bubble_rect, border_radius=self.corner_radius)
+        if self.border_width > 0:
+            pygame.draw.rect(surface, self.border_color, bubble_rect, self.border_width, border_radius=self.corner_radius)
+
+        # Lay out all glyphs, centered per line, and draw them in one batch
+        glyph_blits = []
+        y = self.padding_y
+        for glyphs in line_glyphs:
+            x = self.padding_x + (text_width - sum(glyph.get_width() for glyph in glyphs)) // 2
+            for glyph in glyphs:
+                glyph_blits.append((glyph, (x, y + (self.line_height - glyph.get_height()) // 2)))
+                x += glyph.get_width()
+            y += self.line_height
+        surface.blits(glyph_blits, doreturn=False)
+        return surface, bubble_rect
+
+    def update(self, sims: List['Sim'], camera: Optional['Camera'] = None):
+        """Creates, re-renders, repositions, and removes bubbles based on each Sim's conversation message."""
+        active_ids = set()
+        for sim in sims:
+            bubble_text = sim.conversation.message
+            if not bubble_text or sim.conversation.message_timer <= 0:
+                continue
+            active_ids.add(sim.sim_id)
+            existing = self._bubbles.get(sim.sim_id)
+            if existing and existing[0] == bubble_text:
+                surface, rect = existing[1], existing[2]
             else:
-                # --- Create New Bubble ---
-                logging.info(f"Creating bubble for {sim.full_name}: {bubble_text}")
-
-                # Wrap the text first
-                wrapped_lines = wrap_text(bubble_text, bubble_font, MAX_BUBBLE_WIDTH)
-                wrapped_text = "\n".join(wrapped_lines)
-
-                # Create the label with wrapped text.
-                # Use a minimal rect initially; pygame_gui will resize it.
-                initial_rect = pygame.Rect(0, 0, -1, -1)  # Auto-sizing rect
-
-                # Create the label, using object_id for class styling
-                bubble_label = pygame_gui.elements.UILabel(
-                    relative_rect=initial_rect,
-                    text=wrapped_text,
-                    manager=ui_manager,
-                    object_id="@sim_bubble"  # Use class ID in object_id for theming
-                )
-                # Now that the label exists and has its size calculated by pygame_gui,
-                # get its actual rect and position it correctly.
-                label_rect = bubble_label.get_relative_rect()
-                label_rect.midbottom = (sim_pos[0], bubble_anchor_y)
-                bubble_label.set_relative_position(label_rect.topleft)  # Set final position
-
-                active_bubble_labels[sim_id] = bubble_label
-        # else: Bubble should not be shown for this sim
-
-    # --- Clean up expired / unused bubbles ---
-    sim_ids_to_remove = []
-    for sim_id, bubble_label in active_bubble_labels.items():
-        if sim_id not in sim_ids_with_active_bubbles:
-            logging.info(f"Killing bubble for Sim ID {sim_id}")
-            bubble_label.kill()
-            sim_ids_to_remove.append(sim_id)
-
-    for sim_id in sim_ids_to_remove:
-        del active_bubble_labels[sim_id]
-    # --- End Conversation Bubble Management ---
\ No newline at end of file
+                if existing:
+                    self._release_surface(existing[1])
+                logging.debug(f"Rendering bubble for {sim.full_name}: {bubble_text}")
+                surface, rect = self._render_bubble(bubble_text)
+            # Position above the sprite (bubbles stay unscaled when the camera zooms)
+            sprite_rect = sim.get_draw_rect(camera)
+            rect.midbottom = (sprite_rect.centerx, sprite_rect.top - 5)
+            self._bubbles[sim.sim_id] = (bubble_text, surface, rect)
+
+        # --- Clean up expired / unused bubbles ---
+        for sim_id in [sim_id for sim_id in self._bubbles if sim_id not in active_ids]:
+            self._release_surface(self._bubbles.pop(sim_id)[1])
+
+    def get_rects(self) -> List[pygame.Rect]:
+        """Returns the screen rects currently covered by bubbles."""
+        return [rect.copy() for _, _, rect in self._bubbles.values()]
+
+    def draw(self, screen: pygame.Surface):
+        """Draws all active on-screen bubbles in a single batched blit."""
+        screen_rect = screen.get_rect()
+        visible = [(surface, rect, pygame.Rect((0, 0), rect.size)) for _, surface, rect in self._bubbles.values() if rect.colliderect(screen_rect)]
+        if visible:
+            screen.blits(visible, doreturn=False)
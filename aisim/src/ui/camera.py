@@ -0,0 +1,98 @@
+import pygame
+import math
+from typing import Tuple
+from aisim.src.core.configuration import config_manager
+
+ZOOM_LEVELS = (0.5, 0.75, 1.0, 1.5, 2.0) # Discrete levels keep scaled tiles pixel-aligned (16..64px at 32px tiles)
+PAN_SPEED = config_manager.get_entry('camera.pan_speed', 400.0) # Screen pixels per second
+
+
+class Camera:
+    """Maps world pixel coordinates to the screen for a pannable, zoomable viewport.
+
+    The camera position is the world coordinate shown at the top-left corner of the
+    screen. The visible world area is `viewport_size / zoom` and is kept inside the
+    world whenever the world is larger than the view.
+    """
+
+    def __init__(self, viewport_width: int, viewport_height: int, world_width: int, world_height: int):
+        """Initializes a camera centered on the world at 1x zoom."""
+        self.viewport_width = viewport_width
+        self.viewport_height = viewport_height
+        self.world_width = world_width
+        self.world_height = world_height
+        self.zoom = 1.0
+        self.x = 0.0
+        self.y = 0.0
+        self.center_on(world_width / 2, world_height / 2)
+
+    @property
+    def view_width(self) -> float:
+        """Width of the visible world area in world pixels."""
+        return self.viewport_width / self.zoom
+
+    @property
+    def view_height(self) -> float:
+        """Height of the visible world area in world pixels."""
+        return self.viewport_height / self.zoom
+
+    def get_state(self) -> Tuple[int, int, float]:
+        """Returns a tuple that changes whenever the visible area changes (used for cache keys)."""
+        return (int(self.x), int(self.y), self.zoom)
+
+    def _clamp(self):
+        """Keeps the view inside the world, centering it when the world is smaller than the view."""
+        if self.world_width <= self.view_width:
+            self.x = (self.world_width - self.view_width) / 2
+        else:
+            self.x = max(0.0, min(self.x, self.world_width - self.view_width))
+        if self.world_height <= self.view_height:
+            self.y = (self.world_height - self.view_height) / 2
+        else:
+            self.y = max(0.0, min(self.y, self.world_height - self.view_height))
+
+    def center_on(self, world_x: float, world_y: float):
+        """Centers the view on a world position."""
+        self.x = world_x - self.view_width / 2
+        self.y = world_y - self.view_height / 2
+        self._clamp()
+
+    def pan(self, dx: float, dy: float):
+        """Moves the view by a distance given in screen pixels."""
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+        self._clamp()
+
+    def zoom_by(self, steps: int, screen_pos: Tuple[int, int] = None):
+        """Moves up or down the zoom levels, keeping the world point under screen_pos fixed."""
+        current = min(range(len(ZOOM_LEVELS)), key=lambda i: abs(ZOOM_LEVELS[i] - self.zoom))
+        new_zoom = ZOOM_LEVELS[max(0, min(len(ZOOM_LEVELS) - 1, current + steps))]
+        if new_zoom == self.zoom:
+            return
+        if screen_pos is None:
+            screen_pos = (self.viewport_width / 2, self.viewport_height / 2)
+        anchor_x, anchor_y = self.screen_to_world(*screen_pos)
+        self.zoom = new_zoom
+        self.x = anchor_x - screen_pos[0] / self.zoom
+        self.y = anchor_y - screen_pos[1] / self.zoom
+        self._clamp()
+
+    def world_to_screen(self, world_x: float, world_y: float) -> Tuple[int, int]:
+        """Converts world pixel coordinates to screen coordinates."""
+        return (int((world_x - self.x) * self.zoom), int((world_y - self.y) * self.zoom))
+
+    def screen_to_world(self, screen_x: float, screen_y: float) -> Tuple[float, float]:
+        """Converts screen coordinates to world pixel coordinates."""
+        return (screen_x / self.zoom + self.x, screen_y / self.zoom + self.y)
+
+    def get_visible_world_rect(self) -> pygame.Rect:
+        """Returns the world area covered by the viewport."""
+        return pygame.Rect(int(self.x), int(self.y), math.ceil(self.view_width) + 1, math.ceil(self.view_height) + 1)
+
+    def get_visible_tile_range(self, tile_size: int, grid_width: int, grid_height: int) -> Tuple[int, int, int, int]:
+        """Returns (first_col, first_row, end_col, end_row) of the tiles in view, clamped to the grid."""
+        first_col = max(0, math.floor(self.x / tile_size))
+        first_row = max(0, math.floor(self.y / tile_size))
+        end_col = min(grid_width, math.ceil((self.x + self.view_width) / tile_size))
+        end_row = min(grid_height, math.ceil((self.y + self.view_height) / tile_size))
+        return first_col, first_row, end_col, end_row
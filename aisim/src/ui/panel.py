@@ -5,6 +5,7 @@ from typing import Dict, TYPE_CHECKING
 # Use TYPE_CHECKING to avoid circular imports for type hints
 if TYPE_CHECKING:
     from aisim.src.core.sim import Sim
+    from aisim.src.core.registry import SimRegistry
     from pygame_gui import UIManager
 
 # Import necessary functions (assuming mood is still needed here)
@@ -13,7 +14,7 @@ from aisim.src.core.mood import get_mood_description
 def create_or_focus_sim_details_window(
     sim: 'Sim',
     manager: 'UIManager',
-    sims_dict: Dict[str, 'Sim'],
+    registry: 'SimRegistry',
     active_detail_windows: Dict[str, pygame_gui.elements.UIWindow],
     SCREEN_WIDTH: int,
     SCREEN_HEIGHT: int
@@ -65,7 +66,7 @@ def create_or_focus_sim_details_window(
     if sim.relationships:
         sorted_relationships = sorted(sim.relationships.items(), key=lambda item: item[1].get('romance', 0.0), reverse=True)
         for other_id, values in sorted_relationships:
-            other_sim = sims_dict.get(other_id)
+            other_sim = registry.get(other_id)
             other_name = other_sim.full_name if other_sim else f"Unknown ({other_id[:6]})"
             friendship = values.get('friendship', 0.0)
             romance = values.get('romance', 0.0)
@@ -75,8 +76,8 @@ def create_or_focus_sim_details_window(
     romance_info += "<br>" # Add space after section
 
     conversation_history = "<b>Conversation History:</b><br>"
-    if sim.conversation_history:
-        for entry in sim.conversation_history:
+    if sim.conversation.history:
+        for entry in sim.conversation.history:
             speaker = entry.get('speaker', 'Unknown')
             line = entry.get('line', '')
             # Basic HTML escaping (replace < and >) - more robust escaping might be needed
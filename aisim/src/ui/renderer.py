@@ -0,0 +1,157 @@
+import pygame
+import logging
+from typing import Dict, List, Tuple, Iterable, Optional, TYPE_CHECKING
+from aisim.src.core.configuration import config_manager
+
+# Use TYPE_CHECKING to avoid circular imports for type hints
+if TYPE_CHECKING:
+    from aisim.src.core.sim import Sim
+    from aisim.src.core.city import City
+    from aisim.src.core.weather import Weather
+    from aisim.src.ui.bubble import BubbleLayer
+    from aisim.src.ui.camera import Camera
+    from pygame_gui import UIManager
+
+MAX_DIRTY_RECTS = config_manager.get_entry('rendering.max_dirty_rects', 64) # Above this, a full redraw is cheaper
+MAX_DIRTY_AREA_FRACTION = config_manager.get_entry('rendering.max_dirty_area_fraction', 0.5) # Fraction of the screen
+
+
+def merge_rects(rects: Iterable[pygame.Rect]) -> List[pygame.Rect]:
+    """Merges overlapping rects so that every dirty pixel is covered by exactly one rect."""
+    merged: List[pygame.Rect] = []
+    for rect in rects:
+        if rect.width <= 0 or rect.height <= 0:
+            continue
+        rect = rect.copy()
+        index = rect.collidelist(merged)
+        while index != -1:
+            # The union can grow into rects that did not collide before, so check again
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+class DirtyRectRenderer:
+    """Draws frames by repainting only the screen regions that changed since the previous frame.
+
+    The city tiles visible through the camera are rendered once into a cached background
+    surface, which is rebuilt only when the camera moves. Each frame the regions touched
+    by moving Sims and UI elements are restored from that background, the affected Sims
+    are redrawn, and only those rects are sent to the display. Sims outside the viewport
+    are never drawn.
+    Animated weather effects (rain, snow, lightning, transitions) cover the whole screen,
+    so those frames fall back to a full blit of the cached background.
+    """
+
+    def __init__(self, screen_size: Tuple[int, int]):
+        """Initializes the renderer for a screen of the given size."""
+        self.screen_rect = pygame.Rect((0, 0), screen_size)
+        self.background = None
+        self._background_key = None
+        self._sim_states: Dict[str, Tuple[pygame.Rect, tuple]] = {} # {sim_id: (rect, draw_state)} from last frame
+        self._ui_rects: List[pygame.Rect] = [] # UI element and bubble rects drawn last frame
+        self.force_full_redraw = True
+        self.last_frame_was_full = True # Exposed for debugging/profiling
+        self.last_dirty_rect_count = 0
+
+    def invalidate(self):
+        """Forces the background to be rebuilt and the next frame to be fully redrawn."""
+        self.background = None
+        self.force_full_redraw = True
+
+    def _build_background(self, city: 'City', weather: 'Weather', camera: Optional['Camera'], key: tuple):
+        """Renders the static city layer visible through the camera into the cached background surface."""
+        if self.background is None:
+            self.background = pygame.Surface(self.screen_rect.size).convert()
+        self.background.fill(weather.get_current_color())
+        city.draw(self.background, camera)
+        self._background_key = key
+        logging.debug("DirtyRectRenderer: background rebuilt.")
+
+    def _get_ui_rects(self, ui_manager: 'UIManager') -> List[pygame.Rect]:
+        """Returns the rects of all visible UI elements that actually draw something."""
+        rects = []
+        for element in ui_manager.get_sprite_group().sprites():
+            image = getattr(element, 'image', None)
+            if not getattr(element, 'visible', True) or image is None or image.get_width() == 0 or image.get_height() == 0:
+                continue # Skips the root container and hidden elements
+            rects.append(element.rect.copy())
+        return rects
+
+    def render(self, screen: pygame.Surface, city: 'City', sims: List['Sim'], weather: 'Weather', ui_manager: 'UIManager', dt: float, bubble_layer: Optional['BubbleLayer'] = None, camera: Optional['Camera'] = None):
+        """Draws one frame and presents it, updating only the dirty regions where possible."""
+        full_redraw = self.force_full_redraw
+        background_key = (weather.get_current_color(), camera.get_state() if camera else None)
+        if self.background is None or self._background_key != background_key:
+            self._build_background(city, weather, camera, background_key) # Camera moved or weather changed
+            full_redraw = True
+        if weather.effects_active():
+            full_redraw = True # Particles and flashes touch the whole screen
+
+        # --- Collect dirty regions from Sims inside the viewport ---
+        sim_states: Dict[str, Tuple[pygame.Rect, tuple]] = {}
+        visible_sims: List['Sim'] = []
+        dirty: List[pygame.Rect] = []
+        for sim in sims:
+            rect = sim.get_draw_rect(camera)
+            if not rect.colliderect(self.screen_rect):
+                continue # Culled: off screen
+            visible_sims.append(sim)
+            state = sim.get_draw_state()
+            sim_states[sim.sim_id] = (rect, state)
+            previous = self._sim_states.get(sim.sim_id)
+            if previous is None:
+                dirty.append(rect)
+            elif previous[1] != state:
+                dirty.append(previous[0]) # Erase where it was
+                dirty.append(rect) # Draw where it is now
+        for sim_id, (rect, _) in self._sim_states.items():
+            if sim_id not in sim_states:
+                dirty.append(rect) # Sim was removed or left the viewport
+
+        # --- UI elements and bubbles are redrawn every frame (labels change text, bubbles move) ---
+        ui_rects = self._get_ui_rects(ui_manager)
+        if bubble_layer:
+            ui_rects.extend(bubble_layer.get_rects())
+        dirty.extend(self._ui_rects)
+        dirty.extend(ui_rects)
+
+        if not full_redraw:
+            dirty = merge_rects(rect.clip(self.screen_rect) for rect in dirty)
+            dirty_area = sum(rect.width * rect.height for rect in dirty)
+            screen_area = self.screen_rect.width * self.screen_rect.height
+            if len(dirty) > MAX_DIRTY_RECTS or dirty_area > MAX_DIRTY_AREA_FRACTION * screen_area:
+                full_redraw = True
+
+        if full_redraw:
+            screen.blit(self.background, (0, 0))
+            for sim in visible_sims:
+                sim.draw(screen, dt, sims, camera)
+            weather.draw_effects(screen)
+            if bubble_layer:
+                bubble_layer.draw(screen)
+            ui_manager.draw_ui(screen)
+            pygame.display.flip()
+            self.last_dirty_rect_count = 1
+        else:
+            for rect in dirty:
+                screen.set_clip(rect)
+                screen.blit(self.background, rect, area=rect)
+                for sim in visible_sims:
+                    if sim_states[sim.sim_id][0].colliderect(rect):
+                        sim.draw(screen, dt, sims, camera)
+                weather.draw_effects(screen) # Only the static tint is left when effects are inactive
+            screen.set_clip(None)
+            # Every bubble and UI rect is in the dirty list, so nothing is drawn twice
+            if bubble_layer:
+                bubble_layer.draw(screen)
+            ui_manager.draw_ui(screen)
+            if dirty:
+                pygame.display.update(dirty)
+            self.last_dirty_rect_count = len(dirty)
+
+        self._sim_states = sim_states
+        self._ui_rects = ui_rects
+        self.force_full_redraw = False
+        self.last_frame_was_full = full_redraw
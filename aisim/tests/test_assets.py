@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+import unittest
+import pygame
+from aisim.src.core.assets import AssetBundle, build_asset_bundle
+
+
+class TestAssetBundle(unittest.TestCase):
+
+    def setUp(self):
+        pygame.init()
+        pygame.display.set_mode((1, 1))
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.tileset = os.path.join(root, 'tiles.png')
+        self.character_dir = os.path.join(root, 'characters')
+        os.makedirs(self.character_dir)
+        tiles = pygame.Surface((64, 32), pygame.SRCALPHA)
+        tiles.fill((10, 200, 30, 255))
+        tiles.fill((0, 0, 0, 0), pygame.Rect(32, 0, 32, 32))
+        pygame.image.save(tiles, self.tileset)
+        pygame.image.save(pygame.Surface((96, 128)), os.path.join(self.character_dir, 'Jane_Doe.png'))
+        self.sprite_defs = os.path.join(root, 'sprites.json')
+        self.grass_defs = os.path.join(root, 'grass.json')
+        with open(self.sprite_defs, 'w') as f:
+            json.dump([{"name": "barrel", "source_file": self.tileset, "x": 32, "y": 0, "width": 32, "height": 32}], f)
+        with open(self.grass_defs, 'w') as f:
+            json.dump([{"name": "grass_plain_1", "source_file": self.tileset, "x": 0, "y": 0, "width": 32, "height": 32}], f)
+        self.bundle_path = os.path.join(root, 'assets.bundle')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        pygame.quit()
+
+    def test_round_trip(self):
+        self.assertEqual(build_asset_bundle(self.bundle_path, self.sprite_defs, self.grass_defs, self.character_dir), 2)
+        bundle = AssetBundle(self.bundle_path)
+        self.assertTrue(bundle.is_current())
+        self.assertEqual([s['name'] for s in bundle.grass_sprite_definitions], ['grass_plain_1'])
+        self.assertEqual(bundle.characters, ['Jane_Doe'])
+        tiles = bundle.get_image(self.tileset)
+        self.assertEqual(tiles.get_size(), (64, 32))
+        self.assertEqual(tuple(tiles.get_at((5, 5))), (10, 200, 30, 255))
+        self.assertEqual(tiles.get_at((40, 5)).a, 0)
+        self.assertEqual(bundle.get_image('character:Jane_Doe').get_size(), (96, 128))
+
+    def test_stale_after_source_change(self):
+        build_asset_bundle(self.bundle_path, self.sprite_defs, self.grass_defs, self.character_dir)
+        pygame.image.save(pygame.Surface((96, 128)), os.path.join(self.character_dir, 'John_Doe.png'))
+        self.assertFalse(AssetBundle(self.bundle_path).is_current())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from types import SimpleNamespace
+import pygame
+from aisim.src.ui.bubble import BubbleLayer, POOL_BUCKET
+
+
+def _sim(sim_id, message, sprite_rect):
+    """Minimal stand-in exposing what BubbleLayer reads from a Sim."""
+    return SimpleNamespace(
+        sim_id=sim_id,
+        full_name=sim_id,
+        conversation=SimpleNamespace(message=message, message_timer=1.0),
+        get_draw_rect=lambda camera=None: sprite_rect,
+    )
+
+
+class TestBubbleLayer(unittest.TestCase):
+
+    def setUp(self):
+        pygame.init()
+        self.layer = BubbleLayer()
+
+    def test_bubbles_sit_above_their_sprites(self):
+        first = _sim('a', "Hello there", pygame.Rect(100, 200, 32, 32))
+        second = _sim('b', "Hi", pygame.Rect(400, 50, 32, 32))
+        self.layer.update([first, second])
+        rects = self.layer.get_rects()
+        self.assertEqual(len(rects), 2)
+        for rect, sprite_rect in zip(rects, ((100, 200, 32, 32), (400, 50, 32, 32))):
+            sprite_rect = pygame.Rect(sprite_rect)
+            self.assertEqual(rect.midbottom, (sprite_rect.centerx, sprite_rect.top - 5))
+
+        # Moving the sprite moves the cached bubble without re-rendering it
+        surface = self.layer._bubbles['a'][1]
+        first.get_draw_rect = lambda camera=None: pygame.Rect(10, 300, 32, 32)
+        self.layer.update([first, second])
+        self.assertIs(self.layer._bubbles['a'][1], surface)
+        self.assertEqual(self.layer._bubbles['a'][2].midbottom, (26, 295))
+
+    def test_surfaces_are_reused_from_the_pool(self):
+        sim = _sim('a', "Hello there", pygame.Rect(100, 200, 32, 32))
+        self.layer.update([sim])
+        surface = self.layer._bubbles['a'][1]
+        self.assertEqual(surface.get_width() % POOL_BUCKET, 0)
+        self.assertEqual(surface.get_height() % POOL_BUCKET, 0)
+
+        # A new message of similar size takes the released surface back out of the pool
+        sim.conversation.message = "Hello where"
+        self.layer.update([sim])
+        self.assertIs(self.layer._bubbles['a'][1], surface)
+
+        # An expired message returns its surface to the pool and the next bubble picks it up
+        sim.conversation.message_timer = 0
+        self.layer.update([sim])
+        self.assertEqual(self.layer.get_rects(), [])
+        self.assertIn(surface, self.layer._surface_pool[surface.get_size()])
+        other = _sim('b', "Hello there", pygame.Rect(0, 100, 32, 32))
+        self.layer.update([other])
+        self.assertIs(self.layer._bubbles['b'][1], surface)
+        self.assertEqual(self.layer._surface_pool[surface.get_size()], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from aisim.src.ui.camera import Camera, ZOOM_LEVELS
+
+
+class TestCamera(unittest.TestCase):
+
+    def setUp(self):
+        self.camera = Camera(800, 600, 2048, 1536)
+
+    def test_screen_and_world_round_trip(self):
+        self.camera.pan(123, 45)
+        for zoom_steps in (0, 1, -2):
+            self.camera.zoom_by(zoom_steps)
+            for world in ((700.0, 500.0), (1024.5, 768.25)):
+                screen = self.camera.world_to_screen(*world)
+                back = self.camera.screen_to_world(*screen)
+                # Screen coordinates are whole pixels, so the round trip is exact to within one screen pixel
+                self.assertLess(abs(back[0] - world[0]), 1 / self.camera.zoom)
+                self.assertLess(abs(back[1] - world[1]), 1 / self.camera.zoom)
+            self.assertEqual(self.camera.screen_to_world(0, 0), (self.camera.x, self.camera.y))
+
+    def test_view_is_kept_inside_the_world(self):
+        camera = self.camera
+        camera.pan(-10000, -10000)
+        self.assertEqual((camera.x, camera.y), (0.0, 0.0))
+        camera.pan(10000, 10000)
+        self.assertEqual((camera.x, camera.y), (2048 - 800, 1536 - 600))
+        camera.center_on(2048, 0)
+        self.assertEqual((camera.x, camera.y), (2048 - 800, 0.0))
+        self.assertEqual(camera.get_visible_tile_range(32, 64, 48), (39, 0, 64, 19))
+
+    def test_small_worlds_are_centered(self):
+        camera = Camera(800, 600, 400, 300)
+        camera.pan(500, -500)
+        self.assertEqual((camera.x, camera.y), (-200.0, -150.0))
+        self.assertEqual(camera.get_visible_tile_range(32, 13, 10), (0, 0, 13, 10))
+
+    def test_zoom_keeps_the_point_under_the_cursor(self):
+        camera = self.camera
+        anchor = camera.screen_to_world(200, 150)
+        camera.zoom_by(1, (200, 150))
+        self.assertEqual(camera.zoom, 1.5)
+        self.assertEqual(camera.screen_to_world(200, 150), anchor)
+        camera.zoom_by(10)
+        self.assertEqual(camera.zoom, ZOOM_LEVELS[-1])
+        camera.zoom_by(-10)
+        self.assertEqual(camera.zoom, ZOOM_LEVELS[0]) # The whole 1600x1200 view still fits the world
+        self.assertEqual((camera.view_width, camera.view_height), (1600.0, 1200.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+from aisim.src.core.chunks import ChunkManager
+from aisim.tests.test_mapgen import _load_table
+
+
+class TestChunkManager(unittest.TestCase):
+
+    def setUp(self):
+        self.table, self.grass_ids = _load_table()
+
+    def _manager(self, **kwargs):
+        return ChunkManager(self.table, self.grass_ids, 100, 70, seed=5, chunk_size=16, **kwargs)
+
+    def test_chunks_are_deterministic_after_eviction(self):
+        manager = self._manager(max_loaded_chunks=2)
+        first = manager.get_block(0, 0, 20, 20)
+        self.assertLessEqual(len(manager.loaded_chunks()), 2)
+        manager.get_block(50, 50, 70, 100) # Evicts the first chunks
+        self.assertFalse(manager.is_loaded(0, 0))
+        np.testing.assert_array_equal(manager.get_block(0, 0, 20, 20), first)
+        np.testing.assert_array_equal(self._manager().get_block(0, 0, 20, 20), first)
+
+    def test_block_clamps_to_grid(self):
+        manager = self._manager()
+        self.assertEqual(manager.get_block(60, 90, 80, 110).shape, (10, 10))
+        self.assertEqual(manager.chunk_bounds(6, 4), (96, 64, 100, 70))
+
+    def test_edited_chunks_are_kept(self):
+        evicted = []
+        manager = self._manager(max_loaded_chunks=1)
+        block = manager.get_block(10, 10, 20, 20)
+        block[:] = self.grass_ids[0]
+        manager.set_block(10, 10, block) # Spans chunks (0, 0), (1, 0), (0, 1), (1, 1)
+        manager.on_evict = lambda col, row: evicted.append((col, row))
+        manager.get_block(60, 90, 70, 100)
+        self.assertNotIn((0, 0), evicted)
+        self.assertTrue(manager.is_loaded(1, 1))
+        self.assertTrue((manager.get_block(10, 10, 20, 20) == self.grass_ids[0]).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+from aisim.src.core.congestion import CongestionGrid
+from aisim.src.core.gridsearch import grid_astar
+from aisim.src.core.mapgen import MapGenerator
+from aisim.src.core.navigation import Navigation
+from aisim.tests.test_mapgen import _load_table
+
+
+class TestCongestionGrid(unittest.TestCase):
+
+    def test_density_decays_by_half_life(self):
+        grid = CongestionGrid((4, 5), half_life=2.0)
+        grid.enter((3, 1))
+        grid.enter((3, 1))
+        self.assertAlmostEqual(float(grid.density()[1, 3]), 2.0)
+        grid.decay(2.0)
+        self.assertAlmostEqual(float(grid.density()[1, 3]), 1.0, places=5)
+        for _ in range(20): # Long enough to fold the scale back into the counts
+            grid.decay(2.0)
+        grid.enter((0, 0))
+        self.assertAlmostEqual(float(grid.density()[0, 0]), 1.0, places=5)
+        self.assertLess(float(grid.density()[1, 3]), 1e-5)
+
+    def test_penalty_is_capped_and_rounded(self):
+        grid = CongestionGrid((2, 2), weight=0.3, max_penalty=1.0)
+        for _ in range(10):
+            grid.enter((1, 1))
+        grid.enter((0, 0))
+        penalty = grid.penalty()
+        self.assertEqual(float(penalty[1, 1]), 1.0)
+        self.assertEqual(float(penalty[0, 0]), 0.25) # 0.3 rounded to a quarter
+        self.assertEqual(float(penalty[0, 1]), 0.0)
+
+
+class TestCongestionCosts(unittest.TestCase):
+
+    def test_penalty_raises_costs_and_diverts_searches(self):
+        table, grass_ids = _load_table()
+        tile_map = MapGenerator(table, grass_ids, 30, 20, seed=3).generate()
+        navigation = Navigation(tile_map, table, 32, planner='hpa', cluster_size=8)
+        field = navigation.field('path')
+        penalty = np.zeros(tile_map.shape, dtype=np.float32)
+        penalty[5, 10] = 2.0
+        changed = navigation.set_penalty(penalty)
+        walkable = bool(np.isfinite(navigation.terrain[5, 10]))
+        self.assertEqual(changed, [(10, 5)] if walkable else [])
+        if walkable:
+            self.assertAlmostEqual(float(navigation.costs[5, 10]), 3 * float(navigation.terrain[5, 10]))
+        self.assertEqual(navigation.set_penalty(penalty), []) # Unchanged
+        self.assertEqual(navigation.hpa.costs[5 * 30 + 10], float(navigation.costs[5, 10])) # Planners see the new costs
+        self.assertIs(navigation.field('path'), field) # Shared fields keep the terrain costs, so they are not recomputed
+
+    def test_searches_detour_around_crowds(self):
+        costs = np.ones((3, 5), dtype=np.float32)
+        self.assertIn(7, grid_astar(costs.ravel().tolist(), 5, 3, 5, 9)) # Straight through the middle row
+        grid = CongestionGrid((3, 5), weight=1.0, max_penalty=2.0)
+        for col in range(1, 4):
+            grid.enter((col, 1))
+            grid.enter((col, 1))
+        crowded = costs * (1 + grid.penalty())
+        self.assertNotIn(7, grid_astar(crowded.ravel().tolist(), 5, 3, 5, 9))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -65,19 +65,21 @@ class TestConversation(unittest.TestCase):
         # Set up interaction
         sim1.is_interacting = True
         sim2.is_interacting = True
-        sim1.conversation_partner_id = "sim2"
-        sim2.conversation_partner_id = "sim1"
+        sim1.conversation.partner_id = "sim2"
+        sim2.conversation.partner_id = "sim1"
         all_sims = [sim1, sim2]
+        city.registry.add(sim1)
+        city.registry.add(sim2)
 
         # Call handle_ollama_response for sim1
         # Pass sim1 as the first argument (representing 'self')
         handle_ollama_response(sim1, "Test response", all_sims, city)
 
         # Assertions
-        self.assertEqual(sim1.conversation_message, "Test response")
-        self.assertEqual(sim2.conversation_history[-1]['line'], "Test response")
-        self.assertFalse(sim1.is_my_turn_to_speak)
-        self.assertTrue(sim2.is_my_turn_to_speak)
+        self.assertEqual(sim1.conversation.message, "Test response")
+        self.assertEqual(sim2.conversation.history[-1]['line'], "Test response")
+        self.assertFalse(sim1.conversation.is_my_turn_to_speak)
+        self.assertTrue(sim2.conversation.is_my_turn_to_speak)
 
     @patch('aisim.src.core.city.City._create_tile_map')
     @patch('aisim.src.core.sim.Sim._load_sprite_sheet')
@@ -118,15 +120,17 @@ class TestConversation(unittest.TestCase):
 
         # Set up interaction (Note: _initiate_conversation will set these)
         all_sims = [sim1, sim2]
+        city.registry.add(sim1)
+        city.registry.add(sim2)
         # Let sim1 speak first in this test scenario
-        sim1.is_my_turn_to_speak = True
-        sim2.is_my_turn_to_speak = False
+        sim1.conversation.is_my_turn_to_speak = True
+        sim2.conversation.is_my_turn_to_speak = False
 
         # Call initiate_conversation and send_conversation_request from interaction module
         initiate_conversation(sim1, sim2, city, all_sims, time.time())
 
         # Determine who the first speaker was for assertion purposes later
-        if sim1.is_my_turn_to_speak:
+        if sim1.conversation.is_my_turn_to_speak:
              first_speaker = sim1
              second_speaker_listener = sim2
         else:
@@ -167,14 +171,14 @@ class TestConversation(unittest.TestCase):
              logging.warning(f"Test Warning: Timed out waiting for response from {first_speaker.sim_id}")
 
         # Assertions (Check the speaker who sent the request)
-        self.assertIsNotNone(first_speaker.conversation_message, "Conversation message should not be None after response")
-        self.assertGreater(len(first_speaker.conversation_message), 0, "Conversation message should not be empty after response")
-        logging.info(f"Sim {first_speaker.sim_id} conversation message: {first_speaker.conversation_message}")
+        self.assertIsNotNone(first_speaker.conversation.message, "Conversation message should not be None after response")
+        self.assertGreater(len(first_speaker.conversation.message), 0, "Conversation message should not be empty after response")
+        logging.info(f"Sim {first_speaker.sim_id} conversation message: {first_speaker.conversation.message}")
 
         # Assertions (Check the listener who should receive the response next turn)
-        self.assertIsNotNone(second_speaker_listener.conversation_history[-1]['line'], "Conversation history should not be None after response")
-        self.assertGreater(len(second_speaker_listener.conversation_history[-1]['line']), 0, "Conversation history should not be empty after response")
-        logging.info(f"Sim {second_speaker_listener.sim_id} conversation history: {second_speaker_listener.conversation_history}")
+        self.assertIsNotNone(second_speaker_listener.conversation.history[-1]['line'], "Conversation history should not be None after response")
+        self.assertGreater(len(second_speaker_listener.conversation.history[-1]['line']), 0, "Conversation history should not be empty after response")
+        logging.info(f"Sim {second_speaker_listener.sim_id} conversation history: {second_speaker_listener.conversation.history}")
 
 
 if __name__ == '__main__':
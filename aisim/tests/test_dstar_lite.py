@@ -0,0 +1,63 @@
+import unittest
+import numpy as np
+from aisim.src.core.dstar_lite import DStarLite
+from aisim.src.core.navigation import FlowField
+
+
+def _cost(path, costs):
+    """Length of a tile path with per-tile entry costs (diagonal steps 1.4)."""
+    return sum((1.4 if a[0] != b[0] and a[1] != b[1] else 1.0) * float(costs[b[1], b[0]]) for a, b in zip(path, path[1:]))
+
+
+def _optimal(costs, start, goal):
+    goals = np.zeros(costs.shape, dtype=bool)
+    goals[goal[1], goal[0]] = True
+    return float(FlowField(costs, goals).distance[start[1], start[0]])
+
+
+class TestDStarLite(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.costs = np.where(rng.random((20, 24)) < 0.2, np.inf, 1.0).astype(np.float32)
+        self.costs[0, 0] = self.costs[19, 23] = 1.0
+        self.costs[:, 12] = np.inf
+        self.costs[10, 12] = 1.0 # One gap in the wall
+
+    def test_initial_path_is_optimal(self):
+        planner = DStarLite(self.costs, (0, 0), (23, 19))
+        path = planner.path()
+        self.assertEqual((path[0], path[-1]), ((0, 0), (23, 19)))
+        self.assertIn((12, 10), path)
+        self.assertAlmostEqual(_cost(path, self.costs), _optimal(self.costs, (0, 0), (23, 19)), places=4)
+
+    def test_repairs_around_blocked_tiles(self):
+        planner = DStarLite(self.costs, (0, 0), (23, 19))
+        path = planner.path()
+        start = path[3]
+        planner.move_start(start)
+        blocked = path[5]
+        planner.set_blocked([blocked])
+        repaired = planner.path()
+        self.assertEqual((repaired[0], repaired[-1]), (start, (23, 19)))
+        self.assertNotIn(blocked, repaired)
+        expected = self.costs.copy()
+        expected[blocked[1], blocked[0]] = np.inf
+        self.assertAlmostEqual(_cost(repaired, self.costs), _optimal(expected, start, (23, 19)), places=4)
+        planner.set_blocked([]) # The other Sim moved on
+        self.assertAlmostEqual(_cost(planner.path(), self.costs), _optimal(self.costs, start, (23, 19)), places=4)
+
+    def test_terrain_edits(self):
+        planner = DStarLite(self.costs, (0, 0), (23, 19))
+        self.costs[10, 12] = np.inf # Close the gap
+        planner.update_cells([(12, 10)])
+        self.assertIsNone(planner.path())
+        self.costs[2, 12] = 1.0 # Open another one
+        planner.update_cells([(12, 2), (12, 10)])
+        path = planner.path()
+        self.assertIn((12, 2), path)
+        self.assertAlmostEqual(_cost(path, self.costs), _optimal(self.costs, (0, 0), (23, 19)), places=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
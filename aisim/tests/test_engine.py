@@ -0,0 +1,113 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import pygame
+from aisim.src.core.city import City, TILE_SIZE
+from aisim.src.core.configuration import config_manager
+from aisim.src.core.engine import SimulationEngine, ThroughputMeter
+from aisim.src.core.population import SimPopulation
+from aisim.src.core.registry import SimRegistry
+from aisim.src.core.sim import Sim
+from aisim.src.core.weather import Weather
+from aisim.tests.test_movement import _city
+from aisim.tests.test_registry import _sims
+
+
+class _Results:
+    """Stands in for OllamaClient and PathPlanner: hands out queued results."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+
+    def check_for_results(self):
+        return self.results.pop(0) if self.results else None
+
+
+def _engine(*results, **kwargs):
+    population = SimPopulation()
+    city = _city()
+    city.registry = SimRegistry()
+    for sim in _sims(population, 2):
+        city.registry.add(sim)
+    city.random_destination = lambda near: near
+    city.city_update = MagicMock()
+    city.pending_romance_analysis = set()
+    return SimulationEngine(city, MagicMock(current_state="Sunny"), _Results(*results), population, 5.0, **kwargs)
+
+
+class TestSimulationEngine(unittest.TestCase):
+
+    def test_step_advances_the_world_and_applies_results(self):
+        engine = _engine({'type': 'romance_analysis', 'sim1_id': "sim0", 'sim2_id': "sim1", 'data': "INCREASE"})
+        city, weather = engine.city, engine.weather
+        a, b = city.registry.sims
+        city.pending_romance_analysis.add(("sim0", "sim1"))
+        engine.step(0.5)
+        engine.step(0.5)
+        self.assertEqual((engine.current_time, engine.ticks), (1.0, 2))
+        weather.weather_update.assert_called_with(0.5)
+        city.city_update.assert_called_with(0.5)
+        step = config_manager.get_entry('simulation.romance_change_step', 0.05)
+        self.assertAlmostEqual(a.relationships["sim1"]["romance"], step)
+        self.assertAlmostEqual(b.relationships["sim0"]["romance"], step)
+        self.assertEqual(city.pending_romance_analysis, set())
+
+    def test_advance_runs_fixed_steps_within_the_budget(self):
+        engine = _engine(step_seconds=0.1, max_steps=5)
+        with patch.object(engine, 'step', wraps=engine.step) as step:
+            self.assertEqual(engine.advance(0.25), 2)
+            self.assertEqual({call.args for call in step.call_args_list}, {(0.1,)})
+        self.assertAlmostEqual(engine.accumulator, 0.05)
+        self.assertAlmostEqual(engine.population.interpolation, 0.5)
+        self.assertEqual(engine.advance(1.0), 5) # 1.05s due, but only 0.5s fit the budget
+        self.assertAlmostEqual(engine.dropped_time, 0.5)
+        self.assertAlmostEqual(engine.accumulator, 0.05)
+        self.assertAlmostEqual(engine.current_time, 0.7)
+
+    def test_run_for_steps_until_the_wall_clock_budget_is_spent(self):
+        engine = _engine(step_seconds=0.1)
+        engine.advance(0.15)
+        with patch('aisim.src.core.engine.time.perf_counter', side_effect=[0.0, 0.01, 0.02, 0.03, 0.04]):
+            self.assertEqual(engine.run_for(0.025), 3)
+        self.assertAlmostEqual(engine.current_time, 0.4)
+        self.assertEqual((engine.accumulator, engine.population.interpolation), (0.0, 1.0))
+
+    def test_throughput_is_measured_per_window(self):
+        with patch('aisim.src.core.engine.time.perf_counter', side_effect=[0.0, 0.5, 2.0, 2.5]):
+            meter = ThroughputMeter(window=1.0)
+            self.assertFalse(meter.update(3.0))
+            self.assertTrue(meter.update(50.0))
+            self.assertFalse(meter.update(60.0))
+        self.assertEqual(meter.rate, 25.0)
+
+    def test_world_is_built_without_a_display(self):
+        pygame.display.quit()
+        with patch.dict(config_manager._config_data['city'], {'cache': {'enabled': False}}):
+            city = City(10 * TILE_SIZE, 10 * TILE_SIZE, load_images=False)
+        try:
+            self.assertEqual(city.source_images, {})
+            self.assertEqual(city.tile_map.shape, (10, 10))
+        finally:
+            city.close()
+        with patch('aisim.src.core.sim.load_or_generate_personality_for_sim'):
+            sim = Sim("sim1", 10, 20, None, {}, SimPopulation(), load_sprite=False)
+        self.assertIsNone(sim.appearance.sprite_sheet)
+        self.assertNotEqual(sim.character_name, "Unknown_Sim")
+        weather = Weather(config_manager, 100, 100, effects=False)
+        weather.current_state = "Rainy"
+        weather.weather_update(1.0)
+        self.assertEqual(weather.raindrops, [])
+        self.assertFalse(pygame.display.get_init())
+
+    def test_closing_a_city_takes_its_sims_out_of_the_population(self):
+        population = SimPopulation()
+        with patch.dict(config_manager._config_data['city'], {'cache': {'enabled': False}}), \
+             patch.dict(config_manager._config_data['navigation'], {'path_workers': 0}):
+            city = City(10 * TILE_SIZE, 10 * TILE_SIZE, load_images=False)
+        for sim in _sims(population, 2):
+            city.registry.add(sim)
+        city.close()
+        self.assertEqual((population.count, population.sims), (0, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import numpy as np
+from aisim.src.core.hpa import HierarchicalPathfinder
+from aisim.src.core.navigation import FlowField
+
+
+def _walk(route):
+    """Refines every leg of a route into one tile list."""
+    tiles = []
+    while not route.done:
+        leg = route.next_leg()
+        if leg is None:
+            return None
+        tiles.extend(leg)
+    return tiles
+
+
+class TestHierarchicalPathfinder(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.costs = np.ones((40, 50), dtype=np.float32)
+        self.costs[rng.random(self.costs.shape) < 0.2] = np.inf
+        self.costs[0, 0] = self.costs[39, 49] = 1.0
+
+    def _assert_valid(self, tiles, start, goal, costs):
+        self.assertEqual((tiles[0], tiles[-1]), (start, goal))
+        for (c0, r0), (c1, r1) in zip(tiles, tiles[1:]):
+            self.assertLessEqual(max(abs(c1 - c0), abs(r1 - r0)), 1)
+            self.assertNotEqual((c0, r0), (c1, r1))
+            self.assertTrue(np.isfinite(costs[r1, c1]))
+
+    def test_route_is_connected_and_near_optimal(self):
+        goals = np.zeros(self.costs.shape, dtype=bool)
+        goals[39, 49] = True
+        optimal = FlowField(self.costs, goals).distance[0, 0]
+        route = HierarchicalPathfinder(self.costs, cluster_size=10).find_route((0, 0), (49, 39))
+        if not np.isfinite(optimal):
+            self.assertIsNone(route)
+            return
+        tiles = _walk(route)
+        self._assert_valid(tiles, (0, 0), (49, 39), self.costs)
+        length = sum(1.4 if c0 != c1 and r0 != r1 else 1.0 for (c0, r0), (c1, r1) in zip(tiles, tiles[1:]))
+        self.assertLess(length, optimal * 1.3) # HPA* trades a little optimality for speed
+
+    def test_same_cluster_and_unreachable(self):
+        costs = np.ones((20, 20), dtype=np.float32)
+        costs[:, 10] = np.inf # Wall on a cluster border
+        pathfinder = HierarchicalPathfinder(costs, cluster_size=10)
+        self._assert_valid(_walk(pathfinder.find_route((1, 1), (8, 8))), (1, 1), (8, 8), costs)
+        self.assertIsNone(pathfinder.find_route((1, 1), (15, 15)))
+        self.assertIsNone(pathfinder.find_route((3, 3), (3, 3)))
+
+    def test_invalidate_rebuilds_touched_clusters(self):
+        costs = np.ones((20, 30), dtype=np.float32)
+        costs[:, 10] = np.inf
+        costs[5, 10] = 1.0 # Single gap
+        pathfinder = HierarchicalPathfinder(costs, cluster_size=10)
+        self.assertIsNotNone(pathfinder.find_route((0, 0), (25, 15)))
+        pathfinder._cluster_paths((2, 1)) # Built, and far from the edit
+        costs[5, 10] = np.inf
+        pathfinder.set_costs(costs, (10, 5, 11, 6))
+        self.assertIsNone(pathfinder.find_route((0, 0), (25, 15)))
+        self.assertIn((2, 1), pathfinder._intra) # Untouched cluster kept
+
+
+if __name__ == '__main__':
+    unittest.main()
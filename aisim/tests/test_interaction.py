@@ -0,0 +1,46 @@
+import unittest
+from unittest.mock import patch
+from aisim.src.core.interaction import check_interactions, IGNORE_INTERACTION_TIME
+from aisim.src.core.population import SimPopulation
+from aisim.src.core.registry import SimRegistry
+from aisim.src.core.sim import update_population
+from aisim.tests.test_movement import _city
+from aisim.tests.test_registry import _sims
+
+
+@patch('aisim.src.core.interaction.ENABLE_TALKING', False)
+class TestInteractionEffects(unittest.TestCase):
+
+    def setUp(self):
+        self.a, self.b = _sims(SimPopulation(), 2)
+        self.a.x, self.a.y = self.b.x + 10, self.b.y # Within interaction distance
+        self.city = _city()
+        self.city.registry = SimRegistry()
+        self.city.registry.add(self.a)
+        self.city.registry.add(self.b)
+
+    def test_effects_apply_when_an_interaction_starts(self):
+        check_interactions(self.a, [self.a, self.b], 100.0, self.city)
+        self.assertAlmostEqual(self.a.relationships["sim1"]["friendship"], 0.01)
+        self.assertEqual(len(self.b.memory), 1)
+
+    def test_nearby_sims_that_cannot_interact_are_left_alone(self):
+        self.b.is_interacting = True
+        for _ in range(10):
+            check_interactions(self.a, [self.a, self.b], 100.0, self.city)
+        self.assertEqual(self.a.relationships["sim1"], {"friendship": 0.0, "romance": 0.0}) # Met, but no effects
+        self.assertEqual((self.a.memory, self.a.mood), ([], 0.0))
+
+    def test_population_update_checks_only_pairs_free_to_interact(self):
+        self.city.random_destination = lambda near: near
+        self.b.last_interaction_time = 99.0 # Too recent to interact again
+        update_population(self.a._population, 0.01, self.city, "Sunny", 100.0, 5.0)
+        self.assertEqual(self.a.relationships["sim1"], {"friendship": 0.0, "romance": 0.0})
+        self.assertEqual(self.b.relationships["sim0"], {"friendship": 0.0, "romance": 0.0})
+        update_population(self.a._population, 0.01, self.city, "Sunny", 100.0 + IGNORE_INTERACTION_TIME, 5.0)
+        self.assertGreater(self.a.relationships["sim1"]["friendship"], 0.0)
+        self.assertGreater(self.b.relationships["sim0"]["friendship"], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
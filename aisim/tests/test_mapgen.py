@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from aisim.src.core.mapgen import MapGenerator, summed_area_table, window_sums, build_path_lut, autotile_paths
+from aisim.src.core.city import City, TILE_SIZE
+from aisim.src.core.configuration import config_manager
+from aisim.src.core.map_cache import map_cache_key, map_cache_path, load_map_cache, save_map_cache, pinned_seed, SEED_FILE
+from aisim.src.core.tiles import SpriteTable, COVERED_ID, TILE_GRASS, TILE_PATH, TILE_PROP
+
+
+def _load_table():
+    with open('aisim/config/sprite_definitions.json') as f:
+        definitions = [s for s in json.load(f) if not s.get('name', '').startswith('grass_')]
+    with open('aisim/config/sprite_grass.json') as f:
+        grass = json.load(f)
+    table = SpriteTable(definitions + grass, 32)
+    return table, [table.get_id(s['name']) for s in grass]
+
+
+class TestMapGenerator(unittest.TestCase):
+
+    def setUp(self):
+        self.table, self.grass_ids = _load_table()
+
+    def test_window_sums(self):
+        mask = np.random.default_rng(1).random((7, 9)) < 0.3
+        sums = window_sums(summed_area_table(mask), 2, 3)
+        self.assertEqual(sums.shape, (6, 7))
+        for r in range(6):
+            for c in range(7):
+                self.assertEqual(sums[r, c], mask[r:r + 2, c:c + 3].sum())
+
+    def test_same_seed_same_map(self):
+        first = MapGenerator(self.table, self.grass_ids, 40, 30, seed=7).generate()
+        second = MapGenerator(self.table, self.grass_ids, 40, 30, seed=7).generate()
+        other = MapGenerator(self.table, self.grass_ids, 40, 30, seed=8).generate()
+        np.testing.assert_array_equal(first, second)
+        self.assertFalse(np.array_equal(first, other))
+
+    def test_props_do_not_overlap(self):
+        tile_map = MapGenerator(self.table, self.grass_ids, 50, 40, seed=3).generate(num_props=200)
+        self.assertTrue(self.table.mask(tile_map, TILE_PATH).any())
+        # Every covered cell belongs to exactly one multi-tile sprite (path sprites fill a single cell)
+        owners = self.table.mask(tile_map, TILE_PATH).astype(np.int32)
+        for r, c in zip(*np.nonzero((tile_map != COVERED_ID) & ~self.table.mask(tile_map, TILE_PATH))):
+            sprite_id = tile_map[r, c]
+            owners[r:r + self.table.span_h[sprite_id], c:c + self.table.span_w[sprite_id]] += 1
+        self.assertEqual(owners.max(), 1)
+        self.assertEqual(owners.min(), 1)
+        self.assertTrue(self.table.mask(tile_map, TILE_PROP).any())
+        self.assertTrue(self.table.mask(tile_map, TILE_GRASS).any())
+
+    def test_autotile_region_matches_full_pass(self):
+        lut = build_path_lut(self.table, self.grass_ids[0])
+        tile_map = np.full((6, 8), self.grass_ids[0], dtype=np.uint16)
+        tile_map[2, 1:6] = lut[15] # Horizontal path
+        autotile_paths(tile_map, self.table, lut)
+        self.assertEqual(self.table.get_name(tile_map[2, 1]), 'path_dirt_h_end')
+        self.assertEqual(self.table.get_name(tile_map[2, 3]), 'path_dirt_h_straight')
+
+        # Branch south from (2, 3) and only retile around the edit
+        tile_map[3, 3] = lut[15]
+        autotile_paths(tile_map, self.table, lut, 3, 3, 4, 4)
+        self.assertEqual(self.table.get_name(tile_map[2, 3]), 'path_dirt_t_sew')
+        self.assertEqual(self.table.get_name(tile_map[3, 3]), 'path_dirt_v_end')
+        expected = tile_map.copy()
+        autotile_paths(expected, self.table, lut)
+        np.testing.assert_array_equal(tile_map, expected)
+
+
+class TestMapCache(unittest.TestCase):
+
+    def test_key_depends_on_inputs(self):
+        sprites = [{"name": "grass_plain_1", "width": 32}]
+        generation = {"num_paths": 3}
+        key = map_cache_key(1, 10, 10, sprites, generation)
+        self.assertEqual(key, map_cache_key(1, 10, 10, [dict(sprites[0])], dict(generation)))
+        self.assertNotEqual(key, map_cache_key(2, 10, 10, sprites, generation))
+        self.assertNotEqual(key, map_cache_key(1, 10, 11, sprites, generation))
+        self.assertNotEqual(key, map_cache_key(1, 10, 10, [{"name": "grass_plain_1", "width": 64}], generation))
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path = map_cache_path(cache_dir, "abc")
+            self.assertIsNone(load_map_cache(path))
+            tile_map = np.arange(12, dtype=np.uint16).reshape(3, 4)
+            save_map_cache(path, {"tile_map": tile_map})
+            np.testing.assert_array_equal(load_map_cache(path)["tile_map"], tile_map)
+            self.assertEqual(os.listdir(cache_dir), [os.path.basename(path)])
+
+    def test_seed_is_pinned_on_first_use(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            seed = pinned_seed(cache_dir)
+            self.assertEqual(pinned_seed(cache_dir), seed)
+            os.remove(os.path.join(cache_dir, SEED_FILE))
+            with patch('aisim.src.core.map_cache.random.randrange', return_value=seed + 1):
+                self.assertEqual(pinned_seed(cache_dir), seed + 1)
+
+    def test_city_reuses_cached_map_and_derived_layers(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            city_config = dict(config_manager._config_data['city'], cache={'enabled': True, 'dir': cache_dir, 'pin_seed': True})
+            city_config['generation'] = dict(city_config['generation'], seed=None)
+            with patch.dict(config_manager._config_data, {'city': city_config}), \
+                 patch.dict(config_manager._config_data['navigation'], {'path_workers': 0}):
+                first = City(20 * TILE_SIZE, 15 * TILE_SIZE, load_images=False)
+                layers = load_map_cache(first.map_cache_path)
+                self.assertEqual(set(layers), {'tile_map', 'terrain_costs', 'components', 'path_cost'})
+                with patch('aisim.src.core.navigation.label_components') as label, \
+                     patch('aisim.src.core.city.save_map_cache') as save:
+                    second = City(20 * TILE_SIZE, 15 * TILE_SIZE, load_images=False)
+                label.assert_not_called()
+                save.assert_not_called()
+            self.assertEqual(second.seed, first.seed) # Pinned, though none is configured
+            np.testing.assert_array_equal(second.tile_map, first.tile_map)
+            np.testing.assert_array_equal(second.navigation.terrain, first.navigation.terrain)
+            np.testing.assert_array_equal(second.navigation.components, first.navigation.components)
+            self.assertEqual(second.graph.number_of_edges(), first.graph.number_of_edges())
+
+    def test_explicit_seed_bypasses_the_pinned_one(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            city_config = dict(config_manager._config_data['city'], cache={'enabled': True, 'dir': cache_dir, 'pin_seed': True})
+            with patch.dict(config_manager._config_data, {'city': city_config}), \
+                 patch.dict(config_manager._config_data['navigation'], {'path_workers': 0}):
+                city = City(20 * TILE_SIZE, 15 * TILE_SIZE, load_images=False, seed=5)
+            self.assertEqual(city.seed, 5)
+            self.assertFalse(os.path.exists(os.path.join(cache_dir, SEED_FILE)))
+            self.assertTrue(os.path.isfile(city.map_cache_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
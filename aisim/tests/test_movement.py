@@ -0,0 +1,83 @@
+import unittest
+from types import SimpleNamespace
+import networkx as nx
+import numpy as np
+from aisim.src.core import movement
+from aisim.src.core.city import City
+from aisim.src.core.movement import get_path, movement_update, TILE_SIZE
+from aisim.src.core.navigation import path_array
+
+
+def _center(col, row):
+    return (col * TILE_SIZE + TILE_SIZE / 2, row * TILE_SIZE + TILE_SIZE / 2)
+
+
+def _city(grid_width=5, grid_height=5):
+    graph = nx.grid_2d_graph(grid_width, grid_height)
+    for node in graph.nodes:
+        graph.nodes[node]['pos'] = _center(*node)
+    return SimpleNamespace(graph=graph, grid_width=grid_width, grid_height=grid_height, navigation=None,
+                           width=grid_width * TILE_SIZE, height=grid_height * TILE_SIZE, sims=[])
+
+
+def _sim(sim_id, col, row, path=None):
+    x, y = _center(col, row)
+    return SimpleNamespace(sim_id=sim_id, x=x, y=y, speed=50.0, path=path, path_index=0, route=None, target=None,
+                           current_tile=(col, row), is_interacting=False, is_blocked=False, blocked_time=0.0,
+                           sidestepping=False, mood=0.0, previous_angle=0.0, current_direction='front',
+                           previous_direction='front', animation_frame=0, time_since_last_direction_change=0.0)
+
+
+class TestLocalSteering(unittest.TestCase):
+
+    def setUp(self):
+        self.city = _city()
+        self.walker = _sim('a', 1, 2, path=path_array([_center(1, 2), _center(2, 2), _center(3, 2)]))
+        self.walker.path_index = 1
+        self.blocker = _sim('b', 2, 2)
+        self.walker.x += TILE_SIZE / 2 - 1 # At the tile edge, so the next step enters the blocker's tile
+        self.sims = [self.walker, self.blocker]
+        self.city.sims = self.sims
+        self.replans = []
+        self._change_direction = movement.change_direction
+        movement.change_direction = lambda sim, city, frequency: self.replans.append(sim.sim_id)
+
+    def tearDown(self):
+        movement.change_direction = self._change_direction
+
+    def _update(self, dt):
+        movement_update(self.walker, dt, self.city, "Cloudy", self.sims, 0.0, TILE_SIZE, 5.0)
+
+    def test_waits_then_sidesteps_without_replanning(self):
+        self._update(movement.STEER_WAIT_TIME / 2)
+        self.assertTrue(self.walker.is_blocked)
+        self.assertEqual(len(self.walker.path), 3) # Still waiting
+        self._update(movement.STEER_WAIT_TIME / 2)
+        self.assertTrue(self.walker.sidestepping)
+        self.assertEqual(len(self.walker.path), 4)
+        detour = tuple(self.walker.path[self.walker.path_index].tolist())
+        self.assertNotEqual(detour, _center(2, 2))
+        self.assertEqual(self.replans, [])
+
+    def test_replans_after_staying_blocked(self):
+        self.walker.sidestepping = True # The sidestep did not help
+        self.walker.blocked_time = movement.REPLAN_AFTER_BLOCKED - 0.01
+        self._update(0.02)
+        self.assertEqual(self.replans, ['a'])
+        self.assertEqual(self.walker.blocked_time, 0.0)
+
+
+class TestWalkGraphSearch(unittest.TestCase):
+
+    def test_search_routes_around_costly_tiles(self):
+        costs = np.ones((3, 9), dtype=np.float32)
+        costs[1, 1:8] = 5.0 # A crowded corridor on the straight line
+        graph = City._create_grid_graph(SimpleNamespace(grid_width=9, grid_height=3), costs)
+        graph.graph['min_cost'] = 1.0
+        path = get_path(_center(0, 1), _center(8, 1), graph, 9 * TILE_SIZE, 3 * TILE_SIZE)
+        rows = {int(y // TILE_SIZE) for _, y in path[1:-1]}
+        self.assertNotIn(1, rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
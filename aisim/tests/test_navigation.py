@@ -0,0 +1,194 @@
+import random
+import unittest
+from unittest.mock import patch
+import numpy as np
+from aisim.src.core.gridsearch import grid_astar
+from aisim.src.core.mapgen import MapGenerator, build_path_lut, autotile_paths
+from aisim.src.core.navigation import FlowField, Navigation, footprint_flags, dilate, line_tiles, smooth_tiles, label_components
+from aisim.src.core.tiles import TILE_GRASS, TILE_WATER, TILE_PROP, TILE_PATH
+from aisim.tests.test_mapgen import _load_table
+
+
+class TestFlowField(unittest.TestCase):
+
+    def test_distances_and_steps(self):
+        costs = np.ones((5, 6), dtype=np.float32)
+        goals = np.zeros((5, 6), dtype=bool)
+        goals[2, 5] = True
+        field = FlowField(costs, goals)
+        self.assertEqual(field.distance[2, 5], 0)
+        self.assertAlmostEqual(float(field.distance[2, 0]), 5.0)
+        self.assertAlmostEqual(float(field.distance[0, 3]), 2.8, places=5) # Two diagonal steps
+        tiles = field.tiles_from(0, 2)
+        self.assertEqual((tiles[0], tiles[-1], len(tiles)), ((0, 2), (5, 2), 6))
+        self.assertIsNone(field.next_step(5, 2))
+
+    def test_blocked_cells_are_avoided(self):
+        costs = np.ones((3, 5), dtype=np.float32)
+        costs[:, 2] = np.inf # A wall splits the grid
+        goals = np.zeros((3, 5), dtype=bool)
+        goals[1, 4] = True
+        field = FlowField(costs, goals)
+        self.assertFalse(field.reachable(0, 1))
+        self.assertIsNone(field.tiles_from(0, 1))
+        self.assertTrue(field.reachable(3, 0))
+
+    def test_dilate(self):
+        mask = np.zeros((5, 5), dtype=bool)
+        mask[2, 2] = True
+        self.assertEqual(int(dilate(mask).sum()), 9)
+
+
+class TestComponents(unittest.TestCase):
+
+    def test_labels_join_diagonal_neighbours(self):
+        walkable = np.array([[1, 1, 0, 0, 1],
+                             [0, 0, 1, 0, 1],
+                             [1, 0, 0, 0, 0],
+                             [1, 1, 0, 1, 1]], dtype=bool)
+        labels, count = label_components(walkable)
+        self.assertEqual(count, 4)
+        self.assertEqual(labels[1, 2], labels[0, 1]) # Touches diagonally
+        self.assertNotEqual(labels[0, 4], labels[0, 1])
+        self.assertNotEqual(labels[3, 3], labels[3, 1])
+        self.assertTrue(((labels == 0) == ~walkable).all())
+
+
+class TestPathSmoothing(unittest.TestCase):
+
+    def test_line_tiles(self):
+        self.assertEqual(line_tiles(0, 0, 3, 0), [(0, 0), (1, 0), (2, 0), (3, 0)])
+        self.assertEqual(line_tiles(0, 0, 1, 1), [(0, 0), (1, 0), (0, 1), (1, 1)]) # Both tiles beside the corner
+        tiles = line_tiles(0, 0, 4, 1)
+        self.assertEqual((tiles[0], tiles[-1]), ((0, 0), (4, 1)))
+        self.assertTrue(all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 for a, b in zip(tiles, tiles[1:])))
+
+    def test_smoothing_keeps_corners_around_obstacles(self):
+        costs = np.ones((5, 5), dtype=np.float32)
+        self.assertEqual(smooth_tiles([(0, 0), (1, 0), (2, 0), (3, 1), (4, 2)], costs), [(0, 0), (4, 2)])
+        costs[0:3, 2] = np.inf # Wall the path goes around
+        path = [(0, 0), (1, 1), (1, 2), (1, 3), (2, 3), (3, 3), (3, 2), (3, 1), (3, 0)]
+        smoothed = smooth_tiles(path, costs)
+        self.assertLess(len(smoothed), len(path))
+        self.assertEqual((smoothed[0], smoothed[-1]), ((0, 0), (3, 0)))
+        for (c0, r0), (c1, r1) in zip(smoothed, smoothed[1:]):
+            self.assertTrue(all(np.isfinite(costs[r, c]) for c, r in line_tiles(c0, r0, c1, r1)))
+
+    def test_smoothed_shortcuts_stay_within_the_run_costs(self):
+        rng = np.random.default_rng(4)
+        costs = np.where(rng.random((40, 40)) < 0.25, np.inf, rng.choice([0.8, 1.0, 2.0], (40, 40))).astype(np.float32)
+        flat = costs.ravel().tolist()
+        checked = 0
+        for _ in range(30):
+            start, goal = rng.integers(0, 1600, 2).tolist()
+            cells = grid_astar(flat, 40, 40, start, goal)
+            if not cells:
+                continue
+            path = [(cell % 40, cell // 40) for cell in cells]
+            smoothed = smooth_tiles(path, costs)
+            self.assertEqual((smoothed[0], smoothed[-1]), (path[0], path[-1]))
+            indices = [path.index(corner) for corner in smoothed]
+            self.assertEqual(indices, sorted(indices)) # Corners are tiles of the path, in order
+            for a, b in zip(indices, indices[1:]):
+                if b - a == 1:
+                    continue # Steps of the path itself are kept as they are
+                ceiling = max(costs[r, c] for c, r in path[a:b + 1])
+                (c0, r0), (c1, r1) = path[a], path[b]
+                self.assertTrue(all(costs[r, c] <= ceiling for c, r in line_tiles(c0, r0, c1, r1)))
+            checked += 1
+        self.assertGreater(checked, 5)
+
+
+class TestNavigation(unittest.TestCase):
+
+    def setUp(self):
+        self.table, grass_ids = _load_table()
+        self.tile_map = MapGenerator(self.table, grass_ids, 40, 30, seed=3).generate()
+
+    def test_footprints_cover_props_and_pond(self):
+        flags = footprint_flags(self.tile_map, self.table)
+        pond_id = self.table.get_id('water_pond_large')
+        pond_cells = int(self.table.span_w[pond_id] * self.table.span_h[pond_id])
+        self.assertGreaterEqual(int(((flags & TILE_WATER) != 0).sum()), pond_cells)
+        self.assertGreater(int(((flags & TILE_PROP) != 0).sum()), int(self.table.mask(self.tile_map, TILE_PROP).sum()))
+
+    def test_routes_end_on_a_goal(self):
+        navigation = Navigation(self.tile_map, self.table, 32)
+        self.assertEqual(sorted(navigation.poi_names()), ['path', 'pond', 'props'])
+        for name in navigation.poi_names():
+            route = navigation.route((5, 5), name)
+            if route is None:
+                continue # Already standing on a goal
+            col, row = int(route[-1][0] // 32), int(route[-1][1] // 32)
+            self.assertTrue(navigation.goals[name][row, col])
+        self.assertIs(navigation.field('pond'), navigation.field('pond')) # Shared, computed once
+
+    def test_flow_fields_can_be_disabled_alone(self):
+        navigation = Navigation(self.tile_map, self.table, 32, 'hpa', flow_fields=False)
+        self.assertEqual((navigation.poi_names(), navigation.random_poi()), ([], None))
+        self.assertIsNotNone(navigation.hpa)
+        self.assertIsNotNone(navigation.random_tile((5 * 32, 5 * 32)))
+
+    def test_region_updates_match_a_full_update(self):
+        grass_id = int(self.tile_map[self.table.mask(self.tile_map, TILE_GRASS)][0])
+        lut = build_path_lut(self.table, grass_id)
+        edited = Navigation(self.tile_map, self.table, 32, path_cost=0.5)
+        edited.field('path')
+        rng = random.Random(1)
+        with patch('aisim.src.core.navigation.label_components', wraps=label_components) as label:
+            for _ in range(30): # Paths laid as City.set_path does; walkability never changes
+                row, col = rng.randrange(30), rng.randrange(40)
+                if self.table.has(self.tile_map[row, col], TILE_GRASS):
+                    self.tile_map[row, col] = lut[15]
+                    autotile_paths(self.tile_map, self.table, lut, row, col, row + 1, col + 1)
+                    edited.update_terrain(self.tile_map, (col, row, col + 1, row + 1))
+            label.assert_not_called()
+        # Removing a prop frees its whole footprint
+        row, col = map(int, np.argwhere(self.table.mask(self.tile_map, TILE_PROP) & (self.table.span_w[self.tile_map] > 1))[0])
+        height, width = int(self.table.span_h[self.tile_map[row, col]]), int(self.table.span_w[self.tile_map[row, col]])
+        self.tile_map[row:row + height, col:col + width] = grass_id
+        edited.update_terrain(self.tile_map, (col, row, col + width, row + height))
+        full = Navigation(self.tile_map, self.table, 32, path_cost=0.5)
+        np.testing.assert_array_equal(edited.terrain, full.terrain)
+        np.testing.assert_array_equal(edited.costs, full.costs)
+        np.testing.assert_array_equal(edited.components, full.components)
+        self.assertEqual(sorted(edited.goals), sorted(full.goals))
+        for name in full.goals:
+            np.testing.assert_array_equal(edited.goals[name], full.goals[name])
+        self.assertNotIn('path', edited._fields) # Stale fields are dropped
+
+    def test_incremental_searches_share_the_live_cost_list(self):
+        navigation = Navigation(self.tile_map, self.table, 32, 'dstar_lite')
+        tiles = np.argwhere(navigation.components == np.bincount(navigation.components[navigation.components > 0]).argmax())
+        start = (tiles[0][1] * 32, tiles[0][0] * 32) # Rows and columns of one connected region
+        first = navigation.plan_incremental(start, (tiles[-1][1] * 32, tiles[-1][0] * 32))
+        second = navigation.plan_incremental(start, (tiles[-2][1] * 32, tiles[-2][0] * 32))
+        self.assertIs(first._costs, second._costs)
+        self.assertIs(first._costs, navigation.flat_costs())
+        penalty = np.zeros_like(navigation.penalty)
+        penalty[:, 10:20] = 2.0 # A crowd
+        navigation.set_penalty(penalty)
+        self.assertEqual(first._costs, navigation.costs.ravel().tolist())
+
+    def test_water_and_props_are_blocked(self):
+        navigation = Navigation(self.tile_map, self.table, 32, path_cost=0.5)
+        flags = footprint_flags(self.tile_map, self.table)
+        blocked = (flags & (TILE_WATER | TILE_PROP)) != 0
+        self.assertTrue(np.isinf(navigation.costs[blocked]).all())
+        self.assertTrue((navigation.costs[(flags & TILE_PATH) != 0] == 0.5).all())
+        self.assertTrue((navigation.components[blocked] == 0).all())
+
+    def test_random_tiles_are_reachable(self):
+        navigation = Navigation(self.tile_map, self.table, 32)
+        navigation.terrain[:, 20] = np.inf # Wall off the right half
+        navigation._label_components()
+        for _ in range(50):
+            col, row = navigation.random_tile((5 * 32, 5 * 32))
+            self.assertTrue(np.isfinite(navigation.terrain[row, col]))
+            self.assertTrue(navigation.reachable((5, 5), (col, row)))
+            self.assertLess(col, 20)
+        self.assertFalse(navigation.reachable((5, 5), (30, 5)))
+
+
+if __name__ == '__main__':
+    unittest.main()
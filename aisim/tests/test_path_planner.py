@@ -0,0 +1,52 @@
+import time
+import unittest
+import numpy as np
+from aisim.src.core.gridsearch import grid_astar
+from aisim.src.core.path_planner import PathPlanner
+
+
+class TestGridAstar(unittest.TestCase):
+
+    def test_detours_around_wall(self):
+        costs = np.ones((5, 5), dtype=np.float32)
+        costs[0:4, 2] = np.inf
+        cells = grid_astar(costs.ravel().tolist(), 5, 5, 0, 4)
+        self.assertEqual((cells[0], cells[-1]), (0, 4))
+        self.assertIn(22, cells) # Through the only gap at (2, 4)
+        costs[4, 2] = np.inf
+        self.assertIsNone(grid_astar(costs.ravel().tolist(), 5, 5, 0, 4))
+
+
+class TestPathPlanner(unittest.TestCase):
+
+    def _wait_for_result(self, planner):
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            result = planner.check_for_results()
+            if result is not None:
+                return result
+            time.sleep(0.01)
+        self.fail("No path result from the worker pool")
+
+    def test_results_are_queued(self):
+        costs = np.ones((10, 12), dtype=np.float32)
+        planner = PathPlanner(costs, workers=1)
+        try:
+            self.assertTrue(planner.request_path('sim1', (0, 0), (11, 9)))
+            self.assertTrue(planner.is_pending('sim1'))
+            self.assertFalse(planner.request_path('sim1', (0, 0), (5, 5))) # One search per Sim
+            result = self._wait_for_result(planner)
+            self.assertEqual((result['type'], result['sim_id']), ('path', 'sim1'))
+            self.assertEqual(result['data'], [(0, 0), (11, 9)]) # String-pulled by the worker
+            self.assertFalse(planner.is_pending('sim1'))
+            # Workers see cost updates through the shared grid
+            costs[:, 6] = np.inf
+            planner.update_costs(costs)
+            planner.request_path('sim1', (0, 0), (11, 9))
+            self.assertIsNone(self._wait_for_result(planner)['data'])
+        finally:
+            planner.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
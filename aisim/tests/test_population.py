@@ -0,0 +1,127 @@
+import unittest
+from unittest import mock
+import numpy as np
+from aisim.src.core import movement
+from aisim.src.core.movement import movement_update, movement_update_population, TILE_SIZE
+from aisim.src.core.navigation import path_array
+from aisim.src.core.population import SimPopulation, SimState
+from aisim.tests.test_movement import _center, _city
+
+
+class _Walker(SimState):
+    """Just the population-backed state of a Sim."""
+
+    def __init__(self, population, sim_id, col, row, path=None):
+        super().__init__(population)
+        self.sim_id = sim_id
+        self.x, self.y = _center(col, row)
+        self.speed = 40.0
+        self.animation_speed = 0.15
+        self.path = path
+        self.route = None
+        self.replanner = None
+        self.target = None
+        self.sidestepping = False
+
+
+def _walkers(population):
+    return [
+        _Walker(population, 'a', 0, 0, path_array([_center(0, 0), _center(4, 0)])),
+        _Walker(population, 'b', 2, 2, path_array([_center(2, 2), _center(2, 4), _center(0, 4)])),
+        _Walker(population, 'c', 4, 2, path_array([_center(4, 2), _center(4, 3)])),
+        _Walker(population, 'd', 4, 3), # Blocks c
+    ]
+
+
+class TestSimPopulation(unittest.TestCase):
+
+    def test_views_read_and_write_the_arrays(self):
+        population = SimPopulation(capacity=1)
+        walkers = [_Walker(population, str(i), i, 0) for i in range(5)] # Grows past the initial capacity
+        walkers[3].mood = 0.5
+        population.x[1] = 7.0
+        self.assertEqual(population.count, 5)
+        self.assertEqual((walkers[1].x, float(population.mood[3])), (7.0, 0.5))
+        self.assertEqual(walkers[4].x, _center(4, 0)[0]) # Kept through the growth
+        walkers[0].current_direction = 'left'
+        self.assertEqual(walkers[0].current_direction, 'left')
+        self.assertIsNone(walkers[0].current_tile)
+        walkers[0].path = path_array([(1, 2), (3, 4)])
+        walkers[0].path_index = 1
+        self.assertEqual((float(population.waypoint_x[0]), float(population.waypoint_y[0])), (3.0, 4.0))
+
+    def test_removal_moves_the_last_sim_into_the_free_slot(self):
+        population = SimPopulation()
+        a, b, c, d = _walkers(population)
+        b.mood = 0.5
+        b.leave_population()
+        self.assertEqual((population.count, population.sims), (3, [a, d, c]))
+        self.assertEqual((d.x, d.y, d.path), (*_center(4, 3), None)) # Moved into b's slot
+        self.assertEqual(population.x.tolist(), [a.x, d.x, c.x])
+        self.assertEqual(float(population.waypoint_x[2]), _center(4, 2)[0])
+        self.assertEqual((b.x, b.mood, len(b.path)), (_center(2, 2)[0], 0.5, 3)) # Kept, but no longer updated
+        population.x[:] += 1.0
+        self.assertEqual(b.x, _center(2, 2)[0])
+        e = _Walker(population, 'e', 1, 1) # Reuses the freed slot, starting from zeros
+        self.assertEqual((e.mood, e.path, float(population.mood[3])), (0.0, None, 0.0))
+
+    def test_close_pairs_match_brute_force(self):
+        population = SimPopulation()
+        rng = np.random.default_rng(2)
+        for i in range(300):
+            _Walker(population, str(i), 0, 0)
+        population.x[:] = rng.random(300) * 400
+        population.y[:] = rng.random(300) * 300 - 10
+        first, second = population.close_pairs(20)
+        distance = np.hypot(population.x[:, None] - population.x, population.y[:, None] - population.y)
+        np.fill_diagonal(distance, np.inf)
+        expected = set(zip(*(axis.tolist() for axis in np.nonzero(distance < 20))))
+        self.assertEqual(set(zip(first.tolist(), second.tolist())), expected)
+
+    def test_animation_skips_interacting_sims(self):
+        population = SimPopulation()
+        walking, talking = _Walker(population, 'a', 0, 0), _Walker(population, 'b', 1, 0)
+        talking.is_interacting = True
+        population.animation_update(0.2)
+        self.assertEqual((walking.animation_frame, talking.animation_frame), (1, 0))
+        self.assertAlmostEqual(walking.animation_timer, 0.05)
+
+    def test_draw_position_interpolates_the_latest_step(self):
+        population = SimPopulation()
+        walker = _Walker(population, 'a', 0, 0)
+        population.save_positions()
+        start_x, start_y = walker.x, walker.y
+        walker.x += 10.0
+        population.interpolation = 0.25
+        self.assertEqual(walker.draw_position, (start_x + 2.5, start_y))
+        population.interpolation = 1.0
+        self.assertEqual(walker.draw_position, (walker.x, walker.y))
+
+
+class TestBatchedMovement(unittest.TestCase):
+
+    def setUp(self):
+        self._stop_chance = movement.STOP_CHANCE
+        movement.STOP_CHANCE = 0.0 # Deterministic
+
+    def tearDown(self):
+        movement.STOP_CHANCE = self._stop_chance
+
+    def test_matches_per_sim_updates(self):
+        single, batched = SimPopulation(), SimPopulation()
+        single_walkers, batched_walkers = _walkers(single), _walkers(batched)
+        single_city, batched_city = _city(), _city()
+        single_city.sims, batched_city.sims = single_walkers, batched_walkers
+        for city in (single_city, batched_city):
+            city.random_destination = lambda near: near # Idle Sims replan in place, so d stays put
+        # The two updates draw random numbers in different orders, so steering choices are pinned
+        with mock.patch('random.shuffle', lambda sides: None), mock.patch('random.choice', lambda options: options[0]):
+            for _ in range(80):
+                for walker in single_walkers:
+                    movement_update(walker, 0.05, single_city, "Sunny", single_walkers, 0.0, TILE_SIZE, 5.0)
+                movement_update_population(batched, 0.05, batched_city, "Sunny", batched_walkers, 5.0)
+        for name in ('x', 'y', 'mood', 'path_index', 'blocked_time', 'direction', 'animation_frame'):
+            np.testing.assert_allclose(getattr(batched, name), getattr(single, name), err_msg=name)
+        self.assertEqual([w.current_tile for w in batched_walkers], [w.current_tile for w in single_walkers])
+        self.assertEqual(batched_walkers[0].current_tile, (4, 0)) # Arrived
+        self.assertNotEqual(batched_walkers[2].current_tile, (4, 3)) # Never walked into d
@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch
+from aisim.src.core.interaction import is_interaction_in_progress
+from aisim.src.core.movement import movement_update_population
+from aisim.src.core.navigation import path_array
+from aisim.src.core.population import SimPopulation
+from aisim.src.core.registry import SimRegistry
+from aisim.src.core.sim import Sim
+from aisim.tests.test_movement import _center, _city
+
+
+def _sims(population, count):
+    with patch('aisim.src.core.sim.Sim._load_sprite_sheet', return_value=("Abigail_Chen", None)), \
+         patch('aisim.src.core.sim.load_or_generate_personality_for_sim'):
+        return [Sim(f"sim{i}", *_center(i, 0), None, {}, population) for i in range(count)]
+
+
+class TestSimRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = SimRegistry()
+        self.sims = _sims(SimPopulation(), 3)
+        for sim in self.sims:
+            self.registry.add(sim)
+
+    def test_lookup_by_id(self):
+        self.assertIs(self.registry.get("sim1"), self.sims[1])
+        self.assertIsNone(self.registry.get("nobody"))
+        self.assertEqual(list(self.registry), self.sims)
+        with self.assertRaises(ValueError):
+            self.registry.add(self.sims[0])
+        self.registry.remove(self.sims[0])
+        self.assertNotIn("sim0", self.registry)
+        self.assertEqual(len(self.registry), 2)
+
+    def test_interacting_and_waiting_indexes_follow_the_sims(self):
+        a, b, c = self.sims
+        a.is_interacting = b.is_interacting = True
+        a.conversation.partner_id, b.conversation.partner_id = b.sim_id, a.sim_id
+        b.conversation.waiting_for_response = True
+        self.assertEqual(set(self.registry.interacting), {"sim0", "sim1"})
+        self.assertEqual(self.registry.waiting(), [b])
+        city = _city()
+        city.registry = self.registry
+        self.assertFalse(is_interaction_in_progress(a, city)) # Only its own conversation
+        self.assertTrue(is_interaction_in_progress(c, city))
+        a.is_interacting = False
+        self.assertEqual(list(self.registry.interacting), ["sim1"])
+
+    def test_tile_index_follows_the_sims(self):
+        a, b, c = self.sims
+        a.current_tile, b.current_tile, c.current_tile = (2, 2), (2, 2), (3, 3)
+        self.assertEqual(self.registry.at((2, 2)), [a, b])
+        self.assertTrue(self.registry.is_occupied((2, 2), a))
+        self.assertFalse(self.registry.is_occupied((3, 3), c))
+        self.assertEqual(sorted(sim.sim_id for sim in self.registry.near((2, 3))), ["sim0", "sim1", "sim2"])
+        b.current_tile = (3, 3)
+        self.assertEqual(self.registry.at((2, 2)), [a])
+        self.registry.remove(a)
+        self.assertNotIn((2, 2), self.registry.tiles)
+
+    def test_batched_movement_moves_sims_in_the_tile_index(self):
+        population = SimPopulation()
+        walker, idle = _sims(population, 2)
+        walker.path = path_array([_center(0, 0), _center(0, 3)])
+        idle.path = path_array([_center(1, 0), _center(1, 0)])
+        city = _city()
+        city.registry = registry = SimRegistry()
+        city.random_destination = lambda near: near # Arrived Sims stay put
+        registry.add(walker)
+        registry.add(idle)
+        for _ in range(60):
+            movement_update_population(population, 0.05, city, "Cloudy", population.sims, 5.0)
+        self.assertEqual(registry.at(walker.current_tile), [walker])
+        self.assertNotEqual(walker.current_tile, (0, 0))
+        self.assertEqual(sum(len(sims) for sims in registry.tiles.values()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
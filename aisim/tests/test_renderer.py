@@ -0,0 +1,85 @@
+import os
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame
+from aisim.src.ui import renderer
+from aisim.src.ui.renderer import DirtyRectRenderer, merge_rects
+
+SCREEN_SIZE = (320, 240)
+
+
+class FakeSim:
+    """Stand-in Sim whose draw rect and state are set directly by the test."""
+
+    def __init__(self, sim_id, x, y):
+        self.sim_id = sim_id
+        self.rect = pygame.Rect(x, y, 16, 16)
+
+    def get_draw_rect(self, camera=None):
+        return self.rect.copy()
+
+    def get_draw_state(self):
+        return (self.rect.topleft,)
+
+    def draw(self, screen, dt, sims, camera=None):
+        screen.fill((255, 0, 0), self.rect)
+
+
+class TestDirtyRectRenderer(unittest.TestCase):
+
+    def setUp(self):
+        pygame.display.init()
+        self.screen = pygame.display.set_mode(SCREEN_SIZE)
+        self.city = SimpleNamespace(draw=lambda surface, camera=None: None)
+        self.weather = SimpleNamespace(get_current_color=lambda: (0, 0, 0), effects_active=lambda: False, draw_effects=lambda screen: None)
+        self.ui_manager = SimpleNamespace(get_sprite_group=lambda: SimpleNamespace(sprites=lambda: []), draw_ui=lambda screen: None)
+        self.renderer = DirtyRectRenderer(SCREEN_SIZE)
+
+    def tearDown(self):
+        pygame.display.quit()
+
+    def _render(self, sims):
+        """Renders one frame and returns the rects passed to pygame.display.update."""
+        with patch.object(pygame.display, 'update') as update, patch.object(pygame.display, 'flip'):
+            self.renderer.render(self.screen, self.city, sims, self.weather, self.ui_manager, 0.016)
+        return update.call_args[0][0] if update.called else []
+
+    def test_dirty_regions_cover_old_and_new_sim_rects(self):
+        moving, still = FakeSim('a', 10, 10), FakeSim('b', 200, 150)
+        self._render([moving, still])
+        self.assertTrue(self.renderer.last_frame_was_full)
+
+        old_rect = moving.rect.copy()
+        moving.rect.move_ip(40, 30)
+        dirty = self._render([moving, still])
+        self.assertFalse(self.renderer.last_frame_was_full)
+        for rect in (old_rect, moving.rect):
+            self.assertTrue(any(region.contains(rect) for region in dirty))
+        self.assertFalse(any(region.colliderect(still.rect) for region in dirty))
+        self.assertEqual(self.screen.get_at(old_rect.topleft)[:3], (0, 0, 0))
+        self.assertEqual(self.screen.get_at(moving.rect.topleft)[:3], (255, 0, 0))
+
+        # Nothing changed, so nothing is sent to the display
+        self.assertEqual(self._render([moving, still]), [])
+
+    def test_too_many_dirty_regions_fall_back_to_a_full_redraw(self):
+        sims = [FakeSim(str(i), 20 * i, 100) for i in range(6)]
+        self._render(sims)
+        for sim in sims:
+            sim.rect.move_ip(0, 40)
+        with patch.object(renderer, 'MAX_DIRTY_RECTS', 8):
+            self._render(sims)
+            self.assertTrue(self.renderer.last_frame_was_full)
+            sims[0].rect.move_ip(0, 40)
+            self._render(sims)
+            self.assertFalse(self.renderer.last_frame_was_full)
+
+    def test_merge_rects_leaves_no_overlaps(self):
+        merged = merge_rects([pygame.Rect(0, 0, 10, 10), pygame.Rect(30, 0, 10, 10), pygame.Rect(5, 5, 30, 2), pygame.Rect(100, 100, 0, 5)])
+        self.assertEqual(merged, [pygame.Rect(0, 0, 40, 10)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from unittest.mock import patch
+import pygame
+from aisim.src.core.population import SimPopulation
+from aisim.src.core.sim import Sim
+
+
+class TestSimModel(unittest.TestCase):
+
+    def setUp(self):
+        sheet = pygame.Surface((96, 128))
+        sheet.fill((10, 20, 30), (32, 64, 32, 32)) # Row 2 ('right'), column 1
+        with patch('aisim.src.core.sim.Sim._load_sprite_sheet', return_value=("Abigail_Chen", sheet)), \
+             patch('aisim.src.core.sim.load_or_generate_personality_for_sim'):
+            self.sim = Sim("sim1", 10, 20, None, {"sim_color": [1, 2, 3]}, SimPopulation())
+
+    def test_fields_are_declared(self):
+        self.assertFalse(hasattr(self.sim, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.sim.tile_size = 32
+        self.assertEqual((self.sim.x, self.sim.y, self.sim.full_name), (10, 20, "Abigail Chen"))
+        self.assertEqual(self.sim.appearance.color, (1, 2, 3))
+
+    def test_sprite_frames_are_cut_once(self):
+        self.sim.current_direction = 'right'
+        self.sim.animation_frame = 1
+        sprite = self.sim._get_sprite()
+        self.assertEqual(sprite.get_size(), (32, 32))
+        self.assertEqual(sprite.get_at((0, 0))[:3], (10, 20, 30))
+        self.assertIs(self.sim._get_sprite(), sprite)
+        self.assertEqual(self.sim.get_draw_rect().center, (10, 20))
+
+    def test_ending_a_conversation_clears_the_bubble(self):
+        conversation = self.sim.conversation
+        conversation.partner_id, conversation.turns, conversation.history = "sim2", 3, [{'line': "Hi"}]
+        conversation.message, conversation.message_timer = "Hi", 5.0
+        conversation.end()
+        self.assertEqual((conversation.partner_id, conversation.turns, conversation.history), (None, 0, None))
+        self.assertEqual((conversation.message, conversation.message_timer), (None, 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from aisim.src.core.text import wrap_text
+
+
+class FakeFont:
+    """Monospace stand-in for pygame.font.Font: every character is 10px wide."""
+
+    def __init__(self):
+        self.size_calls = 0
+
+    def size(self, text):
+        self.size_calls += 1
+        return (len(text) * 10, 14)
+
+
+class TestWrapText(unittest.TestCase):
+
+    def setUp(self):
+        self.font = FakeFont()
+
+    def test_wraps_on_word_boundaries(self):
+        lines = wrap_text("the quick brown fox jumps", self.font, 100)
+        self.assertEqual(lines, ["the quick", "brown fox", "jumps"])
+
+    def test_preserves_paragraphs_and_skips_extra_spaces(self):
+        lines = wrap_text("hello   world\nbye", self.font, 200)
+        self.assertEqual(lines, ["hello world", "bye"])
+
+    def test_splits_long_words(self):
+        lines = wrap_text("ab abcdefghijklmnopqrstuvwxyz cd", self.font, 100)
+        self.assertEqual(lines, ["ab", "abcdefghij", "klmnopqrst", "uvwxyz", "cd"])
+
+    def test_character_wider_than_max_width(self):
+        self.assertEqual(wrap_text("abc", self.font, 5), ["a", "b", "c"])
+
+    def test_empty_text(self):
+        self.assertEqual(wrap_text("", self.font, 100), [""])
+        self.assertEqual(wrap_text("   ", self.font, 100), [""])
+
+    def test_result_is_cached(self):
+        first = wrap_text("cache me if you can", self.font, 80)
+        calls = self.font.size_calls
+        first.append("mutated")
+        second = wrap_text("cache me if you can", self.font, 80)
+        self.assertEqual(self.font.size_calls, calls)
+        self.assertEqual(second, ["cache me", "if you", "can"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import numpy as np
+from aisim.src.core.tiles import SpriteTable, COVERED_ID, TILE_GRASS, TILE_PATH, TILE_WATER, TILE_PROP, TILE_COVERED
+
+
+def _sprite(name, width=32, height=32):
+    return {"name": name, "source_file": "tiles.png", "x": 0, "y": 0, "width": width, "height": height}
+
+
+class TestSpriteTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = SpriteTable([
+            _sprite("grass_plain_1"),
+            _sprite("path_dirt_h_straight", 128, 32),
+            _sprite("water_pond_large", 128, 96),
+            _sprite("tree_pine", 64, 64),
+        ], 32)
+
+    def test_ids_and_flags(self):
+        self.assertEqual(self.table.get_id("grass_plain_1"), 1)
+        self.assertIsNone(self.table.get_id("missing"))
+        self.assertEqual(self.table.get_name(COVERED_ID), None)
+        self.assertTrue(self.table.has(COVERED_ID, TILE_COVERED))
+        self.assertTrue(self.table.has(self.table.get_id("tree_pine"), TILE_PROP))
+        self.assertEqual(self.table.ids_with(TILE_PATH | TILE_WATER), [2, 3])
+
+    def test_spans(self):
+        pond = self.table.get_id("water_pond_large")
+        self.assertEqual((self.table.span_w[pond], self.table.span_h[pond]), (4, 3))
+
+    def test_classify_and_mask(self):
+        tile_map = np.array([[1, 2], [3, COVERED_ID]], dtype=np.uint16)
+        self.assertEqual([self.table.classify(i) for i in tile_map.ravel()], ["grass", "path", "water", "unknown"])
+        np.testing.assert_array_equal(self.table.mask(tile_map, TILE_GRASS | TILE_PATH), [[True, True], [False, False]])
+
+
+if __name__ == '__main__':
+    unittest.main()